@@ -1,21 +1,24 @@
 from functools import lru_cache
+from typing import Literal
 
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from agent_runtime.config.settings import WorkerSettings
 
 
-class Settings(BaseSettings):
-    TOPIC_NAME: str
-    MODEL_NAME: str
-    API_KEY: str
-    REDIS_URL: str
-    CHAT_CHANNEL_NAME: str
-    GROUP_NAME: str
-    CONSUMER_NAME: str
-    JWKS_URL: str
-    AGENT_SERVER_URL: str
-    LOGFIRE_API_KEY: str
+class Settings(WorkerSettings):
+    """Agent settings, everything the worker needs comes from WorkerSettings."""
 
-    model_config = SettingsConfigDict(env_file=".env")
+    # Child agents whose cards make up the orchestrator's catalog
+    AGENT_URLS: list[str] = ["http://localhost:8003", "http://localhost:8004"]
+    # "forward" lets the children answer the user directly, "gather" asks
+    # them all at once and "plan" runs a plan of dependent subtasks, both
+    # answering with the children's combined results
+    DELEGATION_MODE: Literal["forward", "gather", "plan"] = "forward"
+    # Seconds to wait for the children's answers in gather and plan mode,
+    # at most the task's remaining budget
+    GATHER_TIMEOUT_SECONDS: float = 60
+    # Agents of the catalog put in the prompt, the most relevant to the query,
+    # 0 puts every agent
+    CATALOG_TOP_K: int = 5
 
 
 @lru_cache
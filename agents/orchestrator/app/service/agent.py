@@ -1,91 +1,328 @@
-import asyncio
-from contextlib import asynccontextmanager
+from agent_runtime.service.startup import install_import_timer
+
+# The agent's entry module, its imports are timed from here on
+install_import_timer()
+
+import hashlib
+import json
+import time
+import uuid
 
 import logfire
+from agent_runtime.service.a2a_worker import MESH_MSG_ID
+from agent_runtime.service.catalog import AgentCatalog
+from agent_runtime.service.codec import encode_task
+from agent_runtime.service.gather import gather_replies, reply_stream
+from agent_runtime.service.metrics import (
+    CATALOG_AGENTS,
+    CATALOG_PROMPT_BYTES,
+    STAGE_TIME,
+)
+from agent_runtime.service.plan import PlanStep, execute_plan, plan_order
+from agent_runtime.service.redis_service import (
+    DEFAULT_LANE,
+    breaker_key,
+    lane_stream,
+    remaining_budget,
+    trim_policy,
+)
+from agent_runtime.service.timings import add_hop, load_timings
+from agent_runtime.service.worker import AgentWorker
+from pydantic import BaseModel
 from pydantic_ai import Agent, RunContext, Tool
-from pydantic_ai.models.google import GoogleModel
-from pydantic_ai.providers.google import GoogleProvider
+from pydantic_ai.messages import ModelRequest, UserPromptPart
+from pydantic_ai.tools import ToolDefinition
 
 from app.config.settings import get_settings
 from app.service.agent_client import get_agents
-from app.service.redis_service import REDIS, redis_stream
-
-# Intializing the stream task
-STREAM_TASK: asyncio.Task | None = None
-# Initalizing the provider
-provider = GoogleProvider(api_key=get_settings().API_KEY)
-# Initalizing the model
-model = GoogleModel(get_settings().MODEL_NAME, provider=provider)
-# configure logfire
-logfire.configure(
-    token=get_settings().LOGFIRE_API_KEY, service_name="orchestrator-agent"
-)
-logfire.instrument_pydantic_ai()
-logfire.instrument_system_metrics(base="full")
+
+# Index over the cards of the child agents, fetched once the worker starts
+AGENT_CATALOG = AgentCatalog()
+# Fields of a stream entry that only concern its own delivery
+ENTRY_FIELDS = ("hedge", "reply_to", "subtask_id", "delegated")
+# Seconds the answer of a plan step is kept for retries of its task
+STEP_CACHE_SECONDS = 600
+
+
+class Subtask(BaseModel):
+    agent_name: str
+    query: str
+
+
+def child_task(task_data: dict, query: str) -> dict:
+    """Fields of the running task handed to a child agent with its own query."""
+    task_data = {**task_data, "query": query}
+    for field in ENTRY_FIELDS:
+        task_data.pop(field, None)
+    # Carry on the envelope of the running task, with the routing decision
+    timings = worker.timings.get(MESH_MSG_ID.get()) or load_timings(task_data)
+    timings = add_hop(list(timings), worker.name, "route")
+    task_data["timings"] = json.dumps(add_hop(timings, worker.name, "enqueue"))
+    # The child agent continues the trace of this agent run
+    task_data.update(logfire.propagate.get_context())
+    return task_data
 
 
 # Intialzing the delegation tools
 async def queue_message_to_agent(ctx: RunContext, agent_name: str, query: str):
     print("Agent Name: ", agent_name)
-    # Getting the tool name and get all the session details from redis
-    tool_name = ctx.tool_name
-    task_data = await REDIS.hgetall(name=tool_name)
-    # Modify the query to be the updated query
-    task_data["query"] = query
-    # Push the task data to the respected agent
-    await REDIS.xadd(agent_name, task_data)
+    # Get the details of the task being run, along with whether the agent's
+    # circuit breaker is open
+    task_data, unavailable = await session_task([agent_name])
+    if task_data is None:
+        return f"No mesh task for this run, not delegated to agent {agent_name}"
+    # Fail fast instead of queueing work for an agent that keeps failing
+    if unavailable:
+        await worker.send_message_to_socket(
+            {
+                "status": "unavailable",
+                "message": f"{agent_name} agent is unavailable, try again later",
+            }
+        )
+        return f"Agent {agent_name} is unavailable right now, not delegated"
+    # Don't hand work to child agents once the deadline has passed,
+    # otherwise the deadline is carried along with the rest of the task data
+    budget = remaining_budget(task_data)
+    if budget is not None and budget <= 0:
+        return f"Task deadline exceeded, not delegated to agent {agent_name}"
+    # Push the task data to the respected agent, keeping the user's lane
+    lane = task_data.get("lane", DEFAULT_LANE)
+    await worker.redis.xadd(
+        lane_stream(agent_name, lane),
+        encode_task(child_task(task_data, query), worker.settings.ENVELOPE_CODEC),
+        **trim_policy(worker.settings),
+    )
+    # The child answers the user as well, the chat server waits for both
+    task_data["delegated"] = int(task_data.get("delegated", 0)) + 1
     return f"Delegated to agent {agent_name}"
 
 
-# Pydantic AI agent
+async def session_task(agent_names: list[str]) -> tuple[dict | None, set[str]]:
+    """Fields of the task this agent run works on, None when it wasn't sent
+    by the worker, and the agents whose circuit breaker is open."""
+    task_data = worker.tasks.get(MESH_MSG_ID.get())
+    async with worker.redis.pipeline(transaction=False) as pipe:
+        for agent_name in agent_names:
+            pipe.exists(breaker_key(agent_name))
+        closed = await pipe.execute()
+    return task_data, {name for name, open_ in zip(agent_names, closed) if open_}
+
+
+def gather_timeout(task_data: dict) -> float:
+    """Seconds to wait for the children, at most the task's remaining budget."""
+    budget = remaining_budget(task_data)
+    if budget is None:
+        return worker.settings.GATHER_TIMEOUT_SECONDS
+    return min(worker.settings.GATHER_TIMEOUT_SECONDS, budget)
+
+
+async def ask(
+    task_data: dict, answers: list[dict], unavailable: set[str], timeout: float
+) -> list[dict]:
+    """Send each {"agent_name", "query"} to its agent and fill in the answers.
+
+    Every subtask goes out in one round trip, the children answer on a reply
+    stream of this call.
+    """
+    reply_to = reply_stream(str(uuid.uuid4()))
+    lane = task_data.get("lane", DEFAULT_LANE)
+    pending: dict[str, dict] = {}
+    async with worker.redis.pipeline(transaction=False) as pipe:
+        for answer in answers:
+            if answer["agent_name"] in unavailable:
+                answer["status"] = "unavailable"
+                continue
+            subtask_id = str(uuid.uuid4())
+            fields = child_task(task_data, answer["query"])
+            fields.update({"reply_to": reply_to, "subtask_id": subtask_id})
+            pipe.xadd(
+                lane_stream(answer["agent_name"], lane),
+                encode_task(fields, worker.settings.ENVELOPE_CODEC),
+                **trim_policy(worker.settings),
+            )
+            pending[subtask_id] = answer
+        await pipe.execute()
+
+    replies = await gather_replies(worker.redis, reply_to, set(pending), timeout)
+    for subtask_id, answer in pending.items():
+        reply = replies.get(subtask_id)
+        if reply is None:
+            answer["status"] = "timeout"
+            continue
+        answer["status"] = reply["status"]
+        answer["answer"] = reply.get("agent_response") or reply.get("message")
+    return answers
+
+
+async def ask_agents(ctx: RunContext, subtasks: list[Subtask]) -> list[dict]:
+    """Ask child agents all at once and wait for every answer.
+
+    Put every subtask of the query in a single call, each with the agent
+    that should answer it.
+    """
+    task_data, unavailable = await session_task(
+        [subtask.agent_name for subtask in subtasks]
+    )
+    if task_data is None:
+        return [{"status": "failed", "message": "No mesh task for this run"}]
+    timeout = gather_timeout(task_data)
+    if timeout <= 0:
+        return [{"status": "expired", "message": "Task deadline exceeded"}]
+    answers = [subtask.model_dump() for subtask in subtasks]
+    return await ask(task_data, answers, unavailable, timeout)
+
+
+def step_query(step: PlanStep, inputs: dict[str, str]) -> str:
+    """Query of a step with the answers of the steps it depends on."""
+    if not inputs:
+        return step.query
+    context = "\n".join(f"[{step_id}] {answer}" for step_id, answer in inputs.items())
+    return f"{step.query}\n\nResults of the steps this one depends on:\n{context}"
+
+
+def step_key(task_id: str, agent_name: str, query: str) -> str:
+    """Redis key caching the answer of a plan step for retries of the task."""
+    digest = hashlib.sha256(f"{agent_name}\n{query}".encode()).hexdigest()[:32]
+    return f"plan:{task_id}:{digest}"
+
+
+async def run_plan(ctx: RunContext, plan: list[PlanStep]) -> dict[str, dict]:
+    """Run a plan of steps on the child agents and return every step's result.
+
+    Give each step an id, the agent that should answer it, its query and the
+    ids of the steps whose answers it needs. Steps without dependencies
+    between them run at the same time, and a step gets the answers of the
+    steps it depends on.
+    """
+    try:
+        plan_order(plan)
+    except ValueError as e:
+        return {"plan": {"status": "rejected", "message": str(e)}}
+    task_data, unavailable = await session_task(
+        list({step.agent_name for step in plan})
+    )
+    if task_data is None:
+        return {"plan": {"status": "failed", "message": "No mesh task for this run"}}
+    timeout = gather_timeout(task_data)
+    if timeout <= 0:
+        return {"plan": {"status": "expired", "message": "Task deadline exceeded"}}
+    deadline = time.monotonic() + timeout
+
+    async def run_step(step: PlanStep, inputs: dict[str, str]) -> dict:
+        query = step_query(step, inputs)
+        # Steps answered before a retry of the task aren't asked again
+        key = step_key(task_data["task_id"], step.agent_name, query)
+        cached = await worker.redis.get(key)
+        if cached:
+            return json.loads(cached)
+        [answer] = await ask(
+            task_data,
+            [{"agent_name": step.agent_name, "query": query}],
+            unavailable,
+            deadline - time.monotonic(),
+        )
+        if answer["status"] == "completed":
+            await worker.redis.set(key, json.dumps(answer), ex=STEP_CACHE_SECONDS)
+        return answer
+
+    return await execute_plan(plan, run_step, timeout)
+
+
+# Delegation tool of each mode
+DELEGATION_TOOLS = {
+    "forward": "queue_message_to_agent",
+    "gather": "ask_agents",
+    "plan": "run_plan",
+}
+
+
+async def in_delegation_mode(
+    ctx: RunContext, tool_def: ToolDefinition
+) -> ToolDefinition | None:
+    """Offer a delegation tool only in its mode, read per run rather than on
+    import."""
+    if DELEGATION_TOOLS[get_settings().DELEGATION_MODE] == tool_def.name:
+        return tool_def
+    return None
+
+
+# Pydantic AI agent, the worker sets up the model and telemetry on startup
 agent = Agent(
-    model=model,
-    instructions=f"""
+    instructions="""
     You are an Orchestrator Agent. Your primary role is to understand the user’s query and delegate tasks to specialized child agents for efficient and accurate completion.
         Instructions:
             * Analyze the user query thoroughly.
             * Break down complex tasks into manageable subtasks.
             * Identify the most suitable child agent for each subtask and assign the work accordingly.
             * Maintain clear coordination and ensure the overall task is completed accurately and efficiently.
-            * If no relevant child agents exist, respond with “no relevant agents." 
-        Agent Available : {str(get_agents())}""",
-    tools=[Tool(queue_message_to_agent)],
+            * If no relevant child agents exist, respond with “no relevant agents." """,
+    # Children answer the user themselves, or back to the orchestrator which
+    # combines their answers
+    tools=[
+        Tool(tool, prepare=in_delegation_mode)
+        for tool in [queue_message_to_agent, ask_agents, run_plan]
+    ],
 )
 
+
+@agent.instructions
+def delegation_mode() -> str:
+    mode = get_settings().DELEGATION_MODE
+    if mode == "gather":
+        return (
+            "Send all the subtasks in a single ask_agents call, then combine "
+            "the answers into one reply to the user."
+        )
+    if mode == "plan":
+        return (
+            "Plan the subtasks and the order they depend on each other in a "
+            "single run_plan call, then combine the results into one reply "
+            "to the user."
+        )
+    return ""
+
+
+def user_query(ctx: RunContext) -> str:
+    """Latest user prompt of the run, A2A tasks come in as message history."""
+    if isinstance(ctx.prompt, str):
+        return ctx.prompt
+    for message in reversed(ctx.messages):
+        if isinstance(message, ModelRequest):
+            for part in message.parts:
+                if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                    return part.content
+    return ""
+
+
+@agent.instructions
+def agent_catalog(ctx: RunContext) -> str:
+    # Only the agents relevant to the query, so the prompt doesn't grow with
+    # every agent registered
+    started = time.perf_counter()
+    entries = AGENT_CATALOG.search(user_query(ctx), get_settings().CATALOG_TOP_K)
+    catalog = json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+    STAGE_TIME.record(
+        (time.perf_counter() - started) * 1000,
+        {"agent": worker.name, "stage": "catalog"},
+    )
+    CATALOG_PROMPT_BYTES.record(len(catalog.encode()), {"agent": worker.name})
+    CATALOG_AGENTS.record(len(entries), {"agent": worker.name})
+    return f"Agents available: {catalog}"
+
+
+async def load_agent_catalog():
+    AGENT_CATALOG.load(await get_agents(get_settings().AGENT_URLS))
+
+
+# Stream worker wrapping the agent, the catalog is loaded without blocking boot
+worker = AgentWorker(agent, get_settings, service_name="orchestrator-agent")
+worker.add_startup_task("agent catalog", load_agent_catalog)
+
 # Agent Server
-orchestrator_agent_server = agent.to_a2a(
+orchestrator_agent_server = worker.to_a2a(
     name="orchestrator_agent",
     description="""
 Analyzes user queries and breaks them into actionable components.
 Assigns each subtask to the most suitable child agent.
 Ensures efficient execution and accurate completion of the overall task.""",
 )
-
-# Getting the current lifespan context
-a2a_lifespan = orchestrator_agent_server.router.lifespan_context
-
-
-# Updated lifespan with redis stream
-@asynccontextmanager
-async def lifespan(app_instance):
-    global STREAM_TASK
-    STREAM_TASK = asyncio.create_task(redis_stream())
-    print("[App] Redis Stream Started")
-    # Maintians the original lifespan for interal a2a tasks aswell
-    async with a2a_lifespan(app_instance) as state:
-        try:
-            yield state
-        finally:
-            # Shutting down the redis server
-            if STREAM_TASK:
-                STREAM_TASK.cancel()
-                try:
-                    await STREAM_TASK
-                except asyncio.CancelledError:
-                    print("[App] Redis Stream task cancelled")
-            await REDIS.close()
-            print("[App] Redis client closed")
-
-
-# Adding the redis stream to the exisitng a2a lifespan
-orchestrator_agent_server.router.lifespan_context = lifespan
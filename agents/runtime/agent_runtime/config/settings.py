@@ -0,0 +1,103 @@
+from typing import Literal
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class WorkerSettings(BaseSettings):
+    """Settings every agent worker needs, agents subclass it for their own."""
+
+    TOPIC_NAME: str
+    MODEL_NAME: str
+    API_KEY: str
+    REDIS_URL: str
+    CHAT_CHANNEL_NAME: str
+    GROUP_NAME: str
+    CONSUMER_NAME: str
+    JWKS_URL: str
+    # URL the agent card advertises, tasks are sent to the server in process
+    AGENT_SERVER_URL: str
+    LOGFIRE_API_KEY: str
+    # Channel where the chat server announces cancelled tasks
+    CANCEL_CHANNEL_NAME: str = "task-cancellations"
+    # Tasks processed concurrently by one worker
+    MAX_CONCURRENT_TASKS: int = 10
+    # Weight of each priority lane in the fair scheduler, as a JSON object
+    LANE_WEIGHTS: dict[str, int] = {"interactive": 4, "bulk": 1}
+    # Seconds between two exports of the stream statistics
+    STATS_INTERVAL_SECONDS: int = 15
+    # Streams are trimmed to roughly this many entries...
+    STREAM_MAXLEN: int = 10000
+    # ...or, when set, to the entries of the last N seconds
+    STREAM_RETENTION_SECONDS: int | None = None
+    # Ack and delete with XACKDEL, needs Redis 8.2 or newer
+    USE_XACKDEL: bool = False
+    # Seconds in-flight tasks get to finish on shutdown before being handed back
+    DRAIN_TIMEOUT_SECONDS: int = 20
+    # Share of traces recorded, a task keeps the decision of whoever started it
+    TRACE_SAMPLE_RATE: float = 1.0
+    # How tasks and events are written: "json" as flat hashes and JSON, or
+    # "msgpack" packed with the token by reference. Both are always read, so
+    # switch once every service reads msgpack
+    ENVELOPE_CODEC: Literal["json", "msgpack"] = "json"
+    # Role a token needs for the profiling endpoints under /debug
+    ADMIN_ROLE: str = "mesh-admin"
+    # Seconds between two probes of the event loop's scheduling lag
+    LOOP_PROBE_INTERVAL_SECONDS: float = 0.1
+    # Lag after which the loop counts as blocked and its stack is logged
+    SLOW_CALLBACK_MS: float = 100
+    # The circuit breaker opens when BREAKER_FAILURE_RATE of the last
+    # BREAKER_WINDOW agent runs (at least BREAKER_MIN_CALLS) failed or took
+    # longer than BREAKER_SLOW_CALL_MS, and fails tasks fast for
+    # BREAKER_OPEN_SECONDS before letting a probe through
+    BREAKER_WINDOW: int = 20
+    BREAKER_MIN_CALLS: int = 10
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_MS: float = 30000
+    BREAKER_OPEN_SECONDS: float = 30
+    # Send a duplicate of a task to the stream after the p95 latency, for
+    # agents whose queries are read-only and safe to run twice
+    HEDGE_REQUESTS: bool = False
+
+    # An agent's .env also holds its own keys, read by the supervisor through
+    # this class alone
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class HostSettings(BaseSettings):
+    """Settings of a host process running several agents together."""
+
+    REDIS_URL: str
+    LOGFIRE_API_KEY: str
+    # Channel where the chat server announces cancelled tasks
+    CANCEL_CHANNEL_NAME: str = "task-cancellations"
+    # Service name the hosted agents report telemetry under
+    SERVICE_NAME: str = "agent-host"
+    # Share of traces recorded, a task keeps the decision of whoever started it
+    TRACE_SAMPLE_RATE: float = 1.0
+    # Seconds between two probes of the event loop's scheduling lag
+    LOOP_PROBE_INTERVAL_SECONDS: float = 0.1
+    # Lag after which the loop counts as blocked and its stack is logged
+    SLOW_CALLBACK_MS: float = 100
+
+    # Hosts and the supervisor share the .env of their directory, which may
+    # hold keys of either and of the agents
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class SupervisorSettings(HostSettings):
+    """Settings of the supervisor scaling worker processes by backlog."""
+
+    SERVICE_NAME: str = "agent-supervisor"
+    # Worker processes kept per agent
+    MIN_WORKERS: int = 1
+    MAX_WORKERS: int = 4
+    # Unread plus pending entries one worker is expected to keep up with
+    TARGET_BACKLOG_PER_WORKER: int = 20
+    # Seconds between two scaling decisions
+    SCALE_INTERVAL_SECONDS: int = 5
+    # Seconds the backlog must stay low before a worker is retired
+    SCALE_DOWN_COOLDOWN_SECONDS: int = 30
+    # Seconds a retired worker gets to finish its tasks before it's killed
+    DRAIN_TIMEOUT_SECONDS: int = 30
+    # First port given to the worker processes' A2A servers
+    BASE_PORT: int = 8100
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from agent_runtime.config.settings import HostSettings, SupervisorSettings
+from agent_runtime.service.host import AgentHost
+from agent_runtime.service.supervisor import Supervisor
+
+# Seconds an agent gets to be ready before its memory is measured anyway
+STARTUP_TIMEOUT_SECONDS = 30
+
+
+def measure_rss(project_dirs: list[str]) -> dict:
+    """Load and start the agents in a fresh process and return its resident
+    memory."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "agent_runtime.main",
+            "host",
+            "--measure-rss",
+            *project_dirs,
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def rss_report(project_dirs: list[str]):
+    """Print the RSS of the agents run as separate processes vs one host."""
+    mb = 1024 * 1024
+    separate = {}
+    for project_dir in project_dirs:
+        measured = measure_rss([project_dir])
+        separate.update({name: measured["total"] for name in measured["agents"]})
+    hosted = measure_rss(project_dirs)
+
+    print(f"{'agent':<20}{'separate':>12}{'in host':>12}")
+    for name, rss in separate.items():
+        print(f"{name:<20}{rss / mb:>10.1f}MB{hosted['agents'][name] / mb:>+10.1f}MB")
+    print(
+        f"{'total':<20}{sum(separate.values()) / mb:>10.1f}MB"
+        f"{hosted['total'] / mb:>10.1f}MB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the agents of the mesh")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    host_parser = commands.add_parser("host", help="run several agents in one process")
+    host_parser.add_argument("projects", nargs="+", help="agent project directories")
+    host_parser.add_argument("--host", default="0.0.0.0")
+    host_parser.add_argument("--port", type=int, default=8010)
+    host_parser.add_argument(
+        "--rss-report",
+        action="store_true",
+        help="compare memory with separate processes instead of serving",
+    )
+    host_parser.add_argument(
+        "--measure-rss", action="store_true", help=argparse.SUPPRESS
+    )
+
+    supervise_parser = commands.add_parser(
+        "supervise", help="scale worker processes per agent by stream backlog"
+    )
+    supervise_parser.add_argument(
+        "projects", nargs="+", help="agent project directories"
+    )
+    args = parser.parse_args()
+
+    if args.command == "supervise":
+        supervisor = Supervisor([Path(p) for p in args.projects], SupervisorSettings())
+        try:
+            asyncio.run(supervisor.run())
+        except KeyboardInterrupt:
+            pass
+    elif args.rss_report:
+        rss_report(args.projects)
+    elif args.measure_rss:
+        host = AgentHost([Path(p) for p in args.projects], HostSettings())
+        total = asyncio.run(host.measure_startup(STARTUP_TIMEOUT_SECONDS))
+        print(json.dumps({"total": total, "agents": host.rss}))
+    else:
+        import uvicorn
+
+        host = AgentHost([Path(p) for p in args.projects], HostSettings())
+        uvicorn.run(host.app, host=args.host, port=args.port)
@@ -0,0 +1,84 @@
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import anyio
+from fasta2a.broker import TaskOperation
+from fasta2a.schema import TaskIdParams, TaskSendParams
+from pydantic_ai._a2a import AgentWorker
+
+from agent_runtime.service.timings import FINAL_STATES
+
+# Stream entry id of the mesh task the running A2A task works on, as sent in
+# the metadata of its message, so the agent's tools can find the task's fields
+MESH_MSG_ID: ContextVar[str | None] = ContextVar("mesh_msg_id", default=None)
+
+
+@dataclass
+class MeshAgentWorker(AgentWorker):
+    """A2A worker running each task with its stream entry id in MESH_MSG_ID.
+
+    Up to `max_concurrency` tasks run side by side, fasta2a's own loop waits
+    for each task before reading the next one. Tasks of the same context
+    (session) still run one after the other: each extends the context's
+    message history in place and saves it back when done. A `tasks/cancel`
+    stops the task's run, whether it is running or still waiting its turn.
+    """
+
+    max_concurrency: int = 1
+    context_locks: dict[str, anyio.Lock] = field(default_factory=dict)
+    # Tasks running or waiting on each context's lock
+    context_tasks: Counter = field(default_factory=Counter)
+    # Cancel scope of each task run, by A2A task id
+    task_scopes: dict[str, anyio.CancelScope] = field(default_factory=dict)
+
+    async def _loop(self) -> None:
+        slots = anyio.Semaphore(self.max_concurrency)
+        async with anyio.create_task_group() as tg:
+            async for task_operation in self.broker.receive_task_operations():
+                tg.start_soon(self.run_operation, task_operation, slots)
+
+    async def run_operation(
+        self, task_operation: TaskOperation, slots: anyio.Semaphore
+    ):
+        # Cancels don't wait behind the runs they are meant to stop
+        if task_operation["operation"] == "cancel":
+            await self._handle_task_operation(task_operation)
+            return
+        task_id = task_operation["params"]["id"]
+        with anyio.CancelScope() as scope:
+            self.task_scopes[task_id] = scope
+            try:
+                async with slots:
+                    await self._handle_task_operation(task_operation)
+            finally:
+                del self.task_scopes[task_id]
+
+    async def cancel_task(self, params: TaskIdParams) -> None:
+        task = await self.storage.load_task(params["id"])
+        if task is None or task["status"]["state"] in FINAL_STATES:
+            return
+        await self.storage.update_task(params["id"], state="canceled")
+        scope = self.task_scopes.get(params["id"])
+        if scope:
+            scope.cancel()
+
+    async def run_task(self, params: TaskSendParams) -> None:
+        task = await self.storage.load_task(params["id"])
+        # Cancelled before its run was even picked up
+        if task is not None and task["status"]["state"] == "canceled":
+            return
+        metadata = params["message"].get("metadata") or {}
+        context_id = params["context_id"]
+        lock = self.context_locks.setdefault(context_id, anyio.Lock())
+        self.context_tasks[context_id] += 1
+        token = MESH_MSG_ID.set(metadata.get("msg_id"))
+        try:
+            async with lock:
+                await super().run_task(params)
+        finally:
+            MESH_MSG_ID.reset(token)
+            self.context_tasks[context_id] -= 1
+            if not self.context_tasks[context_id]:
+                del self.context_tasks[context_id]
+                del self.context_locks[context_id]
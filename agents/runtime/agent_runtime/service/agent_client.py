@@ -0,0 +1,99 @@
+import asyncio
+import time
+import uuid
+
+from fasta2a.client import A2AClient, Message
+
+from agent_runtime.service.metrics import POLL_BYTES, STAGE_TIME
+from agent_runtime.service.timings import FINAL_STATES
+
+# Cancels are handled in process, a slow one is not worth waiting on
+CANCEL_TIMEOUT_SECONDS = 1
+
+
+async def get_task(
+    client: A2AClient,
+    task_id: str,
+    history_length: int | None = None,
+    attributes: dict | None = None,
+) -> dict:
+    """A2A `tasks/get` keeping only the last `history_length` messages.
+
+    The response is read as plain JSON, without validating it against the
+    A2A schema the way `A2AClient.get_task` does.
+    """
+    params = {"id": task_id}
+    if history_length is not None:
+        params["historyLength"] = history_length
+    payload = {
+        "jsonrpc": "2.0",
+        "id": str(uuid.uuid4()),
+        "method": "tasks/get",
+        "params": params,
+    }
+    response = await client.http_client.post("/", json=payload)
+    response.raise_for_status()
+    POLL_BYTES.record(len(response.content), attributes or {})
+    return response.json()
+
+
+async def send_message(
+    client: A2AClient,
+    message: Message,
+    timeout: float | None = None,
+    attributes: dict | None = None,
+):
+    """Send the message and wait for the task, giving up after `timeout` seconds.
+
+    The task is polled without its message history, the history is only
+    fetched once at the end for agents answering without artifacts. The time
+    to submit the task and the time spent polling it are recorded as the
+    `a2a_send` and `poll_wait` stages, with the given `attributes`.
+    """
+    attributes = attributes or {}
+    async with asyncio.timeout(timeout):
+        started = time.perf_counter()
+        response = await client.send_message(message=message)
+        sent = time.perf_counter()
+        STAGE_TIME.record((sent - started) * 1000, {**attributes, "stage": "a2a_send"})
+        task_id = response["result"]["history"][-1]["task_id"]
+        try:
+            while True:
+                # Only the state matters until the task is over
+                task_status_response = await get_task(
+                    client, task_id, history_length=0, attributes=attributes
+                )
+                status = task_status_response["result"]["status"]["state"]
+                if status in FINAL_STATES:
+                    # Agents without artifacts answer in the history
+                    if not task_status_response["result"].get("artifacts"):
+                        task_status_response = await get_task(
+                            client, task_id, attributes=attributes
+                        )
+                    STAGE_TIME.record(
+                        (time.perf_counter() - sent) * 1000,
+                        {**attributes, "stage": "poll_wait"},
+                    )
+                    return status, task_status_response
+
+                await asyncio.sleep(0.5)
+        except asyncio.CancelledError:
+            # Nobody waits for the result anymore, stop the agent run so it
+            # frees its slot and stops spending tokens
+            await cancel_task(client, task_id)
+            raise
+
+
+async def cancel_task(client: A2AClient, task_id: str):
+    """Best effort A2A `tasks/cancel` for a task we stopped waiting for."""
+    payload = {
+        "jsonrpc": "2.0",
+        "id": str(uuid.uuid4()),
+        "method": "tasks/cancel",
+        "params": {"id": task_id},
+    }
+    try:
+        async with asyncio.timeout(CANCEL_TIMEOUT_SECONDS):
+            await client.http_client.post("/", json=payload)
+    except Exception as e:
+        print(f"[A2A] Failed to cancel task {task_id}: {e}")
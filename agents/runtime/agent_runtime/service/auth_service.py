@@ -1,18 +1,16 @@
 import httpx
-from fastapi import HTTPException
 from jose import jwk, jwt
 from jose.exceptions import JWTError
 
-from app.config.settings import get_settings
-from app.schema.auth import AuthResponse, TokenData
+from agent_runtime.schema.auth import AuthResponse, TokenData
 
 
 # Token validation function
-async def validate_token(token: str) -> AuthResponse:
+async def validate_token(token: str, jwks_url: str) -> AuthResponse:
     try:
         # Fetch JWKS
         async with httpx.AsyncClient() as client:
-            response = await client.get(get_settings().JWKS_URL)
+            response = await client.get(jwks_url)
             response.raise_for_status()
             jwks = response.json()
 
@@ -20,12 +18,12 @@ async def validate_token(token: str) -> AuthResponse:
         headers = jwt.get_unverified_headers(token)
         kid = headers.get("kid")
         if not kid:
-            raise HTTPException(status_code=401, detail="Token missing 'kid' header")
+            return AuthResponse(status_code=401, detail="Token missing 'kid' header")
 
         # Find the correct key in the JWKS
         key_data = next((key for key in jwks["keys"] if key["kid"] == kid), None)
         if not key_data:
-            raise HTTPException(
+            return AuthResponse(
                 status_code=401, detail="Matching key not found in JWKS"
             )
 
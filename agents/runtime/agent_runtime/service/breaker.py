@@ -0,0 +1,93 @@
+import time
+from collections import deque
+
+from agent_runtime.service.profiler import percentile
+
+CLOSED = "closed"
+HALF_OPEN = "half-open"
+OPEN = "open"
+# Value of each state on the breaker state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+# Latencies of the last N successful calls, the hedge delay is their p95
+LATENCY_WINDOW = 200
+
+
+class CircuitBreaker:
+    """Breaker over the outcome of the last `window` calls to an agent.
+
+    A call fails when it errors or takes longer than `slow_call_ms`. Once the
+    window holds `min_calls` calls and `failure_rate` of them failed, the
+    breaker opens and refuses calls for `open_seconds`. It then lets a single
+    probe through, closing again if the probe succeeds and reopening if not.
+    """
+
+    def __init__(
+        self,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_ms: float,
+        open_seconds: float,
+    ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_ms = slow_call_ms
+        self.open_seconds = open_seconds
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may go out now, taking the probe slot when half-open."""
+        if (
+            self.state == OPEN
+            and time.monotonic() - self.opened_at >= self.open_seconds
+        ):
+            self.state = HALF_OPEN
+            self.probing = False
+        if self.state == HALF_OPEN:
+            if self.probing:
+                return False
+            self.probing = True
+        return self.state != OPEN
+
+    def record(self, latency_ms: float, ok: bool | None) -> str:
+        """Count a finished call, None for one abandoned by the caller.
+
+        Returns the state after the call.
+        """
+        if ok is None:
+            # Nothing learned about the agent, give the probe slot back
+            self.probing = False
+            return self.state
+        failed = not ok or latency_ms > self.slow_call_ms
+        if ok:
+            self.latencies.append(latency_ms)
+        if self.state == HALF_OPEN:
+            self.probing = False
+            if failed:
+                self.trip()
+            else:
+                self.state = CLOSED
+        elif self.state == CLOSED:
+            self.outcomes.append(failed)
+            calls = len(self.outcomes)
+            if (
+                calls >= self.min_calls
+                and sum(self.outcomes) >= self.failure_rate * calls
+            ):
+                self.trip()
+        return self.state
+
+    def trip(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+
+    def p95(self) -> float | None:
+        """p95 latency of the recent successful calls, None until `min_calls`."""
+        if len(self.latencies) < self.min_calls:
+            return None
+        return percentile(sorted(self.latencies), 0.95)
@@ -0,0 +1,101 @@
+import math
+import re
+from collections import Counter
+
+# Characters of an agent's description kept in its catalog entry
+DESCRIPTION_CHARS = 160
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+WORD = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a about an and are as at be by can do does for from how i in is it me of "
+    "on or please tell that the this to using what when where which who why "
+    "with you your".split()
+)
+
+
+def words(text: str) -> list[str]:
+    return [word for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def short_description(description: str) -> str:
+    description = " ".join(description.split())
+    if len(description) <= DESCRIPTION_CHARS:
+        return description
+    return description[:DESCRIPTION_CHARS].rsplit(" ", 1)[0] + "..."
+
+
+def catalog_entry(card: dict) -> dict:
+    """Compact entry of an agent card: its name, skills and a short description."""
+    entry = {
+        "name": card.get("name", ""),
+        "description": short_description(card.get("description", "")),
+    }
+    skills = [skill.get("name") or skill.get("id") for skill in card.get("skills", [])]
+    if skills:
+        entry["skills"] = skills
+    return entry
+
+
+def card_text(card: dict) -> str:
+    """Everything an agent card says about what the agent can do."""
+    parts = [card.get("name", ""), card.get("description", "")]
+    for skill in card.get("skills", []):
+        parts.append(skill.get("name") or skill.get("id", ""))
+        parts.append(skill.get("description", ""))
+        parts.extend(skill.get("tags", []))
+        parts.extend(skill.get("examples", []))
+    return " ".join(parts)
+
+
+class AgentCatalog:
+    """Capability index over agent cards, ranking agents by relevance to a query.
+
+    Agents are scored with BM25 over the words of their name, description and
+    skills (with their tags and examples), and handed out as compact entries.
+    """
+
+    def __init__(self, cards: list[dict] | None = None):
+        self.load(cards or [])
+
+    def load(self, cards: list[dict]):
+        self.entries = [catalog_entry(card) for card in cards]
+        self.documents = [Counter(words(card_text(card))) for card in cards]
+        self.lengths = [sum(document.values()) for document in self.documents]
+        self.average_length = sum(self.lengths) / len(self.lengths) if cards else 0
+        # Agents by word, so a query only scores the agents sharing its words
+        self.postings: dict[str, list[int]] = {}
+        for index, document in enumerate(self.documents):
+            for word in document:
+                self.postings.setdefault(word, []).append(index)
+        self.idf = {
+            word: math.log(1 + (len(cards) - len(indexes) + 0.5) / (len(indexes) + 0.5))
+            for word, indexes in self.postings.items()
+        }
+
+    def search(self, query: str, k: int) -> list[dict]:
+        """Entries of the `k` agents most relevant to `query`, best first.
+
+        The whole catalog when it has at most `k` agents or `k` is 0. Agents
+        sharing no word with the query fill the remaining places in catalog
+        order, so a paraphrased query still gets `k` agents to pick from.
+        """
+        if k <= 0 or len(self.entries) <= k:
+            return list(self.entries)
+        scores: dict[int, float] = {}
+        for word in set(words(query)):
+            for index in self.postings.get(word, []):
+                tf = self.documents[index][word]
+                norm = BM25_K1 * (
+                    1 - BM25_B + BM25_B * self.lengths[index] / self.average_length
+                )
+                weight = self.idf[word] * tf * (BM25_K1 + 1) / (tf + norm)
+                scores[index] = scores.get(index, 0.0) + weight
+        ranked = sorted(scores, key=lambda index: (-scores[index], index))[:k]
+        for index in range(len(self.entries)):
+            if len(ranked) >= k:
+                break
+            if index not in scores:
+                ranked.append(index)
+        return [self.entries[index] for index in ranked]
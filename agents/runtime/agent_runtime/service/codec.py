@@ -0,0 +1,68 @@
+import hashlib
+import json
+
+import msgpack
+
+# Version of the packed envelope, written next to it in every entry
+ENVELOPE_VERSION = "2"
+# Field holding the packed task, entries without it are flat hashes (v1)
+ENVELOPE_FIELD = "env"
+# First character of a packed chat channel event, JSON events start with "{"
+EVENT_MARKER = "\x02"
+# Redis clients decode replies as UTF-8, packed bytes go through unchanged
+# with this error handler
+ENCODING_ERRORS = "surrogateescape"
+
+
+def token_ref(token: str) -> str:
+    """Short reference to a token, the same token always gets the same one."""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def token_key(ref: str) -> str:
+    """Redis key the chat server stores a referenced token under."""
+    return f"token:{ref}"
+
+
+def raw(value: str | bytes) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return value.encode("utf-8", ENCODING_ERRORS)
+
+
+def encode_task(task: dict, codec: str) -> dict:
+    """Stream entry fields of a task, packed unless the codec is "json"."""
+    if codec == "json":
+        return task
+    return {"v": ENVELOPE_VERSION, ENVELOPE_FIELD: msgpack.packb(task)}
+
+
+def decode_task(fields: dict) -> dict:
+    """Task of a stream entry, whichever codec wrote it."""
+    if ENVELOPE_FIELD not in fields:
+        return fields
+    if fields.get("v") != ENVELOPE_VERSION:
+        raise ValueError(f"Unknown envelope version {fields.get('v')}")
+    return msgpack.unpackb(raw(fields[ENVELOPE_FIELD]))
+
+
+def encode_event(event: dict, codec: str) -> str | bytes:
+    """Chat channel payload of an event, packed unless the codec is "json"."""
+    if codec == "json":
+        return json.dumps(event)
+    return EVENT_MARKER.encode() + msgpack.packb(event)
+
+
+def decode_event(data: str | bytes) -> dict | None:
+    """Event published on the chat channel, None for plain text messages."""
+    data = raw(data)
+    try:
+        if data.startswith(EVENT_MARKER.encode()):
+            event = msgpack.unpackb(data[1:])
+        elif data.startswith(b"{"):
+            event = json.loads(data)
+        else:
+            return None
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) else None
@@ -0,0 +1,40 @@
+import time
+
+import redis.asyncio as redis
+
+from agent_runtime.service.codec import decode_event
+
+
+def reply_stream(correlation_id: str) -> str:
+    """Stream the subtasks of one scatter-gather reply on."""
+    return f"reply:{correlation_id}"
+
+
+async def gather_replies(
+    client: redis.Redis, reply_to: str, expected: set[str], timeout: float
+) -> dict[str, dict]:
+    """Replies on `reply_to` by subtask id, once all `expected` are in.
+
+    Gives up after `timeout` seconds with the replies received so far. The
+    reply stream is deleted either way, late replies recreate it with a TTL.
+    """
+    replies: dict[str, dict] = {}
+    last_id = "0"
+    deadline = time.monotonic() + timeout
+    try:
+        while expected - replies.keys():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            response = await client.xread(
+                {reply_to: last_id}, block=max(1, int(remaining * 1000))
+            )
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    event = decode_event(fields.get("event", ""))
+                    if event and event.get("subtask_id") in expected:
+                        replies[event["subtask_id"]] = event
+    finally:
+        await client.delete(reply_to)
+    return replies
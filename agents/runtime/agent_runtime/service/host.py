@@ -0,0 +1,205 @@
+import asyncio
+import importlib
+import os
+import sys
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+
+import psutil
+import redis.asyncio as redis
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from agent_runtime.config.settings import HostSettings
+from agent_runtime.service.codec import ENCODING_ERRORS
+from agent_runtime.service.metrics import AGENT_RSS
+from agent_runtime.service.profiler import monitor_event_loop, profiler_routes
+from agent_runtime.service.prometheus import metrics
+from agent_runtime.service.resources import configure_logfire
+from agent_runtime.service.worker import AgentWorker, StreamReader, cancel_listener
+
+# Module of every agent project defining its `worker`
+AGENT_MODULE = "app.service.agent"
+
+
+def drop_app_modules():
+    """Forget the imported `app` package, every agent project uses that name."""
+    for name in [n for n in sys.modules if n == "app" or n.startswith("app.")]:
+        del sys.modules[name]
+
+
+def load_agent(project_dir: Path) -> AgentWorker:
+    """Import an agent project from its directory and return its worker.
+
+    The project's `.env` is read from its own directory, and its `app` modules
+    are dropped afterwards so the next project can be imported. The loaded
+    modules stay alive through the worker referencing them.
+    """
+    project_dir = project_dir.resolve()
+    cwd = os.getcwd()
+    drop_app_modules()
+    sys.path.insert(0, str(project_dir))
+    os.chdir(project_dir)
+    try:
+        worker = importlib.import_module(AGENT_MODULE).worker
+        # Its settings are read on first use, while in the project directory
+        worker.settings
+        return worker
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(str(project_dir))
+        drop_app_modules()
+
+
+def current_rss() -> int:
+    return psutil.Process().memory_info().rss
+
+
+class AgentHost:
+    """Runs several agents and their stream consumers in one process.
+
+    The agents share one Redis connection pool, one LLM provider per API key
+    and, when they use the same consumer group and name, a single
+    multi-stream XREADGROUP. Each A2A app is mounted under `/<agent name>`.
+    """
+
+    def __init__(self, project_dirs: list[Path], settings: HostSettings):
+        self.settings = settings
+        # Configured before the agents load so they all report as the host
+        configure_logfire(
+            settings.LOGFIRE_API_KEY,
+            settings.SERVICE_NAME,
+            settings.TRACE_SAMPLE_RATE,
+        )
+        self.redis = redis.from_url(
+            settings.REDIS_URL, decode_responses=True, encoding_errors=ENCODING_ERRORS
+        )
+        self.workers: list[AgentWorker] = []
+        # Resident memory each agent added while loading, in bytes
+        self.rss: dict[str, int] = {}
+        for project_dir in project_dirs:
+            before = current_rss()
+            worker = load_agent(project_dir)
+            self.rss[worker.name] = current_rss() - before
+            AGENT_RSS.set(self.rss[worker.name], {"agent": worker.name})
+            print(f"[App] Loaded {worker.name}, RSS +{self.rss[worker.name]}B")
+            # All the agents share one connection pool
+            worker.redis = self.redis
+            self.workers.append(worker)
+
+        self.app = Starlette(
+            routes=[
+                Route("/healthz", self.healthz, methods=["GET"]),
+                Route("/readyz", self.readyz, methods=["GET"]),
+                Route("/metrics", metrics, methods=["GET"]),
+                # Tokens are checked like the first agent checks them
+                *profiler_routes(lambda: self.workers[0].settings),
+                *(
+                    Mount(f"/{worker.name}", app=worker.a2a_app)
+                    for worker in self.workers
+                ),
+            ],
+            lifespan=self.lifespan,
+        )
+
+    async def healthz(self, request: Request) -> JSONResponse:
+        """Liveness: the dispatcher of every agent is still running."""
+        dead = [
+            w.name for w in self.workers if w.dispatch_task and w.dispatch_task.done()
+        ]
+        if dead:
+            return JSONResponse({"status": "dead", "agents": dead}, status_code=500)
+        return JSONResponse({"status": "alive"})
+
+    async def readyz(self, request: Request) -> JSONResponse:
+        """Readiness: every hosted agent is ready."""
+        checks = {worker.name: worker.ready_checks for worker in self.workers}
+        ready = all(all(c.values()) for c in checks.values())
+        return JSONResponse(
+            {"ready": ready, "checks": checks}, status_code=200 if ready else 503
+        )
+
+    def readers(self) -> list[StreamReader]:
+        """One reader per consumer group and name used by the agents."""
+        groups: dict[tuple[str, str], list[AgentWorker]] = {}
+        for worker in self.workers:
+            key = (worker.settings.GROUP_NAME, worker.settings.CONSUMER_NAME)
+            groups.setdefault(key, []).append(worker)
+        if len(groups) > 1:
+            print(
+                f"[Redis] Agents use {len(groups)} consumer groups, "
+                "reading them with one XREADGROUP each"
+            )
+        return [
+            StreamReader(self.redis, group, consumer, workers)
+            for (group, consumer), workers in groups.items()
+        ]
+
+    async def measure_startup(self, timeout: float) -> int:
+        """Start the agents one at a time and add the memory each one's startup
+        took (model, MCP servers, startup tasks) to `rss`, then stop them.
+
+        Streams aren't read, an agent counts as started once its other ready
+        checks pass or after `timeout` seconds. Returns the RSS with every
+        agent started.
+        """
+        async with AsyncExitStack() as stack:
+            for worker in self.workers:
+                before = current_rss()
+                await stack.enter_async_context(worker.a2a_lifespan(worker.a2a_app))
+                await worker.start(standalone=False)
+                stack.push_async_callback(worker.stop, False)
+                deadline = time.monotonic() + timeout
+                pending = [c for c, ok in worker.ready_checks.items() if not ok]
+                while set(pending) - {"streams"} and time.monotonic() < deadline:
+                    await asyncio.sleep(0.1)
+                    pending = [c for c, ok in worker.ready_checks.items() if not ok]
+                if set(pending) - {"streams"}:
+                    print(f"[App] {worker.name} not ready after {timeout}s: {pending}")
+                self.rss[worker.name] += current_rss() - before
+            total = current_rss()
+        await self.redis.close()
+        return total
+
+    @asynccontextmanager
+    async def lifespan(self, app: Starlette):
+        monitor = asyncio.create_task(
+            monitor_event_loop(
+                self.settings.LOOP_PROBE_INTERVAL_SECONDS,
+                self.settings.SLOW_CALLBACK_MS,
+            )
+        )
+        async with AsyncExitStack() as stack:
+            # Mounted apps don't get lifespan events, run each one here
+            for worker in self.workers:
+                await stack.enter_async_context(worker.a2a_lifespan(worker.a2a_app))
+                await worker.start(standalone=False)
+                stack.push_async_callback(worker.stop, False)
+
+            reader_tasks = [
+                asyncio.create_task(reader.run()) for reader in self.readers()
+            ]
+            listener_task = asyncio.create_task(
+                cancel_listener(
+                    self.redis, self.settings.CANCEL_CHANNEL_NAME, self.workers
+                )
+            )
+            print(f"[App] Hosting {', '.join(w.name for w in self.workers)}")
+            try:
+                yield
+            finally:
+                # Stop reading first, then drain every agent at once while
+                # cancellations are still delivered
+                for task in reader_tasks:
+                    task.cancel()
+                await asyncio.gather(*reader_tasks, return_exceptions=True)
+                await asyncio.gather(*(worker.drain() for worker in self.workers))
+                listener_task.cancel()
+                await asyncio.gather(listener_task, return_exceptions=True)
+        await self.redis.close()
+        print("[App] Redis client closed")
+        monitor.cancel()
+        await asyncio.gather(monitor, return_exceptions=True)
@@ -0,0 +1,145 @@
+import logfire
+
+# Tasks dropped because their deadline passed before or while being processed
+TASKS_EXPIRED = logfire.metric_counter(
+    "agent_tasks_expired",
+    unit="1",
+    description="Tasks dropped by the agent because their deadline passed",
+)
+
+# Tasks skipped or interrupted because the user session went away
+TASKS_CANCELLED = logfire.metric_counter(
+    "agent_tasks_cancelled",
+    unit="1",
+    description="Tasks skipped or interrupted because their session was closed",
+)
+
+# Time entries spend in a lane before the scheduler dispatches them
+LANE_WAIT_TIME = logfire.metric_histogram(
+    "agent_lane_wait_time",
+    unit="ms",
+    description="Time between enqueue and dispatch of a task, per lane",
+)
+
+# Unread plus buffered entries per lane
+LANE_BACKLOG = logfire.metric_gauge(
+    "agent_lane_backlog",
+    unit="1",
+    description="Tasks waiting to be dispatched, per lane",
+)
+
+# Size of every task stream, reported periodically
+STREAM_LENGTH = logfire.metric_gauge(
+    "agent_stream_length",
+    unit="1",
+    description="Entries in the task stream",
+)
+STREAM_PENDING = logfire.metric_gauge(
+    "agent_stream_pending",
+    unit="1",
+    description="Entries read by the consumer group but not acknowledged yet",
+)
+STREAM_LAG = logfire.metric_gauge(
+    "agent_stream_lag",
+    unit="1",
+    description="Entries not delivered to the consumer group yet",
+)
+STREAM_MEMORY = logfire.metric_gauge(
+    "agent_stream_memory",
+    unit="By",
+    description="Redis memory used by the task stream",
+)
+
+# Tasks holding one of the agent's concurrency slots, out of how many
+TASKS_IN_FLIGHT = logfire.metric_gauge(
+    "agent_tasks_in_flight",
+    unit="1",
+    description="Tasks being processed, each holding a concurrency slot",
+)
+TASK_SLOTS = logfire.metric_gauge(
+    "agent_task_slots",
+    unit="1",
+    description="Tasks the agent processes concurrently at most",
+)
+
+# Time spent in each stage of a task: auth, llm, a2a_send, poll_wait, publish,
+# and catalog for the orchestrator picking the agents of its prompt
+STAGE_TIME = logfire.metric_histogram(
+    "agent_stage_time",
+    unit="ms",
+    description="Time spent in each stage of processing a task",
+)
+
+# Size of the task responses read while waiting for an A2A task
+POLL_BYTES = logfire.metric_histogram(
+    "agent_poll_bytes",
+    unit="By",
+    description="Bytes of each A2A task response read while polling",
+)
+
+# Circuit breaker of each agent: 0 closed, 1 half-open, 2 open
+BREAKER_STATE = logfire.metric_gauge(
+    "agent_breaker_state",
+    unit="1",
+    description="State of the agent's circuit breaker, 0 closed 1 half-open 2 open",
+)
+BREAKER_REJECTED = logfire.metric_counter(
+    "agent_breaker_rejected",
+    unit="1",
+    description="Tasks failed fast because the agent's circuit breaker was open",
+)
+
+# Duplicate tasks sent after the p95 latency, and which copy answered first
+HEDGES_SENT = logfire.metric_counter(
+    "agent_hedges_sent",
+    unit="1",
+    description="Duplicate tasks sent to another replica after the p95 latency",
+)
+HEDGE_WINS = logfire.metric_counter(
+    "agent_hedge_wins",
+    unit="1",
+    description="Hedged tasks answered first, by the primary or the hedge copy",
+)
+
+# Resident memory each agent added to a host process while loading
+AGENT_RSS = logfire.metric_gauge(
+    "agent_host_rss",
+    unit="By",
+    description="Resident memory added by loading the agent into the host",
+)
+
+# Worker processes the supervisor runs per agent, and the backlog it scales on
+AGENT_WORKERS = logfire.metric_gauge(
+    "agent_supervisor_workers",
+    unit="1",
+    description="Worker processes running for the agent",
+)
+AGENT_BACKLOG = logfire.metric_gauge(
+    "agent_supervisor_backlog",
+    unit="1",
+    description="Unread plus pending entries across the agent's lane streams",
+)
+
+# How much later than scheduled the event loop ran a probe callback
+EVENT_LOOP_LAG = logfire.metric_histogram(
+    "agent_event_loop_lag",
+    unit="ms",
+    description="Delay of the event loop in running a scheduled callback",
+)
+EVENT_LOOP_BLOCKED = logfire.metric_counter(
+    "agent_event_loop_blocked",
+    unit="1",
+    description="Times the event loop lagged more than SLOW_CALLBACK_MS",
+)
+
+# Agent catalog in the orchestrator's prompt, out of the registered agents
+CATALOG_PROMPT_BYTES = logfire.metric_histogram(
+    "agent_catalog_prompt_bytes",
+    unit="By",
+    description="Bytes of the agent catalog put in a model request",
+)
+CATALOG_AGENTS = logfire.metric_histogram(
+    "agent_catalog_agents",
+    unit="1",
+    description="Agents of the catalog put in a model request",
+)
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from pydantic import BaseModel
+
+
+class PlanStep(BaseModel):
+    id: str
+    agent_name: str
+    query: str
+    # Steps whose answers this one needs
+    depends_on: list[str] = []
+
+
+# Runs a step given the answers of its dependencies, returns its result with
+# at least a "status", "completed" when the step answered
+StepRunner = Callable[[PlanStep, dict[str, str]], Awaitable[dict]]
+
+
+def plan_order(steps: list[PlanStep]) -> list[PlanStep]:
+    """Steps in an order running every step after its dependencies.
+
+    Raises ValueError for duplicate ids, unknown dependencies and cycles.
+    """
+    by_id = {step.id: step for step in steps}
+    if len(by_id) != len(steps):
+        raise ValueError("Step ids must be unique")
+    for step in steps:
+        unknown = set(step.depends_on) - by_id.keys()
+        if unknown:
+            raise ValueError(f"Step {step.id} depends on unknown steps {unknown}")
+
+    ordered: list[PlanStep] = []
+    done: set[str] = set()
+    left = list(steps)
+    while left:
+        ready = [step for step in left if done.issuperset(step.depends_on)]
+        if not ready:
+            raise ValueError(f"Steps {[step.id for step in left]} form a cycle")
+        ordered.extend(ready)
+        done.update(step.id for step in ready)
+        left = [step for step in left if step.id not in done]
+    return ordered
+
+
+async def attempt_step(
+    step: PlanStep, inputs: dict[str, str], runner: StepRunner
+) -> dict:
+    try:
+        return await runner(step, inputs)
+    except Exception as e:
+        return {"status": "failed", "message": str(e)}
+
+
+async def execute_plan(
+    steps: list[PlanStep], runner: StepRunner, timeout: float
+) -> dict[str, dict]:
+    """Run a plan, every step as soon as its dependencies completed.
+
+    Independent steps run concurrently and each step gets the answers of its
+    dependencies. Steps whose dependencies didn't complete are "skipped", and
+    once `timeout` seconds have passed the running steps are cancelled as
+    "timeout". Returns the result of every step by id.
+    """
+    plan_order(steps)
+    results: dict[str, dict] = {}
+    waiting = list(steps)
+    running: dict[asyncio.Task, str] = {}
+    deadline = time.monotonic() + timeout
+    try:
+        while waiting or running:
+            for step in list(waiting):
+                upstream = [results.get(dep) for dep in step.depends_on]
+                if any(r is not None and r["status"] != "completed" for r in upstream):
+                    results[step.id] = {"status": "skipped"}
+                elif all(r is not None for r in upstream):
+                    inputs = {
+                        dep: results[dep].get("answer", "") for dep in step.depends_on
+                    }
+                    task = asyncio.create_task(attempt_step(step, inputs, runner))
+                    running[task] = step.id
+                else:
+                    continue
+                waiting.remove(step)
+            if not running:
+                continue
+            done, _ = await asyncio.wait(
+                running,
+                timeout=max(0, deadline - time.monotonic()),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for task in done:
+                results[running.pop(task)] = task.result()
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+    for step_id in running.values():
+        results[step_id] = {"status": "timeout"}
+    for step in waiting:
+        results.setdefault(step.id, {"status": "timeout"})
+    return results
@@ -0,0 +1,255 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from agent_runtime.config.settings import WorkerSettings
+from agent_runtime.service.auth_service import validate_token
+from agent_runtime.service.metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG
+
+# Longest profile one request may ask for
+MAX_PROFILE_SECONDS = 60
+# One profile at a time, a second request gets a 409
+PROFILE_LOCK = threading.Lock()
+# Lag samples the percentiles are computed over, the last N probes
+LAG_WINDOW = 1000
+LAG_SAMPLES: deque[float] = deque(maxlen=LAG_WINDOW)
+# Latest times the loop was blocked, with the stack it was blocked in
+BLOCKED_CALLS: deque[dict] = deque(maxlen=20)
+# When the probe last ran on the loop, read by the watchdog thread
+LAST_TICK = 0.0
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def frame_stack(frame) -> list[str]:
+    """Labels of a thread's frames, outermost first."""
+    stack = []
+    while frame is not None:
+        stack.append(frame_label(frame))
+        frame = frame.f_back
+    return stack[::-1]
+
+
+def sample_stacks(seconds: float, interval: float) -> Counter:
+    """Sample the stack of every other thread until `seconds` have passed.
+
+    Nothing is hooked into the interpreter, the only cost is this thread
+    waking up every `interval` while a profile runs.
+    """
+    own = threading.get_ident()
+    samples: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            thread = names.get(ident, str(ident)).replace(";", ":")
+            samples[";".join([thread, *frame_stack(frame)])] += 1
+        time.sleep(interval)
+    return samples
+
+
+async def profile(seconds: float, interval: float) -> str:
+    """Collapsed stacks of the process, one `stack count` line each.
+
+    The sampler runs in a thread, so the event loop keeps serving while it
+    is being profiled, a starved loop shows up as stacks outside `select`.
+    """
+    samples = await asyncio.to_thread(sample_stacks, seconds, interval)
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+def await_chain(awaitable) -> list[str]:
+    """Where a coroutine is suspended, down to what it is waiting on."""
+    chain = []
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(
+            awaitable, "ag_frame", None
+        )
+        if frame is None:
+            frame = getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            # A future or another object without a frame, e.g. a socket read
+            chain.append(repr(awaitable)[:200])
+            break
+        chain.append(frame_label(frame))
+        awaitable = (
+            getattr(awaitable, "cr_await", None)
+            or getattr(awaitable, "ag_await", None)
+            or getattr(awaitable, "gi_yieldfrom", None)
+        )
+    return chain
+
+
+def task_dump() -> list[dict]:
+    """Every task of the running loop with its current await points."""
+    return [
+        {
+            "name": task.get_name(),
+            "coro": getattr(task.get_coro(), "__qualname__", repr(task.get_coro())),
+            "awaiting": await_chain(task.get_coro()),
+        }
+        for task in asyncio.all_tasks()
+    ]
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ordered sample."""
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return round(ordered[index], 3)
+
+
+def watch_for_blocks(loop_thread: int, stalled_after: float, stop: threading.Event):
+    """Take the loop thread's stack whenever the probe is late by `stalled_after`.
+
+    One stack is kept per stall, taken while the blocking code still runs.
+    """
+    reported = None
+    while not stop.wait(stalled_after / 4):
+        tick = LAST_TICK
+        stalled = time.monotonic() - tick
+        if stalled < stalled_after or tick == reported:
+            continue
+        frame = sys._current_frames().get(loop_thread)
+        if frame is None:
+            continue
+        reported = tick
+        BLOCKED_CALLS.append(
+            {"at": time.time(), "tick": tick, "stack": frame_stack(frame)}
+        )
+
+
+async def monitor_event_loop(
+    interval: float,
+    slow_callback_ms: float,
+    lag_histogram=EVENT_LOOP_LAG,
+    blocked_counter=EVENT_LOOP_BLOCKED,
+):
+    """Measure how late the loop wakes up and catch the callbacks blocking it.
+
+    A probe sleeps `interval` seconds over and over, how much later than
+    asked it wakes up is the scheduling lag. A watchdog thread takes the
+    stack of the loop when the probe hasn't run for `slow_callback_ms`
+    longer than it should, the stall is reported once the loop is back.
+    The lag and the stalls are recorded on the given instruments, the
+    agents' by default.
+    """
+    global LAST_TICK
+    LAST_TICK = time.monotonic()
+    stop = threading.Event()
+    watchdog = threading.Thread(
+        target=watch_for_blocks,
+        args=(threading.get_ident(), interval + slow_callback_ms / 1000, stop),
+        name="loop-watchdog",
+        daemon=True,
+    )
+    watchdog.start()
+    try:
+        while True:
+            tick = LAST_TICK
+            await asyncio.sleep(interval)
+            LAST_TICK = time.monotonic()
+            lag = max(0.0, (LAST_TICK - tick - interval) * 1000)
+            LAG_SAMPLES.append(lag)
+            lag_histogram.record(lag)
+            if lag < slow_callback_ms:
+                continue
+            blocked_counter.add(1)
+            blocked = BLOCKED_CALLS[-1] if BLOCKED_CALLS else None
+            if blocked and blocked["tick"] == tick:
+                blocked["lag_ms"] = round(lag, 3)
+                stack = "\n    ".join(blocked["stack"][-10:])
+                print(f"[App] Event loop blocked for {lag:.0f}ms in:\n    {stack}")
+            else:
+                print(f"[App] Event loop lagged {lag:.0f}ms")
+    finally:
+        stop.set()
+
+
+def loop_report() -> dict:
+    """Lag percentiles over the last LAG_WINDOW probes and the recent stalls."""
+    ordered = sorted(LAG_SAMPLES)
+    lag = {"count": len(ordered)}
+    if ordered:
+        lag.update(
+            {
+                "p50": percentile(ordered, 0.5),
+                "p95": percentile(ordered, 0.95),
+                "p99": percentile(ordered, 0.99),
+                "max": round(ordered[-1], 3),
+            }
+        )
+    return {
+        "lag_ms": lag,
+        "blocked": [
+            {key: value for key, value in call.items() if key != "tick"}
+            for call in BLOCKED_CALLS
+        ],
+    }
+
+
+def profiler_routes(settings: Callable[[], WorkerSettings]) -> list[Route]:
+    """Admin endpoints profiling the process, for callers with the settings'
+    admin role. The settings are read per request, not when the app is built."""
+
+    async def authorize(request: Request) -> JSONResponse | None:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return JSONResponse({"detail": "Not authenticated"}, status_code=401)
+        auth = await validate_token(token=token, jwks_url=settings().JWKS_URL)
+        if auth.status_code != 200:
+            return JSONResponse({"detail": auth.detail}, status_code=auth.status_code)
+        if settings().ADMIN_ROLE not in auth.detail.roles:
+            return JSONResponse({"detail": "Not authorized"}, status_code=403)
+        return None
+
+    async def profile_endpoint(request: Request):
+        """Sample the process for `seconds`, every `interval_ms`."""
+        if denied := await authorize(request):
+            return denied
+        try:
+            seconds = float(request.query_params.get("seconds", 10))
+            interval = float(request.query_params.get("interval_ms", 5)) / 1000
+        except ValueError:
+            return JSONResponse({"detail": "Invalid parameters"}, status_code=422)
+        if not 0 < seconds <= MAX_PROFILE_SECONDS or interval <= 0:
+            return JSONResponse(
+                {"detail": f"seconds must be in (0, {MAX_PROFILE_SECONDS}]"},
+                status_code=422,
+            )
+        if not PROFILE_LOCK.acquire(blocking=False):
+            return JSONResponse({"detail": "Already profiling"}, status_code=409)
+        try:
+            return PlainTextResponse(await profile(seconds, interval))
+        finally:
+            PROFILE_LOCK.release()
+
+    async def tasks_endpoint(request: Request):
+        """Asyncio tasks of the process and where each one is waiting."""
+        if denied := await authorize(request):
+            return denied
+        return JSONResponse(task_dump())
+
+    async def loop_endpoint(request: Request):
+        """Event loop lag percentiles and the stacks it was recently blocked in."""
+        if denied := await authorize(request):
+            return denied
+        return JSONResponse(loop_report())
+
+    return [
+        Route("/debug/profile", profile_endpoint, methods=["GET"]),
+        Route("/debug/tasks", tasks_endpoint, methods=["GET"]),
+        Route("/debug/loop", loop_endpoint, methods=["GET"]),
+    ]
@@ -0,0 +1,136 @@
+import re
+
+from opentelemetry.sdk.metrics.export import (
+    ExponentialHistogram,
+    Gauge,
+    Histogram,
+    InMemoryMetricReader,
+    Sum,
+)
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+# Reader handed to logfire, every metric of the process is scraped from it
+METRICS_READER = InMemoryMetricReader()
+
+# Upper bounds of the histogram buckets, most histograms are in milliseconds
+HISTOGRAM_BUCKETS = (
+    1,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    30000,
+    60000,
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+
+
+def labels(attributes: dict, **extra) -> str:
+    pairs = {**{metric_name(k): v for k, v in attributes.items()}, **extra}
+    if not pairs:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in pairs.values()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(pairs, escaped)) + "}"
+
+
+def exponential_buckets(point) -> list[int]:
+    """Cumulative counts of an exponential histogram at HISTOGRAM_BUCKETS.
+
+    Logfire aggregates every histogram into exponential buckets, an
+    exponential bucket is counted once its upper bound is within the bound.
+    """
+    base = 2 ** (2**-point.scale)
+    # Zero and negative values are below every bound
+    below = point.zero_count + sum(point.negative.bucket_counts)
+    counts = []
+    for bound in HISTOGRAM_BUCKETS:
+        count = below
+        for index, bucket_count in enumerate(point.positive.bucket_counts):
+            if base ** (point.positive.offset + index + 1) > bound * (1 + 1e-9):
+                break
+            count += bucket_count
+        counts.append(count)
+    return counts
+
+
+def explicit_buckets(point) -> list[int]:
+    """Cumulative counts of an explicit bucket histogram at HISTOGRAM_BUCKETS."""
+    counts = []
+    for bound in HISTOGRAM_BUCKETS:
+        counts.append(
+            sum(
+                count
+                for upper, count in zip(point.explicit_bounds, point.bucket_counts)
+                if upper <= bound
+            )
+        )
+    return counts
+
+
+def render_metrics() -> str:
+    """Every metric recorded in the process, in the Prometheus text format."""
+    data = METRICS_READER.get_metrics_data()
+    lines = []
+    for resource_metrics in data.resource_metrics if data else []:
+        for scope_metrics in resource_metrics.scope_metrics:
+            for metric in scope_metrics.metrics:
+                name = metric_name(metric.name)
+                points = metric.data.data_points
+                if metric.description:
+                    lines.append(f"# HELP {name} {metric.description}")
+
+                if isinstance(metric.data, Sum) and metric.data.is_monotonic:
+                    lines.append(f"# TYPE {name} counter")
+                    if not name.endswith("_total"):
+                        name = f"{name}_total"
+                    for point in points:
+                        lines.append(f"{name}{labels(point.attributes)} {point.value}")
+
+                elif isinstance(metric.data, (Sum, Gauge)):
+                    lines.append(f"# TYPE {name} gauge")
+                    for point in points:
+                        lines.append(f"{name}{labels(point.attributes)} {point.value}")
+
+                elif isinstance(metric.data, (Histogram, ExponentialHistogram)):
+                    lines.append(f"# TYPE {name} histogram")
+                    for point in points:
+                        buckets = (
+                            exponential_buckets(point)
+                            if isinstance(metric.data, ExponentialHistogram)
+                            else explicit_buckets(point)
+                        )
+                        for bound, count in zip(HISTOGRAM_BUCKETS, buckets):
+                            lines.append(
+                                f"{name}_bucket{labels(point.attributes, le=bound)} {count}"
+                            )
+                        lines.append(
+                            f"{name}_bucket{labels(point.attributes, le='+Inf')} {point.count}"
+                        )
+                        lines.append(
+                            f"{name}_sum{labels(point.attributes)} {point.sum}"
+                        )
+                        lines.append(
+                            f"{name}_count{labels(point.attributes)} {point.count}"
+                        )
+    return "\n".join(lines) + "\n"
+
+
+def metrics(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint, run in a thread as collecting calls psutil."""
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
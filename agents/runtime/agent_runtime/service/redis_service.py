@@ -0,0 +1,114 @@
+import time
+
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+
+from agent_runtime.config.settings import WorkerSettings
+
+# Lane the tasks land in when the chat server didn't pick one
+DEFAULT_LANE = "interactive"
+# Reason attached to cancellations triggered by a closed session
+SESSION_CLOSED = "session-closed"
+
+
+def lane_stream(topic_name: str, lane: str) -> str:
+    """Stream holding the tasks of one lane, the default lane keeps the plain topic."""
+    if lane == DEFAULT_LANE:
+        return topic_name
+    return f"{topic_name}:{lane}"
+
+
+def cancel_key(session_id: str, task_id: str) -> str:
+    """Redis key set by the chat server once a task is cancelled."""
+    return f"cancel:{session_id}:{task_id}"
+
+
+def breaker_key(agent_name: str) -> str:
+    """Redis key set while the agent's circuit breaker is open."""
+    return f"breaker:{agent_name}"
+
+
+def answer_key(agent_name: str, task_id: str) -> str:
+    """Redis key claimed by the copy of a hedged task that answers first."""
+    return f"answer:{agent_name}:{task_id}"
+
+
+def remaining_budget(msg_data: dict) -> float | None:
+    """Seconds left until the task deadline, None if the task has no deadline."""
+    deadline = msg_data.get("deadline")
+    if not deadline:
+        return None
+    return float(deadline) - time.time()
+
+
+def trim_policy(settings: WorkerSettings) -> dict:
+    """XADD trimming arguments for the configured retention policy.
+
+    Producers share it too, the chat server passes its own settings with the
+    same STREAM_MAXLEN and STREAM_RETENTION_SECONDS.
+    """
+    retention = settings.STREAM_RETENTION_SECONDS
+    if retention:
+        oldest_ms = int((time.time() - retention) * 1000)
+        return {"minid": f"{oldest_ms}-0", "approximate": True}
+    return {"maxlen": settings.STREAM_MAXLEN, "approximate": True}
+
+
+# To check wheather the exist or not
+async def ensure_group(client: redis.Redis, stream: str, group_name: str):
+    try:
+        # Create group only if it doesn't exist
+        await client.xgroup_create(stream, group_name, id="0", mkstream=True)
+        print(f"Task Group Created Successfully for {stream}!")
+    except ResponseError as e:
+        # Check for the specific error when the group already exists
+        if "BUSYGROUP" in str(e):
+            pass
+        else:
+            raise  # re-raise unexpected errors
+
+
+async def requeue_pending(
+    client: redis.Redis,
+    stream: str,
+    group_name: str,
+    consumer_name: str,
+    settings: WorkerSettings,
+) -> int:
+    """Hand the pending entries of a consumer back to its group.
+
+    Each entry is added again at the end of the stream, where any consumer
+    of the group reads it, and the original is acknowledged and deleted.
+    Returns the number of entries handed back.
+    """
+    requeued = 0
+    while True:
+        try:
+            pending = await client.xpending_range(
+                stream,
+                group_name,
+                min="-",
+                max="+",
+                count=100,
+                consumername=consumer_name,
+            )
+        except ResponseError as e:
+            # A group never created holds nothing to hand back
+            if "NOGROUP" not in str(e):
+                raise
+            return requeued
+        if not pending:
+            return requeued
+        async with client.pipeline(transaction=False) as pipe:
+            for entry in pending:
+                pipe.xrange(stream, min=entry["message_id"], max=entry["message_id"])
+            entries = await pipe.execute()
+        async with client.pipeline(transaction=False) as pipe:
+            for entry, found in zip(pending, entries):
+                # Entries already trimmed away are only acknowledged
+                for _, msg_data in found:
+                    pipe.xadd(stream, msg_data, **trim_policy(settings))
+                    requeued += 1
+                pipe.xack(stream, group_name, entry["message_id"])
+                pipe.xdel(stream, entry["message_id"])
+            await pipe.execute()
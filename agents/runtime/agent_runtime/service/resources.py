@@ -0,0 +1,82 @@
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import logfire
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter
+from pydantic_ai.models.wrapper import WrapperModel
+
+from agent_runtime.service.metrics import STAGE_TIME
+from agent_runtime.service.prometheus import METRICS_READER
+
+# Service name logfire was configured with, agents hosted together share it
+LOGFIRE_SERVICE: str | None = None
+
+
+def configure_logfire(
+    token: str,
+    service_name: str,
+    sample_rate: float = 1.0,
+    span_exporter: SpanExporter | None = None,
+):
+    """Configure logfire and its instrumentation once per process.
+
+    Tests configure it first with an in-memory `span_exporter`, later calls
+    keep that configuration.
+    """
+    global LOGFIRE_SERVICE
+    if LOGFIRE_SERVICE is not None:
+        return
+    LOGFIRE_SERVICE = service_name
+    logfire.configure(
+        token=token,
+        service_name=service_name,
+        # Head sampling, traces continued from another service follow its decision
+        sampling=logfire.SamplingOptions(head=sample_rate),
+        # Also kept in process for the /metrics endpoint
+        metrics=logfire.MetricsOptions(additional_readers=[METRICS_READER]),
+        additional_span_processors=(
+            [SimpleSpanProcessor(span_exporter)] if span_exporter else None
+        ),
+    )
+    logfire.instrument_pydantic_ai()
+    logfire.instrument_system_metrics(base="full")
+
+
+@lru_cache
+def google_provider(api_key: str):
+    """Provider, and its HTTP pool, shared by every agent using the same key."""
+    # The google SDK is slow to import, only pay for it once the agent starts
+    from pydantic_ai.providers.google import GoogleProvider
+
+    return GoogleProvider(api_key=api_key)
+
+
+def google_model(model_name: str, api_key: str):
+    from pydantic_ai.models.google import GoogleModel
+
+    return GoogleModel(model_name, provider=google_provider(api_key))
+
+
+class TimedModel(WrapperModel):
+    """Records the time of every model request as the `llm` stage."""
+
+    def __init__(self, wrapped, attributes: dict):
+        super().__init__(wrapped)
+        self.attributes = {**attributes, "stage": "llm"}
+
+    async def request(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self.wrapped.request(*args, **kwargs)
+        finally:
+            STAGE_TIME.record((time.perf_counter() - started) * 1000, self.attributes)
+
+    @asynccontextmanager
+    async def request_stream(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            async with self.wrapped.request_stream(*args, **kwargs) as stream:
+                yield stream
+        finally:
+            STAGE_TIME.record((time.perf_counter() - started) * 1000, self.attributes)
@@ -0,0 +1,50 @@
+from collections import deque
+from typing import Any
+
+
+class DeficitRoundRobin:
+    """Deficit round robin over the buffered entries of each lane.
+
+    Every time the scheduler visits a lane it grants the lane its weight as
+    quantum, each dispatched entry costs one unit. A lane with weight 4 is
+    therefore served four times as often as a lane with weight 1 while both
+    have a backlog, and an idle lane never accumulates credit.
+    """
+
+    def __init__(self, weights: dict[str, int]):
+        if not weights or any(weight < 1 for weight in weights.values()):
+            raise ValueError("Every lane needs a weight of at least 1")
+        self.weights = weights
+        self.queues: dict[str, deque] = {lane: deque() for lane in weights}
+        self.deficits: dict[str, int] = {lane: 0 for lane in weights}
+        self._lanes = list(weights)
+        # Start on the last lane, so the first lane gets the first quantum
+        self._cursor = len(self._lanes) - 1
+
+    def push(self, lane: str, item: Any):
+        self.queues[lane].append(item)
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def pop(self) -> tuple[str, Any] | None:
+        """Next (lane, item) to dispatch, None when every lane is empty."""
+        if not self.pending():
+            return None
+        while True:
+            lane = self._lanes[self._cursor]
+            queue = self.queues[lane]
+            if queue and self.deficits[lane] >= 1:
+                self.deficits[lane] -= 1
+                item = queue.popleft()
+                if not queue:
+                    self.deficits[lane] = 0
+                return lane, item
+
+            # Lane is out of credit or empty, move on and grant the next one
+            if not queue:
+                self.deficits[lane] = 0
+            self._cursor = (self._cursor + 1) % len(self._lanes)
+            next_lane = self._lanes[self._cursor]
+            if self.queues[next_lane]:
+                self.deficits[next_lane] += self.weights[next_lane]
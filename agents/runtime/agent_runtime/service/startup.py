@@ -0,0 +1,93 @@
+import builtins
+import sys
+import threading
+import time
+
+# Only the standard library here, this module is imported before anything else
+
+# Seconds spent importing each module, itself and including its own imports
+IMPORT_TIMES: dict[str, tuple[float, float]] = {}
+# Seconds since process start at which each startup milestone was reached
+MILESTONES: dict[str, float] = {}
+
+ORIGINAL_IMPORT = builtins.__import__
+# Modules being imported right now, with their start time and child time
+IMPORT_STACK: list[list] = []
+
+
+def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if (
+        level
+        or name in sys.modules
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        return ORIGINAL_IMPORT(name, globals, locals, fromlist, level)
+    frame = [time.perf_counter(), 0.0]
+    IMPORT_STACK.append(frame)
+    try:
+        return ORIGINAL_IMPORT(name, globals, locals, fromlist, level)
+    finally:
+        IMPORT_STACK.pop()
+        total = time.perf_counter() - frame[0]
+        IMPORT_TIMES[name] = (total - frame[1], total)
+        if IMPORT_STACK:
+            IMPORT_STACK[-1][1] += total
+
+
+# Seconds after which imports stop being timed, should startup never be reported
+IMPORT_TIMER_TIMEOUT_SECONDS = 120
+
+
+def install_import_timer(timeout: float = IMPORT_TIMER_TIMEOUT_SECONDS):
+    """Time every module imported from now on, until startup is reported or
+    `timeout` seconds passed.
+
+    Called by the service's entry module, so only the services themselves
+    replace `__import__`, not every process importing the runtime.
+    """
+    builtins.__import__ = timed_import
+    timer = threading.Timer(timeout, uninstall_import_timer)
+    timer.daemon = True
+    timer.start()
+
+
+def uninstall_import_timer():
+    builtins.__import__ = ORIGINAL_IMPORT
+
+
+def since_process_start() -> float:
+    import psutil
+
+    return time.time() - psutil.Process().create_time()
+
+
+def mark(milestone: str) -> float:
+    """Record a startup milestone once, returns its time since process start."""
+    if milestone not in MILESTONES:
+        MILESTONES[milestone] = since_process_start()
+    return MILESTONES[milestone]
+
+
+def startup_profile(top: int = 10) -> dict:
+    """Milestones and the slowest imports, by time including their own imports."""
+    slowest = sorted(IMPORT_TIMES.items(), key=lambda item: item[1][1], reverse=True)
+    return {
+        "milestones": {name: round(at, 3) for name, at in MILESTONES.items()},
+        "imports": {
+            name: {"self": round(own, 3), "total": round(total, 3)}
+            for name, (own, total) in slowest[:top]
+        },
+    }
+
+
+def report_startup(service_name: str):
+    """Print the startup profile and stop timing imports."""
+    uninstall_import_timer()
+    profile = startup_profile()
+    print(f"[App] Startup profile of {service_name}:")
+    for name, at in profile["milestones"].items():
+        print(f"    {name:<24}{at:>8.3f}s")
+    for name, times in profile["imports"].items():
+        print(
+            f"    import {name:<40}{times['total']:>8.3f}s (self {times['self']:.3f}s)"
+        )
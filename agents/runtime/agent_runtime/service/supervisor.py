@@ -0,0 +1,184 @@
+import asyncio
+import itertools
+import math
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import redis.asyncio as redis
+
+from agent_runtime.config.settings import SupervisorSettings, WorkerSettings
+from agent_runtime.service.codec import ENCODING_ERRORS
+from agent_runtime.service.metrics import AGENT_BACKLOG, AGENT_WORKERS
+from agent_runtime.service.redis_service import lane_stream, requeue_pending
+from agent_runtime.service.resources import configure_logfire
+
+
+class AgentPool:
+    """Worker processes of one agent and the lane streams they consume."""
+
+    def __init__(self, project_dir: Path):
+        self.project_dir = project_dir.resolve()
+        # Same settings the workers load, read without importing the agent
+        self.settings = WorkerSettings(_env_file=self.project_dir / ".env")
+        self.name = self.settings.TOPIC_NAME
+        self.group_name = self.settings.GROUP_NAME
+        self.streams = [
+            lane_stream(self.name, lane) for lane in self.settings.LANE_WEIGHTS
+        ]
+        # Running worker processes by consumer name, oldest first
+        self.workers: dict[str, asyncio.subprocess.Process] = {}
+        # When the backlog last dropped below what one worker less could handle
+        self.low_since: float | None = None
+
+
+class Supervisor:
+    """Runs worker processes per agent and scales them by stream backlog.
+
+    Every worker is a single-agent host with its own consumer name. Workers
+    being retired get a drain timeout to finish their tasks, then whatever
+    they left pending is handed back to the group so no entry is stranded.
+    """
+
+    def __init__(self, project_dirs: list[Path], settings: SupervisorSettings):
+        self.settings = settings
+        configure_logfire(
+            settings.LOGFIRE_API_KEY,
+            settings.SERVICE_NAME,
+            settings.TRACE_SAMPLE_RATE,
+        )
+        self.redis = redis.from_url(
+            settings.REDIS_URL, decode_responses=True, encoding_errors=ENCODING_ERRORS
+        )
+        self.pools = [AgentPool(project_dir) for project_dir in project_dirs]
+        self.ports = itertools.count(settings.BASE_PORT)
+
+    async def spawn(self, pool: AgentPool):
+        """Start one more worker for the agent under a fresh consumer name."""
+        consumer_name = f"{pool.settings.CONSUMER_NAME}-{uuid.uuid4().hex[:8]}"
+        port = next(self.ports)
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "agent_runtime.main",
+            "host",
+            str(pool.project_dir),
+            "--port",
+            str(port),
+            env={
+                **os.environ,
+                # The worker hosts the agent with the supervisor's own settings
+                "REDIS_URL": self.settings.REDIS_URL,
+                "LOGFIRE_API_KEY": self.settings.LOGFIRE_API_KEY,
+                "CANCEL_CHANNEL_NAME": self.settings.CANCEL_CHANNEL_NAME,
+                "TRACE_SAMPLE_RATE": str(self.settings.TRACE_SAMPLE_RATE),
+                "CONSUMER_NAME": consumer_name,
+            },
+        )
+        pool.workers[consumer_name] = process
+        print(f"[App] Started {consumer_name} for {pool.name} on port {port}")
+
+    async def hand_back(self, pool: AgentPool, consumer_name: str):
+        """Requeue the entries a stopped worker left pending and forget it."""
+        for stream in pool.streams:
+            requeued = await requeue_pending(
+                self.redis, stream, pool.group_name, consumer_name, pool.settings
+            )
+            if requeued:
+                print(f"[Redis] Handed back {requeued} entries of {consumer_name}")
+            await self.redis.xgroup_delconsumer(stream, pool.group_name, consumer_name)
+
+    async def retire(self, pool: AgentPool, consumer_name: str):
+        """Stop a worker gracefully, killing it after the drain timeout."""
+        process = pool.workers.pop(consumer_name)
+        if process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(
+                    process.wait(), self.settings.DRAIN_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                print(f"[App] {consumer_name} didn't drain in time, killing it")
+                process.kill()
+                await process.wait()
+        await self.hand_back(pool, consumer_name)
+        print(f"[App] Retired {consumer_name} for {pool.name}")
+
+    async def reap(self, pool: AgentPool):
+        """Hand back the entries of workers that exited on their own."""
+        for consumer_name, process in list(pool.workers.items()):
+            if process.returncode is not None:
+                print(f"[App] {consumer_name} exited with {process.returncode}")
+                del pool.workers[consumer_name]
+                await self.hand_back(pool, consumer_name)
+
+    async def backlog(self, pool: AgentPool) -> int:
+        """Unread plus pending entries across the agent's lane streams."""
+        backlog = 0
+        for stream in pool.streams:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.xinfo_groups(stream)
+                pipe.xlen(stream)
+                pipe.xpending(stream, pool.group_name)
+                groups, length, pending = await pipe.execute(raise_on_error=False)
+            if isinstance(groups, Exception):
+                # The workers create the stream and group when they start
+                continue
+            group = next((g for g in groups if g["name"] == pool.group_name), {})
+            pending = pending["pending"]
+            # Acknowledged entries are deleted, so without lag (Redis < 7) the
+            # unread entries are what's left of the stream besides the PEL
+            lag = group.get("lag")
+            unread = lag if lag is not None else max(length - pending, 0)
+            backlog += unread + pending
+        return backlog
+
+    async def scale(self, pool: AgentPool):
+        """Move the agent's worker count towards what its backlog needs."""
+        await self.reap(pool)
+        backlog = await self.backlog(pool)
+        desired = math.ceil(backlog / self.settings.TARGET_BACKLOG_PER_WORKER)
+        desired = max(
+            self.settings.MIN_WORKERS, min(self.settings.MAX_WORKERS, desired)
+        )
+        AGENT_BACKLOG.set(backlog, {"agent": pool.name})
+
+        if desired >= len(pool.workers):
+            pool.low_since = None
+            for _ in range(desired - len(pool.workers)):
+                await self.spawn(pool)
+        # Retire one worker at a time, once the backlog stayed low long enough
+        elif pool.low_since is None:
+            pool.low_since = time.monotonic()
+        elif (
+            time.monotonic() - pool.low_since
+            >= self.settings.SCALE_DOWN_COOLDOWN_SECONDS
+        ):
+            pool.low_since = time.monotonic()
+            await self.retire(pool, list(pool.workers)[-1])
+        AGENT_WORKERS.set(len(pool.workers), {"agent": pool.name})
+
+    async def run(self):
+        """Scale every agent until cancelled, then retire all the workers."""
+        try:
+            while True:
+                for pool in self.pools:
+                    try:
+                        await self.scale(pool)
+                    except Exception as e:
+                        # Keep the workers running, try again on the next tick
+                        print(f"[App] Failed to scale {pool.name}: {e}")
+                await asyncio.sleep(self.settings.SCALE_INTERVAL_SECONDS)
+        finally:
+            await asyncio.gather(
+                *(
+                    self.retire(pool, consumer_name)
+                    for pool in self.pools
+                    for consumer_name in list(pool.workers)
+                ),
+                return_exceptions=True,
+            )
+            await self.redis.close()
+            print("[App] Supervisor stopped")
@@ -0,0 +1,58 @@
+import json
+import time
+
+from fasta2a.storage import InMemoryStorage
+
+# Wall clock at the monotonic clock's origin, taken once so the hops of a
+# process never go backwards while still comparing across processes
+CLOCK_OFFSET = time.time() - time.monotonic()
+
+# A2A task states after which the agent run is over
+FINAL_STATES = {"completed", "failed", "canceled", "rejected", "input-required"}
+
+
+def hop_time() -> float:
+    """Milliseconds since the epoch, following this process' monotonic clock."""
+    return round((CLOCK_OFFSET + time.monotonic()) * 1000, 3)
+
+
+def load_timings(msg_data: dict) -> list[dict]:
+    """Timing envelope carried by a stream entry, oldest hop first."""
+    return json.loads(msg_data.get("timings") or "[]")
+
+
+def add_hop(
+    timings: list[dict], service: str, hop: str, at: float | None = None
+) -> list[dict]:
+    """Append a hop reached by `service`, now unless `at` is given."""
+    timings.append(
+        {"service": service, "hop": hop, "at": hop_time() if at is None else at}
+    )
+    return timings
+
+
+class TimedStorage(InMemoryStorage):
+    """A2A task storage stamping when the agent run of each task starts and ends.
+
+    The stamps go in the task's metadata, so whoever polls the task gets them.
+    """
+
+    async def load_task(self, task_id, history_length=None):
+        """The task with its last `history_length` messages, none for 0.
+
+        The stored task is left whole, the in-memory storage would cut its
+        history down for good.
+        """
+        task = await super().load_task(task_id)
+        if task is None or history_length is None:
+            return task
+        history = task.get("history", [])
+        return {**task, "history": history[-history_length:] if history_length else []}
+
+    async def update_task(self, task_id, state, *args, **kwargs):
+        task = await super().update_task(task_id, state, *args, **kwargs)
+        if state == "working":
+            task.setdefault("metadata", {})["llm_start"] = hop_time()
+        elif state in FINAL_STATES:
+            task.setdefault("metadata", {})["llm_end"] = hop_time()
+        return task
@@ -0,0 +1,1066 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from functools import cached_property
+from typing import Any, Awaitable, Callable, Dict
+
+import httpx
+import logfire
+import redis.asyncio as redis
+from fasta2a import FastA2A
+from fasta2a.broker import InMemoryBroker
+from fasta2a.client import A2AClient, Message
+from fasta2a.schema import TextPart
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.toolsets import CombinedToolset
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from agent_runtime.config.settings import WorkerSettings
+from agent_runtime.service.a2a_worker import MeshAgentWorker
+from agent_runtime.service.agent_client import send_message
+from agent_runtime.service.auth_service import validate_token
+from agent_runtime.service.breaker import OPEN, STATE_VALUES, CircuitBreaker
+from agent_runtime.service.codec import (
+    ENCODING_ERRORS,
+    decode_task,
+    encode_event,
+    encode_task,
+    token_key,
+)
+from agent_runtime.service.metrics import (
+    BREAKER_REJECTED,
+    BREAKER_STATE,
+    HEDGE_WINS,
+    HEDGES_SENT,
+    LANE_BACKLOG,
+    LANE_WAIT_TIME,
+    STAGE_TIME,
+    STREAM_LAG,
+    STREAM_LENGTH,
+    STREAM_MEMORY,
+    STREAM_PENDING,
+    TASK_SLOTS,
+    TASKS_CANCELLED,
+    TASKS_EXPIRED,
+    TASKS_IN_FLIGHT,
+)
+from agent_runtime.service.profiler import monitor_event_loop, profiler_routes
+from agent_runtime.service.prometheus import metrics
+from agent_runtime.service.redis_service import (
+    SESSION_CLOSED,
+    answer_key,
+    breaker_key,
+    cancel_key,
+    ensure_group,
+    lane_stream,
+    remaining_budget,
+    requeue_pending,
+    trim_policy,
+)
+from agent_runtime.service.resources import (
+    TimedModel,
+    configure_logfire,
+    google_model,
+)
+from agent_runtime.service.scheduler import DeficitRoundRobin
+from agent_runtime.service.startup import (
+    MILESTONES,
+    mark,
+    report_startup,
+    startup_profile,
+    uninstall_import_timer,
+)
+from agent_runtime.service.timings import (
+    TimedStorage,
+    add_hop,
+    hop_time,
+    load_timings,
+)
+
+# Entries buffered per lane before the scheduler picks them
+LANE_BUFFER_SIZE = 10
+# Seconds between two attempts of a failed startup task or MCP connection
+STARTUP_RETRY_SECONDS = 5
+# Session tokens a worker keeps before starting over
+TOKEN_CACHE_SIZE = 10000
+# Seconds the first answer of a hedged task stays claimed
+ANSWER_CLAIM_SECONDS = 300
+# Seconds a scatter-gather reply stream is kept after its last reply
+REPLY_TTL_SECONDS = 300
+# Between the text parts of an answer published as one event
+PART_SEPARATOR = "\n\n"
+
+
+def result_text(result: dict) -> str:
+    """Text of a completed A2A task, from its artifacts.
+
+    Agents that don't produce artifacts are answered from the agent messages
+    of the history instead.
+    """
+    sources = result.get("artifacts") or [
+        m for m in result.get("history", []) if m["role"] == "agent"
+    ]
+    return PART_SEPARATOR.join(
+        part["text"]
+        for source in sources
+        for part in source["parts"]
+        if part.get("text")
+    )
+
+
+class AgentWorker:
+    """Redis stream consumer and A2A server wiring shared by every agent.
+
+    The worker reads the agent's lane streams, validates the user, hands the
+    query to the agent's own A2A server and publishes the result back to the
+    chat channel. Agents only declare their pydantic-ai `Agent` and settings.
+
+    Nothing slow happens on import: telemetry, the model (when the agent has
+    none), the MCP servers and the startup tasks are set up in the lifespan,
+    and `/readyz` reports when all of them are up.
+    """
+
+    def __init__(
+        self,
+        agent: Agent,
+        settings: WorkerSettings | Callable[[], WorkerSettings],
+        redis_client: redis.Redis | None = None,
+        service_name: str | None = None,
+        mcp_servers: dict[str, Callable[[], Any]] | None = None,
+    ):
+        self.agent = agent
+        # The settings or their getter, read on first use so importing an
+        # agent doesn't load its .env
+        self.settings_source = settings
+        self.given_service_name = service_name
+        # Factories of the agent's MCP servers by name, and the servers built
+        # from them on startup
+        self.mcp_factories = mcp_servers or {}
+        self.mcp_servers: list = []
+        if self.mcp_factories:
+            agent.toolset(per_run_step=False)(self.mcp_toolset)
+        # Async functions run once on startup, retried until they succeed
+        self.startup_tasks: dict[str, Callable[[], Awaitable[None]]] = {}
+        # Everything that must be up before the worker reports ready
+        self.ready_checks: dict[str, bool] = {"model": False, "streams": False}
+        self.ready_checks.update({name: False for name in self.mcp_factories})
+        if redis_client is not None:
+            self.redis = redis_client
+        # Tokens of the sessions whose tasks carry a reference, by reference
+        self.tokens: dict[str, str] = {}
+        # A2A client calling the agent server in process, set on startup
+        self.a2a_client: A2AClient | None = None
+        # Tasks handed to process_message, kept referenced until they finish
+        self.in_flight: set[asyncio.Task] = set()
+        # Running process_message tasks per cancel key, so they can be interrupted
+        self.running_tasks: dict[str, set[asyncio.Task]] = {}
+        # Timing envelope of each running task by stream entry id, tools
+        # running for the task append their own hops to it. Hedge copies and
+        # subtasks share their task id, not their entry id
+        self.timings: dict[str, list[dict]] = {}
+        # Fields of each running task by stream entry id, for the tools
+        # running for it
+        self.tasks: dict[str, dict] = {}
+        # Background tasks running next to the a2a server
+        self.background_tasks: list[asyncio.Task] = []
+        # Stream reader of a standalone worker and the dispatcher, stopped
+        # first when draining
+        self.reader_task: asyncio.Task | None = None
+        self.dispatch_task: asyncio.Task | None = None
+        # Set once entries are buffered, and by the worker when it frees room
+        self.entries_ready = asyncio.Event()
+        self.buffer_freed = asyncio.Event()
+        # A2A server and its own lifespan, filled in by to_a2a
+        self.a2a_app: FastA2A | None = None
+        self.a2a_lifespan = None
+
+    @cached_property
+    def settings(self) -> WorkerSettings:
+        source = self.settings_source
+        return source() if callable(source) else source
+
+    @cached_property
+    def name(self) -> str:
+        return self.settings.TOPIC_NAME
+
+    @cached_property
+    def service_name(self) -> str:
+        return self.given_service_name or f"{self.name}-agent"
+
+    @cached_property
+    def redis(self) -> redis.Redis:
+        return redis.from_url(
+            self.settings.REDIS_URL,
+            decode_responses=True,
+            encoding_errors=ENCODING_ERRORS,
+        )
+
+    @cached_property
+    def breaker(self) -> CircuitBreaker:
+        """Fails tasks fast while the agent keeps failing or timing out."""
+        return CircuitBreaker(
+            window=self.settings.BREAKER_WINDOW,
+            min_calls=self.settings.BREAKER_MIN_CALLS,
+            failure_rate=self.settings.BREAKER_FAILURE_RATE,
+            slow_call_ms=self.settings.BREAKER_SLOW_CALL_MS,
+            open_seconds=self.settings.BREAKER_OPEN_SECONDS,
+        )
+
+    @cached_property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Limits the concurrent tasks."""
+        return asyncio.Semaphore(self.settings.MAX_CONCURRENT_TASKS)
+
+    @cached_property
+    def scheduler(self) -> DeficitRoundRobin:
+        """Fair scheduler across the priority lanes of this agent."""
+        return DeficitRoundRobin(self.settings.LANE_WEIGHTS)
+
+    @cached_property
+    def lane_streams(self) -> dict[str, str]:
+        """Stream of every lane this agent consumes."""
+        return {
+            lane: lane_stream(self.settings.TOPIC_NAME, lane)
+            for lane in self.settings.LANE_WEIGHTS
+        }
+
+    async def send_message_to_socket(self, message: Dict):
+        started = time.perf_counter()
+        # The chat server continues the trace when fanning the message out
+        message = {**message, **logfire.propagate.get_context()}
+        await self.redis.publish(
+            channel=self.settings.CHAT_CHANNEL_NAME,
+            message=encode_event(message, self.settings.ENVELOPE_CODEC),
+        )
+        STAGE_TIME.record(
+            (time.perf_counter() - started) * 1000,
+            {"agent": self.name, "stage": "publish"},
+        )
+
+    def queue_ack(self, pipe, stream: str, msg_id: str):
+        """Queue the acknowledgement and deletion of a message on a pipeline."""
+        if self.settings.USE_XACKDEL:
+            pipe.xackdel(stream, self.settings.GROUP_NAME, msg_id)
+        else:
+            pipe.xack(stream, self.settings.GROUP_NAME, msg_id)
+            pipe.xdel(stream, msg_id)
+
+    async def ack_message(self, stream: str, msg_id: str):
+        """Acknowledge and delete message after successful processing."""
+        # Both commands go out in a single round trip
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self.queue_ack(pipe, stream, msg_id)
+            await pipe.execute()
+
+    async def publish_result(
+        self, stream: str, msg_id: str, msg_data: dict, message: Dict
+    ):
+        """Publish the outcome of a task and acknowledge it in one round trip.
+
+        Subtasks of a scatter-gather answer on the gatherer's reply stream
+        instead of the chat channel. Every outcome carries the task id and
+        how many tasks were handed to other agents, which answer as well, so
+        the chat server knows when the task is over.
+        """
+        started = time.perf_counter()
+        message = {
+            "task_id": msg_data.get("task_id"),
+            "delegated": int(msg_data.get("delegated", 0)),
+            **message,
+            **logfire.propagate.get_context(),
+        }
+        reply_to = msg_data.get("reply_to")
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if reply_to:
+                reply = {
+                    **message,
+                    "subtask_id": msg_data.get("subtask_id"),
+                    "agent": self.name,
+                }
+                pipe.xadd(
+                    reply_to,
+                    {"event": encode_event(reply, self.settings.ENVELOPE_CODEC)},
+                )
+                # Late replies to a gatherer that gave up don't linger
+                pipe.expire(reply_to, REPLY_TTL_SECONDS)
+            else:
+                pipe.publish(
+                    channel=self.settings.CHAT_CHANNEL_NAME,
+                    message=encode_event(message, self.settings.ENVELOPE_CODEC),
+                )
+            self.queue_ack(pipe, stream, msg_id)
+            await pipe.execute()
+        STAGE_TIME.record(
+            (time.perf_counter() - started) * 1000,
+            {"agent": self.name, "stage": "publish"},
+        )
+
+    async def report_breaker(self, before: str):
+        """Export the breaker's state and share it if it changed from `before`.
+
+        While open, the breaker key tells the agents delegating here to stop.
+        """
+        state = self.breaker.state
+        if state == before:
+            return
+        BREAKER_STATE.set(STATE_VALUES[state], {"agent": self.name})
+        print(f"[App] Circuit breaker of {self.name} is {state}")
+        try:
+            if state == OPEN:
+                await self.redis.set(
+                    breaker_key(self.name),
+                    OPEN,
+                    px=int(self.breaker.open_seconds * 1000),
+                )
+            else:
+                await self.redis.delete(breaker_key(self.name))
+        except Exception as e:
+            print(f"[Redis] Failed to share the breaker state of {self.name}: {e}")
+
+    async def send_hedge(self, stream: str, msg_data: dict, delay: float) -> bool:
+        """Send a copy of the task to its stream once `delay` seconds passed.
+
+        Any consumer of the group may pick the copy up, this one included:
+        the copy then runs next to the primary on the same agent server, and
+        a copy of a session task waits for the primary behind the session's
+        context lock. Only another replica gives it a machine of its own.
+        """
+        await asyncio.sleep(delay)
+        try:
+            await self.redis.xadd(
+                stream,
+                encode_task({**msg_data, "hedge": "1"}, self.settings.ENVELOPE_CODEC),
+                **trim_policy(self.settings),
+            )
+        except Exception as e:
+            print(f"[Redis] Failed to hedge task {msg_data.get('task_id')}: {e}")
+            return False
+        HEDGES_SENT.add(1, {"agent": self.name})
+        return True
+
+    def start_hedge(self, stream: str, msg_data: dict) -> asyncio.Task | None:
+        """Timer sending a copy of the task when enabled and it runs slow."""
+        delay = self.breaker.p95()
+        if self.settings.HEDGE_REQUESTS and not msg_data.get("hedge") and delay:
+            return asyncio.create_task(self.send_hedge(stream, msg_data, delay / 1000))
+        return None
+
+    async def call_agent(
+        self, msg_data: dict, message: Message, hedge: asyncio.Task | None
+    ):
+        """Run the task on the agent server, stopping the hedge's timer after.
+
+        Returns the A2A status and task.
+        """
+        started = time.perf_counter()
+        ok = False
+        try:
+            # The remaining budget bounds the whole A2A round trip
+            agent_status, agent_response = await send_message(
+                self.a2a_client,
+                message,
+                timeout=remaining_budget(msg_data),
+                attributes={"agent": self.name},
+            )
+            ok = agent_status == "completed"
+            return agent_status, agent_response
+        except asyncio.CancelledError:
+            ok = None
+            raise
+        finally:
+            if hedge:
+                hedge.cancel()
+            before = self.breaker.state
+            self.breaker.record((time.perf_counter() - started) * 1000, ok)
+            await self.report_breaker(before)
+
+    async def claim_answer(
+        self, task_id: str, msg_data: dict, hedge: asyncio.Task | None, answered: bool
+    ) -> bool:
+        """Whether this copy of a hedged task has the first outcome.
+
+        The primary claims as soon as its hedge's timer was started, the copy
+        may have gone out while the timer was being cancelled.
+        """
+        copy = "hedge" if msg_data.get("hedge") else "primary"
+        claimed = await self.redis.set(
+            answer_key(self.name, msg_data.get("subtask_id") or task_id),
+            copy,
+            nx=True,
+            ex=ANSWER_CLAIM_SECONDS,
+        )
+        # Primaries that never sent their hedge have nothing to win against
+        raced = hedge is None or (
+            hedge.done() and not hedge.cancelled() and hedge.result()
+        )
+        if claimed and raced and answered:
+            HEDGE_WINS.add(1, {"agent": self.name, "copy": copy})
+        return bool(claimed)
+
+    async def publish_outcome(
+        self,
+        stream: str,
+        msg_id: str,
+        msg_data: dict,
+        message: dict,
+        hedge: asyncio.Task | None = None,
+    ):
+        """Publish the outcome of a task, only once for a hedged task.
+
+        A hedge copy only ever answers, its failures are the primary's to
+        report. The first outcome of a hedged task claims it, the other
+        copy's outcome is acknowledged without being published.
+        """
+        answered = message.get("status") == "completed"
+        copy = msg_data.get("hedge")
+        if copy and not answered:
+            await self.ack_message(stream, msg_id)
+            return
+        if (copy or hedge is not None) and not await self.claim_answer(
+            msg_data["task_id"], msg_data, hedge, answered
+        ):
+            await self.ack_message(stream, msg_id)
+            return
+        await self.publish_result(stream, msg_id, msg_data, message)
+
+    async def is_cancelled(self, session_id: str, task_id: str) -> bool:
+        return bool(await self.redis.exists(cancel_key(session_id, task_id)))
+
+    async def drop_expired_message(
+        self,
+        stream: str,
+        msg_id: str,
+        msg_data: dict,
+        hedge: asyncio.Task | None = None,
+    ):
+        """Count, notify and acknowledge a task whose deadline has passed."""
+        task_id = msg_data["task_id"]
+        TASKS_EXPIRED.add(1, {"agent": self.name})
+        print(f"[Redis] Dropped expired task {task_id} for {self.name}")
+        await self.publish_outcome(
+            stream,
+            msg_id,
+            msg_data,
+            {
+                "status": "expired",
+                "message": f"Task {task_id} expired before {self.name} could finish it",
+            },
+            hedge,
+        )
+
+    async def session_token(self, msg_data: dict) -> str | None:
+        """Token of a task, fetched once per session when sent by reference."""
+        if "token" in msg_data:
+            return msg_data["token"]
+        ref = msg_data.get("token_ref")
+        if ref not in self.tokens:
+            token = await self.redis.get(token_key(ref))
+            if token is None:
+                return None
+            # References never change meaning, forgetting them all is enough
+            if len(self.tokens) >= TOKEN_CACHE_SIZE:
+                self.tokens.clear()
+            self.tokens[ref] = token
+        return self.tokens[ref]
+
+    async def process_traced_message(self, stream: str, msg_id: str, msg_data: dict):
+        """Process a message in the trace of whoever enqueued it."""
+        with logfire.propagate.attach_context(msg_data):
+            with logfire.span(
+                "process {agent} task {task_id}",
+                agent=self.name,
+                task_id=msg_data.get("task_id"),
+                stream=stream,
+                msg_id=msg_id,
+            ):
+                await self.process_message(stream, msg_id, msg_data)
+
+    async def process_message(self, stream: str, msg_id: str, msg_data: dict):
+        """Process a single message concurrently."""
+        agent_name = self.name
+        key = cancel_key(msg_data.get("session_id"), msg_data.get("task_id"))
+        self.running_tasks.setdefault(key, set()).add(asyncio.current_task())
+        timings = self.timings[msg_id] = load_timings(msg_data)
+        self.tasks[msg_id] = msg_data
+        # Timer of the task's hedge copy, once the agent is called
+        hedge = None
+        try:
+            task_id = msg_data["task_id"]
+            query = msg_data["query"]
+            session_id = msg_data["session_id"]
+
+            # Step 0: Drop the task before any auth or LLM work if it expired
+            # or the user already left
+            budget = remaining_budget(msg_data)
+            if budget is not None and budget <= 0:
+                await self.drop_expired_message(stream, msg_id, msg_data)
+                return
+            if await self.is_cancelled(session_id, task_id):
+                TASKS_CANCELLED.add(1, {"agent": agent_name})
+                await self.ack_message(stream, msg_id)
+                return
+            # A hedge copy read after the primary already answered
+            if msg_data.get("hedge") and await self.redis.exists(
+                answer_key(agent_name, msg_data.get("subtask_id") or task_id)
+            ):
+                await self.ack_message(stream, msg_id)
+                return
+
+            # Step 1: Validate token
+            started = time.perf_counter()
+            token = await self.session_token(msg_data)
+            if token is None:
+                await self.publish_outcome(
+                    stream,
+                    msg_id,
+                    msg_data,
+                    {"status": "expired", "message": "Session token expired"},
+                )
+                return
+            is_valid_token = await validate_token(
+                token=token, jwks_url=self.settings.JWKS_URL
+            )
+            STAGE_TIME.record(
+                (time.perf_counter() - started) * 1000,
+                {"agent": agent_name, "stage": "auth"},
+            )
+            if is_valid_token.status_code != 200:
+                await self.publish_outcome(
+                    stream,
+                    msg_id,
+                    msg_data,
+                    {"status": "error", "message": is_valid_token.detail},
+                )
+                return
+
+            # Step 2: Validate user role
+            if f"{agent_name}-user" not in is_valid_token.detail.roles:
+                await self.publish_outcome(
+                    stream,
+                    msg_id,
+                    msg_data,
+                    {
+                        "status": "unauthorized",
+                        "message": f"{is_valid_token.detail.username} is not authorized to access {agent_name}",
+                    },
+                )
+                return
+
+            # Step 3: Fail fast while the agent keeps failing, otherwise
+            # notify that the task was assigned
+            before = self.breaker.state
+            allowed = self.breaker.allow()
+            try:
+                await self.report_breaker(before)
+                if allowed:
+                    await self.send_message_to_socket(
+                        {
+                            "status": "assigned",
+                            "message": f"Task assigned to {agent_name} agent",
+                        }
+                    )
+            except BaseException:
+                # The call never went out, give its probe slot back
+                if allowed:
+                    self.breaker.record(0, None)
+                raise
+            if not allowed:
+                BREAKER_REJECTED.add(1, {"agent": agent_name})
+                await self.publish_outcome(
+                    stream,
+                    msg_id,
+                    msg_data,
+                    {
+                        "status": "unavailable",
+                        "message": f"{agent_name} agent is unavailable, try again later",
+                    },
+                )
+                return
+
+            # Step 4: Send message to agent
+            message = Message(
+                role="user",
+                parts=[TextPart(kind="text", text=query)],
+                kind="message",
+                message_id=msg_id,
+                task_id=task_id,
+                # Subtasks are self-contained queries, each gets a context of
+                # its own so the steps of one session don't take turns
+                context_id=msg_id if msg_data.get("reply_to") else session_id,
+                # The A2A server gives the task its own id, tools find the
+                # mesh task by its stream entry
+                metadata={"msg_id": msg_id},
+            )
+
+            hedge = self.start_hedge(stream, msg_data)
+            try:
+                agent_status, agent_response = await self.call_agent(
+                    msg_data, message, hedge
+                )
+            except TimeoutError:
+                await self.drop_expired_message(stream, msg_id, msg_data, hedge)
+                return
+
+            # Step 5: Record the hops the answer went through
+            metadata = agent_response["result"].get("metadata", {})
+            for hop in ("llm_start", "llm_end"):
+                if hop in metadata:
+                    add_hop(timings, agent_name, hop, metadata[hop])
+            add_hop(timings, agent_name, "publish")
+
+            # Step 6: Publish the outcome as a single event and acknowledge
+            # the message along with it
+            if agent_status != "completed":
+                # The client or the gatherer waits for the task, tell them
+                # it is over
+                outcome = {
+                    "status": agent_status,
+                    "message": f"Task {agent_status} for {agent_name}",
+                }
+            else:
+                outcome = {
+                    "status": agent_status,
+                    "type": "response",
+                    "task_id": task_id,
+                    "agent_response": result_text(agent_response["result"]),
+                    "time_taken": timings[-1]["at"] - timings[0]["at"],
+                    "timings": timings,
+                }
+            await self.publish_outcome(stream, msg_id, msg_data, outcome, hedge)
+
+        except asyncio.CancelledError as e:
+            # Only swallow cancellations coming from a closed session,
+            # anything else (e.g. shutdown) must keep propagating
+            if SESSION_CLOSED not in e.args:
+                raise
+            print(f"[Redis] Task for message {msg_id} cancelled, session closed")
+            TASKS_CANCELLED.add(1, {"agent": agent_name})
+            await self.ack_message(stream, msg_id)
+
+        except Exception as e:
+            # Log or send error message but don't requeue
+            print(f"[ERROR] Message {msg_id} failed: {e}")
+            # Acknowledge even on error to prevent retry loops
+            await self.publish_outcome(
+                stream,
+                msg_id,
+                msg_data,
+                {
+                    "status": "failed",
+                    "message": f"Task failed for {agent_name}: {str(e)}",
+                },
+                hedge,
+            )
+
+        finally:
+            self.timings.pop(msg_id, None)
+            self.tasks.pop(msg_id, None)
+            self.running_tasks[key].discard(asyncio.current_task())
+            if not self.running_tasks[key]:
+                del self.running_tasks[key]
+
+    def streams_with_room(self) -> dict[str, str]:
+        """Lane streams whose buffer can take more entries, keyed by stream."""
+        return {
+            stream: lane
+            for lane, stream in self.lane_streams.items()
+            if len(self.scheduler.queues[lane]) < LANE_BUFFER_SIZE
+        }
+
+    def buffer_entries(self, stream: str, lane: str, msgs: list):
+        """Queue entries read from a lane stream for the scheduler."""
+        read_at = hop_time()
+        for msg_id, fields in msgs:
+            try:
+                msg_data = decode_task(fields)
+            except ValueError as e:
+                # Left in the PEL, handed back on drain to a consumer that
+                # may know the newer envelope
+                print(f"[Redis] Skipped entry {msg_id} of {stream}: {e}")
+                continue
+            msg_data["timings"] = json.dumps(
+                add_hop(load_timings(msg_data), self.name, "read", read_at)
+            )
+            self.scheduler.push(lane, (stream, msg_id, msg_data))
+        self.entries_ready.set()
+
+    def on_message_done(self, task: asyncio.Task):
+        """Release the slot of a finished task and surface unhandled errors."""
+        self.in_flight.discard(task)
+        self.semaphore.release()
+        TASKS_IN_FLIGHT.set(len(self.in_flight), {"agent": self.name})
+        if not task.cancelled() and task.exception():
+            print(f"[Unhandled Exception in message processor] {task.exception()}")
+
+    async def dispatch_loop(self):
+        """Hand buffered entries to process_message, one per free slot."""
+        while True:
+            await self.semaphore.acquire()
+            try:
+                while not self.scheduler.pending():
+                    self.entries_ready.clear()
+                    await self.entries_ready.wait()
+                lane, (stream, msg_id, msg_data) = self.scheduler.pop()
+            except BaseException:
+                self.semaphore.release()
+                raise
+            # Let the reader top up the lane we just took from
+            self.buffer_freed.set()
+            if "first message" not in MILESTONES:
+                print(f"[App] First message after {mark('first message'):.3f}s")
+
+            # Stream ids start with the enqueue time in milliseconds
+            waited = time.time() * 1000 - int(msg_id.split("-")[0])
+            LANE_WAIT_TIME.record(waited, {"agent": self.name, "lane": lane})
+
+            task = asyncio.create_task(
+                self.process_traced_message(stream, msg_id, msg_data)
+            )
+            self.in_flight.add(task)
+            task.add_done_callback(self.on_message_done)
+            TASKS_IN_FLIGHT.set(len(self.in_flight), {"agent": self.name})
+
+    def cancel_tasks(self, session_id: str, task_ids: list[str]):
+        """Interrupt the running tasks of a closed session."""
+        for task_id in task_ids:
+            for task in self.running_tasks.get(cancel_key(session_id, task_id), set()):
+                task.cancel(SESSION_CLOSED)
+
+    async def report_streams(self):
+        """Periodically export the backlog, size and memory of every lane stream."""
+        while True:
+            try:
+                for lane, stream in self.lane_streams.items():
+                    # One round trip for all the statistics of the stream
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        pipe.xinfo_groups(stream)
+                        pipe.xlen(stream)
+                        pipe.xpending(stream, self.settings.GROUP_NAME)
+                        pipe.memory_usage(stream)
+                        groups, length, pending, memory = await pipe.execute()
+
+                    group = next(
+                        (g for g in groups if g["name"] == self.settings.GROUP_NAME),
+                        None,
+                    )
+                    # Lag is what's still unread, the buffer what's read but not
+                    # started. Acknowledged entries are deleted, so without lag
+                    # (Redis < 7) the unread entries are the rest besides the PEL
+                    lag = (group or {}).get("lag")
+                    if lag is None:
+                        lag = max(length - pending["pending"], 0)
+                    attributes = {"agent": self.name, "lane": lane}
+                    LANE_BACKLOG.set(lag + len(self.scheduler.queues[lane]), attributes)
+                    STREAM_LAG.set(lag, attributes)
+                    STREAM_LENGTH.set(length, attributes)
+                    STREAM_PENDING.set(pending["pending"], attributes)
+                    STREAM_MEMORY.set(memory or 0, attributes)
+                    print(
+                        f"[Redis] Stream {stream}: length={length} lag={lag} "
+                        f"pending={pending['pending']} memory={memory or 0}B"
+                    )
+            except Exception as e:
+                # Statistics are best effort, keep reporting on the next tick
+                print(f"[Redis] Failed to report stream statistics: {e}")
+            await asyncio.sleep(self.settings.STATS_INTERVAL_SECONDS)
+
+    def mcp_toolset(self, ctx: RunContext) -> CombinedToolset:
+        return CombinedToolset(self.mcp_servers)
+
+    def add_startup_task(self, name: str, func: Callable[[], Awaitable[None]]):
+        """Run `func` in the background on startup, the worker is ready once it succeeds."""
+        self.startup_tasks[name] = func
+        self.ready_checks[name] = False
+
+    async def run_startup_task(self, name: str, func: Callable[[], Awaitable[None]]):
+        while True:
+            try:
+                await func()
+                self.ready_checks[name] = True
+                return
+            except Exception as e:
+                # A dependency being down must not keep the worker from booting
+                print(f"[App] Startup task {name} failed: {e}, retrying")
+                await asyncio.sleep(STARTUP_RETRY_SECONDS)
+
+    async def hold_mcp_server(self, name: str, server: Any):
+        """Keep an MCP server running across agent runs, reconnecting on failure."""
+        while True:
+            try:
+                # Entered and exited in this task, as the MCP client requires
+                async with server:
+                    self.ready_checks[name] = True
+                    await asyncio.Future()
+            except Exception as e:
+                print(f"[MCP] {name} unavailable: {e}, retrying")
+            self.ready_checks[name] = False
+            await asyncio.sleep(STARTUP_RETRY_SECONDS)
+
+    async def report_when_ready(self):
+        while not all(self.ready_checks.values()):
+            await asyncio.sleep(0.1)
+        mark("ready")
+        report_startup(self.service_name)
+
+    async def healthz(self, request: Request) -> JSONResponse:
+        """Liveness: the dispatcher is still running."""
+        if self.dispatch_task and self.dispatch_task.done():
+            return JSONResponse({"status": "dead"}, status_code=500)
+        return JSONResponse({"status": "alive"})
+
+    async def readyz(self, request: Request) -> JSONResponse:
+        """Readiness: the model, streams, MCP servers and startup tasks are up."""
+        ready = all(self.ready_checks.values())
+        return JSONResponse(
+            {"ready": ready, "checks": self.ready_checks, "startup": startup_profile()},
+            status_code=200 if ready else 503,
+        )
+
+    async def start(self, standalone: bool = True):
+        """Start the dispatcher and its helpers.
+
+        A standalone worker also reads its own streams and cancellations, a
+        hosted one gets them from the host shared by all its agents.
+        """
+        mark("lifespan started")
+        configure_logfire(
+            self.settings.LOGFIRE_API_KEY,
+            self.service_name,
+            self.settings.TRACE_SAMPLE_RATE,
+        )
+        if self.agent.model is None:
+            self.agent.model = google_model(
+                self.settings.MODEL_NAME, self.settings.API_KEY
+            )
+        if not isinstance(self.agent.model, TimedModel):
+            self.agent.model = TimedModel(self.agent.model, {"agent": self.name})
+        self.ready_checks["model"] = True
+        TASK_SLOTS.set(self.settings.MAX_CONCURRENT_TASKS, {"agent": self.name})
+        BREAKER_STATE.set(STATE_VALUES[self.breaker.state], {"agent": self.name})
+        for name, factory in self.mcp_factories.items():
+            server = factory()
+            self.mcp_servers.append(server)
+            self.background_tasks.append(
+                asyncio.create_task(self.hold_mcp_server(name, server))
+            )
+        for name, func in self.startup_tasks.items():
+            self.background_tasks.append(
+                asyncio.create_task(self.run_startup_task(name, func))
+            )
+        self.background_tasks.append(asyncio.create_task(self.report_when_ready()))
+        self.dispatch_task = asyncio.create_task(self.dispatch_loop())
+        self.background_tasks.append(asyncio.create_task(self.report_streams()))
+        if standalone:
+            reader = StreamReader(
+                self.redis,
+                self.settings.GROUP_NAME,
+                self.settings.CONSUMER_NAME,
+                [self],
+            )
+            self.reader_task = asyncio.create_task(reader.run())
+            self.background_tasks.append(
+                asyncio.create_task(
+                    cancel_listener(
+                        self.redis, self.settings.CANCEL_CHANNEL_NAME, [self]
+                    )
+                )
+            )
+        print(
+            f"[App] Redis Stream, Cancel Listener and Stream Reporter Started for {self.name}"
+        )
+
+    async def drain(self):
+        """Stop taking entries, let in-flight tasks finish and hand back the rest.
+
+        Tasks still running after DRAIN_TIMEOUT_SECONDS are interrupted. Their
+        entries, and the ones buffered but never started, are still in this
+        consumer's PEL and get requeued for the other consumers of the group.
+        """
+        self.ready_checks["streams"] = False
+        for task in (self.reader_task, self.dispatch_task):
+            if task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self.reader_task = self.dispatch_task = None
+
+        if self.in_flight:
+            print(f"[App] Draining {len(self.in_flight)} tasks for {self.name}")
+            _, unfinished = await asyncio.wait(
+                self.in_flight, timeout=self.settings.DRAIN_TIMEOUT_SECONDS
+            )
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+        self.scheduler = DeficitRoundRobin(self.settings.LANE_WEIGHTS)
+        for stream in self.lane_streams.values():
+            requeued = await requeue_pending(
+                self.redis,
+                stream,
+                self.settings.GROUP_NAME,
+                self.settings.CONSUMER_NAME,
+                self.settings,
+            )
+            if requeued:
+                print(f"[Redis] Handed back {requeued} entries of {stream}")
+
+    async def stop(self, close_redis: bool = True):
+        """Drain, stop the background tasks and close the clients."""
+        await self.drain()
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        self.background_tasks.clear()
+        print(f"[App] Background tasks cancelled for {self.name}")
+        if self.a2a_client:
+            await self.a2a_client.http_client.aclose()
+        if close_redis:
+            await self.redis.close()
+            print("[App] Redis client closed")
+
+    def to_a2a(self, **kwargs: Any) -> FastA2A:
+        """Build the agent's A2A server with the stream consumer in its lifespan."""
+        # Stamps the agent run of every task for the timing envelope
+        storage = kwargs.setdefault("storage", TimedStorage())
+        broker = kwargs.setdefault("broker", InMemoryBroker())
+        # Runs the tasks with their stream entry id for the agent's tools, as
+        # many at once as the stream consumer hands out
+        a2a_worker = MeshAgentWorker(agent=self.agent, broker=broker, storage=storage)
+        url_given = "url" in kwargs
+
+        @asynccontextmanager
+        async def a2a_worker_lifespan(app_instance):
+            # Settings are read on startup, not when the agent is imported
+            a2a_worker.max_concurrency = self.settings.MAX_CONCURRENT_TASKS
+            if not url_given:
+                # The agent card advertises where the server is reachable
+                app_instance.url = self.settings.AGENT_SERVER_URL
+            # Tasks are handed to the server in process, so they can still be
+            # polled while the HTTP server shuts down
+            self.a2a_client = A2AClient(
+                base_url=self.settings.AGENT_SERVER_URL,
+                http_client=httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app_instance)
+                ),
+            )
+            async with app_instance.task_manager, self.agent:
+                async with a2a_worker.run():
+                    yield
+
+        kwargs.setdefault("lifespan", a2a_worker_lifespan)
+        app = self.agent.to_a2a(**kwargs)
+        # Getting the current lifespan context, kept so a host can run the
+        # a2a internals without the standalone consumer
+        a2a_lifespan = app.router.lifespan_context
+        self.a2a_app = app
+        self.a2a_lifespan = a2a_lifespan
+        app.add_route("/healthz", self.healthz, methods=["GET"])
+        app.add_route("/readyz", self.readyz, methods=["GET"])
+        app.add_route("/metrics", metrics, methods=["GET"])
+        app.router.routes.extend(profiler_routes(lambda: self.settings))
+
+        # Updated lifespan with redis stream
+        @asynccontextmanager
+        async def lifespan(app_instance):
+            monitor = asyncio.create_task(
+                monitor_event_loop(
+                    self.settings.LOOP_PROBE_INTERVAL_SECONDS,
+                    self.settings.SLOW_CALLBACK_MS,
+                )
+            )
+            await self.start()
+            # Maintians the original lifespan for interal a2a tasks aswell
+            async with a2a_lifespan(app_instance) as state:
+                try:
+                    yield state
+                finally:
+                    # Startup may never have been reported
+                    uninstall_import_timer()
+                    await self.stop()
+                    monitor.cancel()
+                    await asyncio.gather(monitor, return_exceptions=True)
+
+        # Adding the redis stream to the exisitng a2a lifespan
+        app.router.lifespan_context = lifespan
+        return app
+
+
+class StreamReader:
+    """Reads the lane streams of one or more workers with one XREADGROUP.
+
+    Every worker must use the reader's consumer group and consumer name. A
+    lane is only read while its buffer has room, so a busy agent doesn't pull
+    entries away from other consumers of its group.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        group_name: str,
+        consumer_name: str,
+        workers: list[AgentWorker],
+    ):
+        self.redis = redis_client
+        self.group_name = group_name
+        self.consumer_name = consumer_name
+        self.workers = {
+            stream: worker
+            for worker in workers
+            for stream in worker.lane_streams.values()
+        }
+        # Set by the workers whenever they take an entry from a buffer
+        self.room = asyncio.Event()
+        for worker in workers:
+            worker.buffer_freed = self.room
+
+    async def run(self):
+        for stream in self.workers:
+            await ensure_group(self.redis, stream, self.group_name)
+        for worker in set(self.workers.values()):
+            worker.ready_checks["streams"] = True
+
+        while True:
+            self.room.clear()
+            lanes = {}
+            for worker in set(self.workers.values()):
+                lanes.update(worker.streams_with_room())
+            if not lanes:
+                await self.room.wait()
+                continue
+            messages = await self.redis.xreadgroup(
+                groupname=self.group_name,
+                consumername=self.consumer_name,
+                streams={stream: ">" for stream in lanes},
+                count=LANE_BUFFER_SIZE,  # batch size per lane
+                block=5000,
+            )
+            for stream, msgs in messages or []:
+                self.workers[stream].buffer_entries(stream, lanes[stream], msgs)
+
+
+async def cancel_listener(
+    redis_client: redis.Redis, channel: str, workers: list[AgentWorker]
+):
+    """Interrupt running tasks whose session was closed by the user."""
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe(channel)
+    try:
+        async for notice in pubsub.listen():
+            if notice["type"] != "message":
+                continue
+            # A malformed notice must not stop the cancellations after it
+            try:
+                data = json.loads(notice["data"])
+                session_id, task_ids = data["session_id"], data["task_ids"]
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                print(f"[Redis] Skipping malformed cancel notice: {e}")
+                continue
+            for worker in workers:
+                worker.cancel_tasks(session_id, task_ids)
+    except asyncio.CancelledError:
+        await pubsub.unsubscribe(channel)
+        await pubsub.close()
+        print("[Redis] Cancel listener stopped gracefully")
+        raise
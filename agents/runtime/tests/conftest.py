@@ -0,0 +1,41 @@
+import pytest
+from agent_runtime.config.settings import WorkerSettings
+from agent_runtime.service.worker import AgentWorker
+from fakeredis import FakeAsyncRedis
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+
+
+@pytest.fixture
+def settings() -> WorkerSettings:
+    return WorkerSettings(
+        TOPIC_NAME="test",
+        MODEL_NAME="test",
+        API_KEY="test",
+        REDIS_URL="redis://localhost",
+        CHAT_CHANNEL_NAME="chat",
+        GROUP_NAME="test-group",
+        CONSUMER_NAME="test-consumer",
+        JWKS_URL="http://localhost/jwks",
+        AGENT_SERVER_URL="http://localhost",
+        LOGFIRE_API_KEY="test",
+    )
+
+
+@pytest.fixture
+def worker(settings) -> AgentWorker:
+    """Worker on an in-memory Redis, recording what it publishes and acks."""
+    worker = AgentWorker(
+        Agent(TestModel()), settings, redis_client=FakeAsyncRedis(decode_responses=True)
+    )
+    worker.published, worker.acked = [], []
+
+    async def publish_result(stream, msg_id, msg_data, message):
+        worker.published.append((msg_id, message["status"]))
+
+    async def ack_message(stream, msg_id):
+        worker.acked.append(msg_id)
+
+    worker.publish_result = publish_result
+    worker.ack_message = ack_message
+    return worker
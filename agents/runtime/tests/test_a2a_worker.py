@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+from agent_runtime.service.a2a_worker import MESH_MSG_ID, MeshAgentWorker
+from fasta2a.broker import InMemoryBroker
+from fasta2a.schema import Message, TextPart
+from fasta2a.storage import InMemoryStorage
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelRequest
+from pydantic_ai.models.test import TestModel
+
+TOOL_SECONDS = 0.2
+
+
+def slow_agent(seen: list) -> Agent:
+    agent = Agent(TestModel())
+
+    @agent.tool_plain
+    async def search() -> str:
+        """Search the knowledge base."""
+        msg_id = MESH_MSG_ID.get()
+        await asyncio.sleep(TOOL_SECONDS)
+        seen.append((msg_id, MESH_MSG_ID.get()))
+        return "results"
+
+    return agent
+
+
+async def submit(broker, storage, i: int, context_id: str) -> str:
+    """Send the `i`th query as the A2A server would, returning its task id."""
+    message = Message(
+        role="user",
+        parts=[TextPart(kind="text", text=f"query {i}")],
+        kind="message",
+        message_id=str(i),
+        metadata={"msg_id": f"{i}-0"},
+    )
+    task = await storage.submit_task(context_id, message)
+    await broker.run_task(
+        {"id": task["id"], "context_id": context_id, "message": message}
+    )
+    return task["id"]
+
+
+async def run_tasks(
+    tasks: int,
+    max_concurrency: int,
+    seen: list,
+    contexts: int | None = None,
+    storage: InMemoryStorage | None = None,
+) -> float:
+    """Seconds the worker takes to finish `tasks` tasks sent at once.
+
+    The tasks take turns over `contexts` contexts, one each by default.
+    """
+    broker, storage = InMemoryBroker(), storage or InMemoryStorage()
+    worker = MeshAgentWorker(
+        agent=slow_agent(seen),
+        broker=broker,
+        storage=storage,
+        max_concurrency=max_concurrency,
+    )
+    async with broker, worker.run():
+        started = time.perf_counter()
+        ids = []
+        for i in range(tasks):
+            context_id = f"context-{i % (contexts or tasks)}"
+            ids.append(await submit(broker, storage, i, context_id))
+        while True:
+            states = [(await storage.load_task(i))["status"]["state"] for i in ids]
+            if all(state == "completed" for state in states):
+                assert not worker.context_locks
+                return time.perf_counter() - started
+            await asyncio.sleep(0.01)
+
+
+def test_tasks_run_side_by_side_up_to_the_bound():
+    seen = []
+    assert asyncio.run(run_tasks(4, 4, seen)) < 2 * TOOL_SECONDS
+    assert asyncio.run(run_tasks(4, 2, seen)) >= 2 * TOOL_SECONDS
+
+
+def test_each_task_keeps_its_stream_entry_id():
+    seen = []
+    asyncio.run(run_tasks(4, 4, seen))
+    assert sorted(before for before, _ in seen) == [f"{i}-0" for i in range(4)]
+    assert all(before == after for before, after in seen)
+
+
+def test_tasks_of_a_context_take_turns():
+    storage = InMemoryStorage()
+    asyncio.run(run_tasks(4, 4, [], contexts=1, storage=storage))
+    # Every query is answered before the next one joins the history
+    turns = [
+        [part.content for part in message.parts if part.part_kind == "user-prompt"]
+        for message in storage.contexts["context-0"]
+        if isinstance(message, ModelRequest)
+    ]
+    prompts = [prompts for prompts in turns if prompts]
+    assert prompts == [[f"query {i}"] for i in range(4)]
+
+
+async def cancel_tasks(seen: list) -> tuple[list[str], float]:
+    """Cancel a running task and one waiting for its slot, once both started."""
+    broker, storage = InMemoryBroker(), InMemoryStorage()
+    worker = MeshAgentWorker(
+        agent=slow_agent(seen), broker=broker, storage=storage, max_concurrency=1
+    )
+    async with broker, worker.run():
+        ids = [await submit(broker, storage, i, f"context-{i}") for i in range(2)]
+        await asyncio.sleep(TOOL_SECONDS / 2)
+        started = time.perf_counter()
+        for task_id in ids:
+            await broker.cancel_task({"id": task_id})
+        while worker.task_scopes:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        return [(await storage.load_task(i))["status"]["state"] for i in ids], elapsed
+
+
+def test_cancel_stops_running_and_waiting_tasks():
+    seen = []
+    states, elapsed = asyncio.run(cancel_tasks(seen))
+    assert states == ["canceled", "canceled"]
+    assert elapsed < TOOL_SECONDS / 2
+    assert not seen
@@ -0,0 +1,45 @@
+from agent_runtime.service.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def tripped_breaker() -> CircuitBreaker:
+    """Breaker opened by two failed calls, half-open on its next allow()."""
+    breaker = CircuitBreaker(
+        window=4, min_calls=2, failure_rate=0.5, slow_call_ms=1000, open_seconds=0
+    )
+    breaker.record(10, False)
+    breaker.record(10, False)
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_abandoned_probe_gives_its_slot_back():
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    assert breaker.record(0, None) == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_successful_probe_closes():
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    assert breaker.record(10, True) == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_or_slow_probe_reopens():
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    assert breaker.record(10, False) == OPEN
+    breaker.open_seconds = 60
+    assert not breaker.allow()
+
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    assert breaker.record(5000, True) == OPEN
@@ -0,0 +1,30 @@
+from agent_runtime.service.catalog import AgentCatalog
+
+
+def card(name: str, subject: str) -> dict:
+    return {
+        "name": name,
+        "description": f"Answers questions about {subject}",
+        "skills": [{"id": f"{subject}_search", "tags": [subject]}],
+    }
+
+
+CATALOG = AgentCatalog(
+    [card(f"agent_{i}", subject) for i, subject in enumerate(["music", "law", "wine"])]
+)
+
+
+def test_matching_agents_come_first():
+    names = [entry["name"] for entry in CATALOG.search("wine and law", 2)]
+    assert sorted(names) == ["agent_1", "agent_2"]
+
+
+def test_agents_sharing_no_word_fill_in_catalog_order():
+    assert [entry["name"] for entry in CATALOG.search("vineyards", 2)] == [
+        "agent_0",
+        "agent_1",
+    ]
+    assert [entry["name"] for entry in CATALOG.search("wine", 2)] == [
+        "agent_2",
+        "agent_0",
+    ]
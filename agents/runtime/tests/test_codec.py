@@ -0,0 +1,91 @@
+import asyncio
+
+import msgpack
+import pytest
+from agent_runtime.service.codec import (
+    ENCODING_ERRORS,
+    EVENT_MARKER,
+    decode_event,
+    decode_task,
+    encode_event,
+    encode_task,
+    token_key,
+    token_ref,
+)
+from fakeredis import FakeAsyncRedis
+
+TASK = {
+    "task_id": "task-1",
+    "session_id": "session-1",
+    "query": "Qui a écrit « Les Misérables » ? 📚",
+    "deadline": "1760000000.5",
+}
+
+
+def through_stream(fields: dict) -> dict:
+    """Fields of an entry once written to and read back from a stream, by a
+    client decoding replies like the agents' and the server's."""
+
+    async def roundtrip():
+        client = FakeAsyncRedis(decode_responses=True, encoding_errors=ENCODING_ERRORS)
+        await client.xadd("stream", fields)
+        [(_, read)] = await client.xrange("stream")
+        return read
+
+    return asyncio.run(roundtrip())
+
+
+@pytest.mark.parametrize("codec", ["msgpack", "json"])
+def test_task_survives_the_stream(codec):
+    assert decode_task(through_stream(encode_task(TASK, codec))) == TASK
+
+
+def test_packed_bytes_that_are_not_utf8_survive_decoding():
+    fields = through_stream(encode_task(TASK, "msgpack"))
+    packed = msgpack.packb(TASK)
+    # The envelope isn't valid UTF-8, it comes back as surrogates
+    with pytest.raises(UnicodeDecodeError):
+        packed.decode()
+    assert fields["env"].encode("utf-8", ENCODING_ERRORS) == packed
+
+
+def test_unknown_envelope_version_is_refused():
+    fields = {**encode_task(TASK, "msgpack"), "v": "99"}
+    with pytest.raises(ValueError):
+        decode_task(fields)
+
+
+@pytest.mark.parametrize("codec", ["msgpack", "json"])
+def test_event_roundtrip(codec):
+    event = {"status": "completed", "message": "réponse", "task_id": "task-1"}
+    data = encode_event(event, codec)
+    if codec == "msgpack":
+        assert data.startswith(EVENT_MARKER.encode())
+        # Published through a decoding client, the event arrives as a string
+        data = data.decode("utf-8", ENCODING_ERRORS)
+    assert decode_event(data) == event
+
+
+def test_plain_text_is_not_an_event():
+    assert decode_event("user left the chat.") is None
+    assert decode_event("{not json") is None
+
+
+def test_token_by_reference(worker):
+    token = "header.payload.signature"
+    ref = token_ref(token)
+    assert ref == token_ref(token) and token not in ref
+
+    async def resolve():
+        await worker.redis.set(token_key(ref), token)
+        first = await worker.session_token({"token_ref": ref})
+        # Later tasks of the session don't go back to Redis
+        await worker.redis.delete(token_key(ref))
+        return first, await worker.session_token({"token_ref": ref})
+
+    assert asyncio.run(resolve()) == (token, token)
+
+
+def test_unknown_token_reference(worker):
+    ref = token_ref("never stored")
+    assert asyncio.run(worker.session_token({"token_ref": ref})) is None
@@ -0,0 +1,55 @@
+import asyncio
+
+TASK = {"task_id": "task-1", "session_id": "session-1"}
+ANSWER = {"status": "completed", "agent_response": "answer"}
+FAILURE = {"status": "failed", "message": "failed"}
+
+
+def sent_hedge() -> asyncio.Task:
+    """Timer of a hedge copy that went out."""
+
+    async def sent() -> bool:
+        return True
+
+    return asyncio.ensure_future(sent())
+
+
+async def outcomes(worker, *calls) -> list:
+    """Publish each (msg_id, msg_data, outcome, hedge sent) in turn."""
+    for msg_id, msg_data, outcome, hedged in calls:
+        hedge = sent_hedge() if hedged else None
+        if hedge:
+            await hedge
+        await worker.publish_outcome("stream", msg_id, msg_data, outcome, hedge)
+    return worker.published
+
+
+def test_copy_never_reports_failures(worker):
+    copy = {**TASK, "hedge": "1"}
+    assert asyncio.run(outcomes(worker, ("2-0", copy, FAILURE, False))) == []
+    assert worker.acked == ["2-0"]
+
+
+def test_only_the_first_outcome_of_a_hedged_task_is_published(worker):
+    copy = {**TASK, "hedge": "1"}
+    published = asyncio.run(
+        outcomes(worker, ("2-0", copy, ANSWER, False), ("1-0", TASK, FAILURE, True))
+    )
+    assert published == [("2-0", "completed")]
+    assert worker.acked == ["1-0"]
+
+
+def test_primary_failure_claims_before_the_copy_answers(worker):
+    copy = {**TASK, "hedge": "1"}
+    published = asyncio.run(
+        outcomes(worker, ("1-0", TASK, FAILURE, True), ("2-0", copy, ANSWER, False))
+    )
+    assert published == [("1-0", "failed")]
+    assert worker.acked == ["2-0"]
+
+
+def test_unhedged_outcomes_are_published(worker):
+    published = asyncio.run(
+        outcomes(worker, ("1-0", TASK, FAILURE, False), ("3-0", TASK, ANSWER, False))
+    )
+    assert published == [("1-0", "failed"), ("3-0", "completed")]
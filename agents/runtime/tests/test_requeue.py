@@ -0,0 +1,63 @@
+import asyncio
+
+from agent_runtime.service.redis_service import requeue_pending
+from fakeredis import FakeAsyncRedis
+
+STREAM = "test:interactive"
+
+
+async def read(client, consumer: str, count: int) -> list[dict]:
+    replies = await client.xreadgroup(
+        "test-group", consumer, {STREAM: ">"}, count=count
+    )
+    return [fields for _, entries in replies for _, fields in entries]
+
+
+def test_pending_entries_go_back_to_the_group(settings):
+    async def scenario():
+        client = FakeAsyncRedis(decode_responses=True)
+        await client.xgroup_create(STREAM, "test-group", id="0", mkstream=True)
+        for i in range(3):
+            await client.xadd(STREAM, {"task_id": f"task-{i}"})
+        await read(client, "worker-1", 2)
+
+        requeued = await requeue_pending(
+            client, STREAM, "test-group", "worker-1", settings
+        )
+        pending = await client.xpending(STREAM, "test-group")
+        # Another consumer gets the unread entry and the requeued ones
+        return requeued, pending["pending"], await read(client, "worker-2", 10)
+
+    requeued, pending, read_by_other = asyncio.run(scenario())
+    assert requeued == 2
+    assert pending == 0
+    assert [fields["task_id"] for fields in read_by_other] == [
+        "task-2",
+        "task-0",
+        "task-1",
+    ]
+
+
+def test_trimmed_entries_are_only_acknowledged(settings):
+    async def scenario():
+        client = FakeAsyncRedis(decode_responses=True)
+        await client.xgroup_create(STREAM, "test-group", id="0", mkstream=True)
+        msg_id = await client.xadd(STREAM, {"task_id": "task-0"})
+        await read(client, "worker-1", 1)
+        await client.xdel(STREAM, msg_id)
+
+        requeued = await requeue_pending(
+            client, STREAM, "test-group", "worker-1", settings
+        )
+        pending = await client.xpending(STREAM, "test-group")
+        return requeued, pending["pending"], await client.xlen(STREAM)
+
+    assert asyncio.run(scenario()) == (0, 0, 0)
+
+
+def test_missing_group_holds_nothing(settings):
+    client = FakeAsyncRedis(decode_responses=True)
+    requeued = asyncio.run(
+        requeue_pending(client, STREAM, "test-group", "worker-1", settings)
+    )
+    assert requeued == 0
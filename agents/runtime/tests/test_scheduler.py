@@ -0,0 +1,62 @@
+from collections import Counter
+
+import pytest
+from agent_runtime.service.scheduler import DeficitRoundRobin
+
+
+def drain(scheduler: DeficitRoundRobin, count: int) -> list[str]:
+    return [scheduler.pop()[0] for _ in range(count)]
+
+
+def test_lanes_are_served_by_weight_while_backlogged():
+    scheduler = DeficitRoundRobin({"interactive": 4, "bulk": 1})
+    for i in range(100):
+        scheduler.push("interactive", i)
+        scheduler.push("bulk", i)
+
+    served = drain(scheduler, 50)
+    assert Counter(served) == {"interactive": 40, "bulk": 10}
+    # Every round grants the first lane its quantum, then the second
+    assert served[:5] == ["interactive"] * 4 + ["bulk"]
+
+
+def test_equal_weights_alternate():
+    scheduler = DeficitRoundRobin({"a": 1, "b": 1, "c": 1})
+    for lane in "abc":
+        for i in range(3):
+            scheduler.push(lane, i)
+
+    assert drain(scheduler, 9) == list("abc" * 3)
+
+
+def test_entries_of_a_lane_keep_their_order():
+    scheduler = DeficitRoundRobin({"interactive": 2, "bulk": 1})
+    for i in range(5):
+        scheduler.push("interactive", i)
+    scheduler.push("bulk", "only")
+
+    popped = [scheduler.pop() for _ in range(6)]
+    assert [item for lane, item in popped if lane == "interactive"] == [0, 1, 2, 3, 4]
+    assert scheduler.pop() is None
+    assert scheduler.pending() == 0
+
+
+def test_idle_lane_does_not_accumulate_credit():
+    scheduler = DeficitRoundRobin({"interactive": 4, "bulk": 1})
+    for i in range(20):
+        scheduler.push("bulk", i)
+    drain(scheduler, 10)
+
+    # The interactive lane was idle all along, it gets one quantum, not a
+    # burst of everything it missed
+    for i in range(20):
+        scheduler.push("interactive", i)
+    served = drain(scheduler, 10)
+    assert Counter(served) == {"interactive": 8, "bulk": 2}
+
+
+def test_lanes_need_a_positive_weight():
+    with pytest.raises(ValueError):
+        DeficitRoundRobin({"interactive": 1, "bulk": 0})
+    with pytest.raises(ValueError):
+        DeficitRoundRobin({})
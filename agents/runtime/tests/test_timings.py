@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from agent_runtime.service.timings import (
+    TimedStorage,
+    add_hop,
+    hop_time,
+    load_timings,
+)
+from fasta2a.schema import Message, TextPart
+
+
+def test_hops_are_appended_in_order():
+    timings = load_timings({})
+    add_hop(timings, "main-server", "enqueued", at=1000.0)
+    add_hop(timings, "orchestrator", "read")
+    add_hop(timings, "orchestrator", "published")
+
+    assert [hop["hop"] for hop in timings] == ["enqueued", "read", "published"]
+    assert timings[0] == {"service": "main-server", "hop": "enqueued", "at": 1000.0}
+    assert timings[1]["at"] <= timings[2]["at"] <= hop_time()
+
+
+def test_envelope_survives_the_stream_entry():
+    timings = add_hop([], "main-server", "enqueued")
+    assert load_timings({"timings": json.dumps(timings)}) == timings
+    assert load_timings({"timings": ""}) == []
+
+
+def test_storage_stamps_the_agent_run():
+    storage = TimedStorage()
+    messages = [
+        Message(
+            role="user",
+            kind="message",
+            message_id=str(i),
+            parts=[TextPart(kind="text", text=f"message {i}")],
+        )
+        for i in range(3)
+    ]
+
+    async def run():
+        task = await storage.submit_task("context-1", messages[0])
+        for message in messages[1:]:
+            await storage.update_task(task["id"], "submitted", new_messages=[message])
+        await storage.update_task(task["id"], "working")
+        await storage.update_task(task["id"], "completed")
+        last = await storage.load_task(task["id"], history_length=1)
+        none = await storage.load_task(task["id"], history_length=0)
+        return last, none, await storage.load_task(task["id"])
+
+    last, none, whole = asyncio.run(run())
+    metadata = whole["metadata"]
+    assert metadata["llm_start"] <= metadata["llm_end"]
+    assert [m["message_id"] for m in last["history"]] == ["2"]
+    assert none["history"] == []
+    # Loading a slice leaves the stored history whole
+    assert len(whole["history"]) == 3
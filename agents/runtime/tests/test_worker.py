@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+from agent_runtime.service import worker as worker_module
+
+CALL_SECONDS = 0.05
+
+
+def test_subtasks_of_one_task_keep_their_own_entries(worker, monkeypatch):
+    """Two subtasks of the same task, on this agent at once, don't clobber
+    each other's fields and timings."""
+
+    async def validate_token(token, jwks_url):
+        return SimpleNamespace(
+            status_code=200, detail=SimpleNamespace(roles=["test-user"], username="u")
+        )
+
+    seen = {}
+
+    async def call_agent(msg_data, message, hedge):
+        msg_id = message["metadata"]["msg_id"]
+        await asyncio.sleep(CALL_SECONDS)
+        seen[msg_id] = (worker.tasks[msg_id]["query"], msg_id in worker.timings)
+        answer = {"parts": [{"text": msg_data["query"]}]}
+        return "completed", {"result": {"artifacts": [answer]}}
+
+    monkeypatch.setattr(worker_module, "validate_token", validate_token)
+    worker.call_agent = call_agent
+    subtasks = {
+        f"{i}-0": {
+            "task_id": "task-1",
+            "session_id": "session-1",
+            "token": "token",
+            "query": f"step {i}",
+            "reply_to": "reply:1",
+            "subtask_id": f"subtask-{i}",
+        }
+        for i in range(2)
+    }
+
+    async def process():
+        await asyncio.gather(
+            *(
+                worker.process_message("stream", msg_id, msg_data)
+                for msg_id, msg_data in subtasks.items()
+            )
+        )
+
+    asyncio.run(process())
+    assert seen == {"0-0": ("step 0", True), "1-0": ("step 1", True)}
+    assert worker.published == [("0-0", "completed"), ("1-0", "completed")]
+    assert not worker.tasks and not worker.timings
+
+
+def test_cancel_listener_skips_malformed_notices(worker):
+    """A notice that isn't valid JSON or lacks its fields doesn't stop the
+    listener from handling the next one."""
+    cancelled = []
+    worker.cancel_tasks = lambda session_id, task_ids: cancelled.append(
+        (session_id, task_ids)
+    )
+
+    async def listen():
+        listener = asyncio.create_task(
+            worker_module.cancel_listener(worker.redis, "cancel", [worker])
+        )
+        # Notices published before the listener subscribed would be lost
+        while not (await worker.redis.pubsub_numsub("cancel"))[0][1]:
+            await asyncio.sleep(0.01)
+        for notice in ["not json", '{"session_id": "s"}', "[]"]:
+            await worker.redis.publish("cancel", notice)
+        await worker.redis.publish(
+            "cancel", '{"session_id": "session-1", "task_ids": ["task-1"]}'
+        )
+        while not cancelled:
+            await asyncio.sleep(0.01)
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    asyncio.run(asyncio.wait_for(listen(), 5))
+    assert cancelled == [("session-1", ["task-1"])]
@@ -1,21 +1,10 @@
 from functools import lru_cache
 
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from agent_runtime.config.settings import WorkerSettings
 
 
-class Settings(BaseSettings):
-    TOPIC_NAME: str
-    MODEL_NAME: str
-    API_KEY: str
-    REDIS_URL: str
-    CHAT_CHANNEL_NAME: str
-    GROUP_NAME: str
-    CONSUMER_NAME: str
-    JWKS_URL: str
-    AGENT_SERVER_URL: str
-    LOGFIRE_API_KEY: str
-
-    model_config = SettingsConfigDict(env_file=".env")
+class Settings(WorkerSettings):
+    """Agent settings, everything the worker needs comes from WorkerSettings."""
 
 
 @lru_cache
@@ -0,0 +1,226 @@
+import argparse
+import json
+import random
+import time
+
+from agent_runtime.service.catalog import AgentCatalog
+
+from mesh_bench.report import summarize, write_results
+
+# Subjects the synthetic agents are specialized in, a few each
+SUBJECTS = (
+    "astronomy biology chemistry climate cooking cricket crypto databases "
+    "economics education energy fashion film finance football gardening "
+    "genetics geography geology history insurance kubernetes law linguistics "
+    "literature logistics marketing mathematics medicine music mythology "
+    "networking nutrition oceanography painting payroll philosophy photography "
+    "physics poetry politics psychology recruiting robotics security shipping "
+    "sociology statistics taxes tennis theatre tourism translation travel "
+    "vaccines weather wine zoology"
+).split()
+# Wording of each subject sharing no word with the cards, as users may put it
+PARAPHRASES = {
+    "astronomy": "stars and planets",
+    "biology": "living cells",
+    "chemistry": "molecules reacting",
+    "climate": "global warming",
+    "cooking": "recipes",
+    "cricket": "wickets and bowlers",
+    "crypto": "bitcoin",
+    "databases": "sql tables",
+    "economics": "inflation",
+    "education": "schooling",
+    "energy": "power plants",
+    "fashion": "clothing trends",
+    "film": "movies",
+    "finance": "investing",
+    "football": "soccer",
+    "gardening": "growing plants",
+    "genetics": "dna",
+    "geography": "maps and countries",
+    "geology": "rocks",
+    "history": "the past",
+    "insurance": "coverage policies",
+    "kubernetes": "container clusters",
+    "law": "courts",
+    "linguistics": "languages",
+    "literature": "novels",
+    "logistics": "supply chains",
+    "marketing": "advertising",
+    "mathematics": "algebra",
+    "medicine": "doctors",
+    "music": "songs",
+    "mythology": "ancient gods",
+    "networking": "routers",
+    "nutrition": "healthy eating",
+    "oceanography": "seas",
+    "painting": "artists",
+    "payroll": "salaries",
+    "philosophy": "ethics",
+    "photography": "cameras",
+    "physics": "quantum mechanics",
+    "poetry": "poems",
+    "politics": "elections",
+    "psychology": "the mind",
+    "recruiting": "hiring",
+    "robotics": "robots",
+    "security": "hackers",
+    "shipping": "freight",
+    "sociology": "society",
+    "statistics": "probability",
+    "taxes": "irs returns",
+    "tennis": "wimbledon",
+    "theatre": "stage plays",
+    "tourism": "sightseeing",
+    "translation": "interpreters",
+    "travel": "trips abroad",
+    "vaccines": "immunization",
+    "weather": "forecasts",
+    "wine": "vineyards",
+    "zoology": "animals",
+}
+# Average bytes per token of English text and JSON for common tokenizers
+BYTES_PER_TOKEN = 4
+
+
+def agent_card(index: int, subjects: list[str]) -> dict:
+    """Card shaped like the ones the agents' A2A servers serve."""
+    topics = ", ".join(subjects)
+    return {
+        "name": f"{subjects[0]}_agent_{index}",
+        "description": (
+            f"An information agent that answers user queries about {topics} "
+            "using its own knowledge base and documentation, providing accurate "
+            "summaries with citations."
+        ),
+        "url": f"http://localhost:{9000 + index}",
+        "version": "1.0.0",
+        "protocolVersion": "0.2.5",
+        "skills": [
+            {
+                "id": f"{subject}_search",
+                "name": f"{subject} search",
+                "description": f"Looks up {subject} articles and summarizes them",
+                "tags": [subject, "search", "summary"],
+                "examples": [f"What is new in {subject}?"],
+                "inputModes": ["application/json"],
+                "outputModes": ["application/json"],
+            }
+            for subject in subjects
+        ],
+        "defaultInputModes": ["application/json"],
+        "defaultOutputModes": ["application/json"],
+        "capabilities": {
+            "streaming": False,
+            "pushNotifications": False,
+            "stateTransitionHistory": False,
+        },
+    }
+
+
+def registry(agents: int, rng: random.Random) -> list[dict]:
+    return [agent_card(i, rng.sample(SUBJECTS, 3)) for i in range(agents)]
+
+
+def queries(
+    cards: list[dict], count: int, rng: random.Random, paraphrased: bool = False
+) -> list[tuple]:
+    """Queries each meant for one agent, naming two of its subjects.
+
+    Paraphrased queries name the subjects in words the cards don't use.
+    """
+    picked = []
+    for _ in range(count):
+        card = rng.choice(cards)
+        first, second = rng.sample([skill["tags"][0] for skill in card["skills"]], 2)
+        if paraphrased:
+            first, second = PARAPHRASES[first], PARAPHRASES[second]
+        query = f"Can you tell me how {first} relates to {second} these days?"
+        picked.append((card["name"], query))
+    return picked
+
+
+def catalog_prompt(entries) -> str:
+    return f"Agents available: {json.dumps(entries, separators=(',', ':'))}"
+
+
+def measure(args) -> dict:
+    rng = random.Random(args.seed)
+    results = {"config": vars(args), "agents": {}}
+    for agents in args.agents:
+        cards = registry(agents, rng)
+        started = time.perf_counter()
+        catalog = AgentCatalog(cards)
+        index_ms = (time.perf_counter() - started) * 1000
+
+        full_bytes, compact_bytes, top_k_bytes = [], [], []
+        full_us, top_k_us = [], []
+        shown, hits = [], 0
+        for target, query in queries(cards, args.queries, rng):
+            # Every card as raw JSON in every request, as before the index
+            started = time.perf_counter()
+            prompt = f"Agent Available : {str(cards)}"
+            full_us.append((time.perf_counter() - started) * 1e6)
+            full_bytes.append(len(prompt.encode()))
+            compact_bytes.append(len(catalog_prompt(catalog.entries).encode()))
+
+            started = time.perf_counter()
+            entries = catalog.search(query, args.top_k)
+            prompt = catalog_prompt(entries)
+            top_k_us.append((time.perf_counter() - started) * 1e6)
+            top_k_bytes.append(len(prompt.encode()))
+            shown.append(len(entries))
+            hits += any(entry["name"] == target for entry in entries)
+
+        full = summarize(full_bytes)
+        top_k = summarize(top_k_bytes)
+        # Without a word in common with any card, only the fallback is left
+        paraphrased_shown, paraphrased_hits = [], 0
+        for target, query in queries(cards, args.queries, rng, paraphrased=True):
+            entries = catalog.search(query, args.top_k)
+            paraphrased_shown.append(len(entries))
+            paraphrased_hits += any(entry["name"] == target for entry in entries)
+
+        results["agents"][agents] = {
+            "index_ms": round(index_ms, 3),
+            "full_bytes": full,
+            "compact_bytes": summarize(compact_bytes),
+            "top_k_bytes": top_k,
+            "full_tokens_est": round(full["p50"] / BYTES_PER_TOKEN),
+            "top_k_tokens_est": round(top_k["p50"] / BYTES_PER_TOKEN),
+            "full_build_us": summarize(full_us),
+            "top_k_build_us": summarize(top_k_us),
+            "agents_shown": summarize(shown),
+            # Queries whose intended agent made it into the prompt
+            "recall": round(hits / args.queries, 3),
+            "paraphrased_agents_shown": summarize(paraphrased_shown),
+            "paraphrased_recall": round(paraphrased_hits / args.queries, 3),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the orchestrator prompt with every agent card and "
+        "with the top-k relevant agents"
+    )
+    parser.add_argument("--agents", type=int, nargs="*", default=[3, 30, 300])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="catalog.json")
+    args = parser.parse_args()
+
+    results = measure(args)
+    for agents, stats in results["agents"].items():
+        print(
+            f"[Bench] {agents:>4} agents: full p50={stats['full_bytes']['p50']}B "
+            f"(~{stats['full_tokens_est']} tokens) "
+            f"top-{args.top_k} p50={stats['top_k_bytes']['p50']}B "
+            f"(~{stats['top_k_tokens_est']} tokens) "
+            f"retrieval p95={stats['top_k_build_us']['p95']}us "
+            f"recall={stats['recall']} "
+            f"paraphrased recall={stats['paraphrased_recall']} "
+            f"with {stats['paraphrased_agents_shown']['p50']} agents shown"
+        )
+    write_results(results, args.output)
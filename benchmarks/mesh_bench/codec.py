@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import json
+import time
+import timeit
+import uuid
+from datetime import datetime
+
+import redis.asyncio as redis
+from agent_runtime.service.codec import (
+    ENCODING_ERRORS,
+    decode_event,
+    decode_task,
+    encode_event,
+    encode_task,
+    token_ref,
+)
+from agent_runtime.service.timings import add_hop
+
+from mesh_bench.keycloak import StubKeycloak
+from mesh_bench.mesh import PREFIX
+from mesh_bench.report import write_results
+
+CODECS = ["json", "msgpack"]
+# Hops of a task answered by a child agent
+HOPS = [
+    ("server", "enqueue"),
+    ("orchestrator", "read"),
+    ("orchestrator", "route"),
+    ("orchestrator", "enqueue"),
+    ("wikipedia", "read"),
+    ("wikipedia", "llm_start"),
+    ("wikipedia", "llm_end"),
+    ("wikipedia", "publish"),
+]
+
+
+def sample_task(token: str, codec: str) -> dict:
+    """Task as the chat server enqueues it for a child agent."""
+    timings = []
+    for service, hop in HOPS[:4]:
+        add_hop(timings, service, hop)
+    task = {
+        "task_id": str(uuid.uuid4()),
+        "query": "tell me about the history of the printing press",
+        "timestamp": str(datetime.now()),
+        "deadline": str(time.time() + 60),
+        "session_id": str(uuid.uuid4()),
+        "lane": "interactive",
+        "timings": json.dumps(timings),
+        "traceparent": f"00-{uuid.uuid4().hex}-{uuid.uuid4().hex[:16]}-01",
+    }
+    if codec == "msgpack":
+        task["token_ref"] = token_ref(token)
+    else:
+        task["token"] = token
+    return task
+
+
+def sample_event() -> dict:
+    """Answer a child agent publishes on the chat channel."""
+    timings = []
+    for service, hop in HOPS:
+        add_hop(timings, service, hop)
+    return {
+        "status": "completed",
+        "type": "response",
+        "task_id": str(uuid.uuid4()),
+        "agent_response": "The printing press was invented around 1440. " * 10,
+        "time_taken": timings[-1]["at"] - timings[0]["at"],
+        "timings": timings,
+        "traceparent": f"00-{uuid.uuid4().hex}-{uuid.uuid4().hex[:16]}-01",
+    }
+
+
+def size(value) -> int:
+    return len(value if isinstance(value, bytes) else value.encode())
+
+
+def cpu_us(function, repeat: int) -> float:
+    """Microseconds per call, best of three runs."""
+    return round(
+        min(timeit.repeat(function, number=repeat, repeat=3)) / repeat * 1e6, 3
+    )
+
+
+async def redis_bytes(url: str, entries: dict[str, dict], count: int) -> dict:
+    """Memory a stream of `count` entries takes in Redis, per entry."""
+    client = redis.from_url(url, decode_responses=True, encoding_errors=ENCODING_ERRORS)
+    result = {}
+    for codec, fields in entries.items():
+        stream = f"{PREFIX}codec-{codec}"
+        await client.delete(stream)
+        async with client.pipeline(transaction=False) as pipe:
+            for _ in range(count):
+                pipe.xadd(stream, fields)
+            await pipe.execute()
+        result[codec] = round(await client.memory_usage(stream, samples=0) / count, 1)
+        await client.delete(stream)
+    await client.aclose()
+    return result
+
+
+def measure(args) -> dict:
+    token = StubKeycloak(0).token("bench-user", ["orchestrator-user"])
+    event = sample_event()
+    results = {"config": vars(args), "token_bytes": len(token), "codecs": {}}
+    entries = {}
+    for codec in CODECS:
+        task = sample_task(token, codec)
+        fields = encode_task(task, codec)
+        entries[codec] = fields
+        payload = encode_event(event, codec)
+        results["codecs"][codec] = {
+            # Field names and values as they go over the wire
+            "task_bytes": sum(size(k) + size(v) for k, v in fields.items()),
+            "event_bytes": size(payload),
+            "task_encode_us": cpu_us(lambda: encode_task(task, codec), args.repeat),
+            "task_decode_us": cpu_us(lambda: decode_task(fields), args.repeat),
+            "event_encode_us": cpu_us(lambda: encode_event(event, codec), args.repeat),
+            "event_decode_us": cpu_us(lambda: decode_event(payload), args.repeat),
+        }
+    if args.redis_url:
+        stored = asyncio.run(redis_bytes(args.redis_url, entries, args.entries))
+        for codec, per_entry in stored.items():
+            results["codecs"][codec]["redis_bytes_per_task"] = per_entry
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the size and cost of the task and event codecs"
+    )
+    parser.add_argument("--repeat", type=int, default=20000)
+    parser.add_argument(
+        "--redis-url", help="Redis to measure stream memory in, skipped otherwise"
+    )
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--output", default="codec.json")
+    args = parser.parse_args()
+
+    results = measure(args)
+    print(f"[Bench] Token of {results['token_bytes']} bytes")
+    for codec, stats in results["codecs"].items():
+        print(f"    {codec:<8} " + " ".join(f"{k}={v}" for k, v in stats.items()))
+    write_results(results, args.output)
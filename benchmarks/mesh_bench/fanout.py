@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import resource
+import time
+from pathlib import Path
+
+import httpx
+import psutil
+import redis.asyncio as redis
+import websockets
+
+from mesh_bench.mesh import CHAT_CHANNEL, Mesh
+from mesh_bench.report import summarize, write_results
+
+# Sockets a client process opens at the same time
+CONNECT_CONCURRENCY = 100
+# Seconds between two /healthz probes of the server while publishing
+HEALTH_PROBE_SECONDS = 0.1
+# Benchmark messages start with this, so clients skip the chat traffic
+MARKER = '{"bench": true'
+
+
+def raise_fd_limit():
+    """Allow as many open sockets as the hard limit permits."""
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def hold_sockets(url: str, count: int, probes: int, pipe):
+    """Open `count` sockets and count what they receive until told to stop.
+
+    The first `probes` sockets also record the latency of every message, the
+    clock is shared with the publisher as both run on the same machine.
+    """
+    delivered: dict[int, int] = {}
+    latencies: dict[int, list[float]] = {}
+    semaphore = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def connect():
+        async with semaphore:
+            return await websockets.connect(
+                url, max_size=None, ping_interval=None, open_timeout=120
+            )
+
+    async def read(websocket, probe: bool):
+        try:
+            async for raw in websocket:
+                if not raw.startswith(MARKER):
+                    continue
+                message = json.loads(raw)
+                step = message["step"]
+                delivered[step] = delivered.get(step, 0) + 1
+                if probe:
+                    latency = (time.monotonic() - message["sent"]) * 1000
+                    latencies.setdefault(step, []).append(latency)
+        except websockets.ConnectionClosed:
+            pass
+
+    # A refused socket is reported rather than failing the whole process
+    opened = await asyncio.gather(
+        *(connect() for _ in range(count)), return_exceptions=True
+    )
+    sockets = [s for s in opened if not isinstance(s, BaseException)]
+    for error in {repr(s) for s in opened if isinstance(s, BaseException)}:
+        print(f"[Bench] Failed to connect: {error}")
+    readers = [
+        asyncio.create_task(read(websocket, index < probes))
+        for index, websocket in enumerate(sockets)
+    ]
+    pipe.send(len(sockets))
+    # Blocks until the benchmark is over
+    await asyncio.to_thread(pipe.recv)
+    for websocket in sockets:
+        await websocket.close()
+    await asyncio.gather(*readers)
+    pipe.send({"delivered": delivered, "latencies": latencies})
+
+
+def client_process(url: str, count: int, probes: int, pipe):
+    raise_fd_limit()
+    asyncio.run(hold_sockets(url, count, probes, pipe))
+
+
+async def probe_health(url: str, samples: list[float], stop: asyncio.Event):
+    """Time /healthz while publishing, a busy event loop answers it late."""
+    async with httpx.AsyncClient(timeout=30) as client:
+        while not stop.is_set():
+            started = time.perf_counter()
+            await client.get(url)
+            samples.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(HEALTH_PROBE_SECONDS)
+
+
+def cpu_seconds(process: psutil.Process) -> float:
+    times = process.cpu_times()
+    return times.user + times.system
+
+
+async def fanout_bench(args, strategy: str) -> dict:
+    """Measure one delivery strategy of the chat server at every rate."""
+    mesh = Mesh(
+        base_port=args.base_port,
+        redis_url=args.redis_url,
+        log_dir=Path(args.log_dir) / strategy,
+        llm_latency_ms=0,
+        jitter_ms=0,
+        tool_latency_ms=0,
+        seed=0,
+        server_env={
+            "FANOUT_STRATEGY": strategy,
+            **dict(env.split("=", 1) for env in args.server_env),
+        },
+        agents=False,
+    )
+    async with mesh:
+        server = psutil.Process(mesh.processes["server"].pid)
+        url = (
+            f"{mesh.server_url}?token={mesh.token('bench-user')}"
+            "&session_id=bench-fanout"
+        )
+        rss_before = server.memory_info().rss
+
+        # Sockets and probes are spread over the client processes
+        context = multiprocessing.get_context("spawn")
+        clients = []
+        started = time.perf_counter()
+        for index in range(args.client_procs):
+            count = args.connections // args.client_procs + (
+                index < args.connections % args.client_procs
+            )
+            probes = args.probes // args.client_procs + (
+                index < args.probes % args.client_procs
+            )
+            pipe, child_pipe = context.Pipe()
+            process = context.Process(
+                target=client_process, args=(url, count, probes, child_pipe)
+            )
+            process.start()
+            clients.append((process, pipe))
+        connected = sum([await asyncio.to_thread(pipe.recv) for _, pipe in clients])
+        connect_seconds = time.perf_counter() - started
+        # Let the welcome messages of the new sockets go out first
+        await asyncio.sleep(args.settle)
+        rss_after = server.memory_info().rss
+        print(f"[Bench] {strategy}: {connected} sockets in {connect_seconds:.1f}s")
+
+        publisher = redis.from_url(mesh.redis_url, decode_responses=True)
+        pad = "x" * args.message_bytes
+        steps = []
+        for step, rate in enumerate(args.rates):
+            health: list[float] = []
+            stop = asyncio.Event()
+            prober = asyncio.create_task(
+                probe_health(
+                    f"http://127.0.0.1:{mesh.server_port}/healthz", health, stop
+                )
+            )
+            cpu_before = cpu_seconds(server)
+            total = int(rate * args.step_seconds)
+            step_started = time.perf_counter()
+            for seq in range(total):
+                delay = step_started + seq / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                message = {
+                    "bench": True,
+                    "step": step,
+                    "seq": seq,
+                    "sent": time.monotonic(),
+                    "pad": pad,
+                }
+                await publisher.publish(CHAT_CHANNEL, json.dumps(message))
+            await asyncio.sleep(args.settle)
+            stop.set()
+            await prober
+            cpu = cpu_seconds(server) - cpu_before
+            steps.append(
+                {
+                    "rate": rate,
+                    "published": total,
+                    "cpu_ms_per_message": round(cpu / total * 1000, 4)
+                    if total
+                    else None,
+                    "cpu_us_per_delivery": round(cpu / (total * connected) * 1e6, 4)
+                    if total and connected
+                    else None,
+                    "healthz_ms": summarize(health),
+                }
+            )
+            print(f"[Bench] {strategy}: published {total} at {rate}/s")
+        await publisher.aclose()
+
+        for _, pipe in clients:
+            pipe.send("stop")
+        results = [await asyncio.to_thread(pipe.recv) for _, pipe in clients]
+        for process, _ in clients:
+            process.join()
+
+    for step, stats in enumerate(steps):
+        delivered = sum(r["delivered"].get(step, 0) for r in results)
+        latencies = [
+            latency for r in results for latency in r["latencies"].get(step, [])
+        ]
+        stats["delivered_ratio"] = (
+            round(delivered / (stats["published"] * connected), 4)
+            if stats["published"] and connected
+            else None
+        )
+        stats["latency_ms"] = summarize(latencies)
+    return {
+        "connections": connected,
+        "connect_seconds": round(connect_seconds, 3),
+        "rss_per_connection_kb": round((rss_after - rss_before) / connected / 1024, 3)
+        if connected
+        else None,
+        "steps": steps,
+    }
+
+
+async def main(args) -> dict:
+    return {
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline", "log_dir")
+        },
+        "strategies": {
+            strategy: await fanout_bench(args, strategy) for strategy in args.strategies
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure how the chat server holds sockets and fans messages out"
+    )
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument(
+        "--probes", type=int, default=100, help="sockets recording latency"
+    )
+    parser.add_argument("--client-procs", type=int, default=4)
+    parser.add_argument(
+        "--rates", type=float, nargs="+", default=[10, 50, 200], help="messages/s"
+    )
+    parser.add_argument("--step-seconds", type=float, default=10)
+    parser.add_argument(
+        "--settle", type=float, default=5, help="seconds to let deliveries finish"
+    )
+    parser.add_argument("--message-bytes", type=int, default=256)
+    parser.add_argument(
+        "--strategies",
+        nargs="+",
+        default=["sequential", "concurrent"],
+        choices=["sequential", "concurrent"],
+    )
+    parser.add_argument("--redis-url")
+    parser.add_argument("--base-port", type=int, default=8900)
+    parser.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--log-dir", default="bench-logs")
+    parser.add_argument("--output", default="fanout.json")
+    args = parser.parse_args()
+
+    # The server inherits the limit when the mesh starts it
+    raise_fd_limit()
+    results = asyncio.run(main(args))
+    for strategy, result in results["strategies"].items():
+        print(
+            f"[Bench] {strategy}: {result['connections']} sockets, "
+            f"{result['rss_per_connection_kb']}KB each"
+        )
+        for step in result["steps"]:
+            print(
+                f"    {step['rate']:>8}/s delivered={step['delivered_ratio']} "
+                f"p50={step['latency_ms'].get('p50')}ms "
+                f"p99={step['latency_ms'].get('p99')}ms "
+                f"cpu/msg={step['cpu_ms_per_message']}ms "
+                f"healthz p99={step['healthz_ms'].get('p99')}ms"
+            )
+    write_results(results, args.output)
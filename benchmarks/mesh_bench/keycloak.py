@@ -0,0 +1,76 @@
+import threading
+import time
+
+import uvicorn
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Key id of the only signing key
+KID = "mesh-bench"
+
+
+class StubKeycloak:
+    """JWKS endpoint and token minting standing in for Keycloak."""
+
+    def __init__(self, port: int):
+        self.port = port
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        public_pem = key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        self.jwk = {
+            **jwk.construct(public_pem, "RS256").to_dict(),
+            "kid": KID,
+            "use": "sig",
+        }
+        self.server = uvicorn.Server(
+            uvicorn.Config(
+                Starlette(routes=[Route("/certs", self.certs)]),
+                host="127.0.0.1",
+                port=port,
+                log_level="warning",
+            )
+        )
+        # Served from its own thread, so uvicorn leaves the signals alone and
+        # the clients' event loop isn't slowed down by it
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def jwks_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/certs"
+
+    async def certs(self, request: Request) -> JSONResponse:
+        return JSONResponse({"keys": [self.jwk]})
+
+    def token(self, username: str, roles: list[str]) -> str:
+        """Access token the server and the agents accept for `username`."""
+        return jwt.encode(
+            {
+                "preferred_username": username,
+                "realm_access": {"roles": roles},
+                "exp": int(time.time()) + 24 * 3600,
+            },
+            self.private_pem,
+            algorithm="RS256",
+            headers={"kid": KID},
+        )
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join()
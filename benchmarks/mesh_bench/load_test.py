@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+import websockets
+
+from mesh_bench.mesh import Mesh
+from mesh_bench.report import segments, summarize, write_results
+
+# Frames reporting that a task won't be answered
+ERROR_STATUSES = {"error", "failed", "unauthorized", "expired", "busy", "unavailable"}
+# Queries are numbered so the answer can be matched to its request
+QUERY_ID = re.compile(r"\[q(\d+)\]")
+TOPICS = ["history", "physics", "models", "datasets", "geography", "music"]
+
+
+class Client:
+    """One websocket session sending the queries scheduled for it."""
+
+    def __init__(self, index: int, websocket):
+        self.index = index
+        self.websocket = websocket
+        # Send time of every query still waiting for its answer, by id
+        self.pending: dict[int, float] = {}
+        self.latencies: list[float] = []
+        self.stages: dict[str, list[float]] = {}
+        self.errors: Counter = Counter()
+        self.last_answer: float | None = None
+
+    async def send(self, query_id: int, query: str):
+        self.pending[query_id] = time.perf_counter()
+        await self.websocket.send(f"[q{query_id}] {query}")
+
+    def on_frame(self, raw: str):
+        try:
+            frame = json.loads(raw)
+        except ValueError:
+            return
+        if not isinstance(frame, dict):
+            return
+        status = frame.get("status")
+        # Busy frames only go to the sender, everything else is broadcast
+        # to all the clients and counted once, by the first one
+        if status == "busy" or (status in ERROR_STATUSES and self.index == 0):
+            self.errors[status] += 1
+            return
+        if frame.get("type") != "response":
+            return
+        match = QUERY_ID.search(frame.get("agent_response", ""))
+        if not match or int(match.group(1)) not in self.pending:
+            return
+        now = time.perf_counter()
+        sent = self.pending.pop(int(match.group(1)))
+        self.latencies.append((now - sent) * 1000)
+        self.last_answer = now
+        for name, duration in segments(frame.get("timings") or []).items():
+            self.stages.setdefault(name, []).append(duration)
+
+    async def receive(self):
+        try:
+            async for raw in self.websocket:
+                self.on_frame(raw)
+        except websockets.ConnectionClosed:
+            pass
+
+
+async def load_test(args) -> dict:
+    rng = random.Random(args.seed)
+    total = int(args.rate * args.duration)
+    queries = [
+        f"tell me about {rng.choice(TOPICS)} {rng.randrange(10_000)}"
+        for _ in range(total)
+    ]
+    mesh = Mesh(
+        base_port=args.base_port,
+        redis_url=args.redis_url,
+        log_dir=Path(args.log_dir),
+        llm_latency_ms=args.llm_latency_ms,
+        jitter_ms=args.jitter_ms,
+        tool_latency_ms=args.tool_latency_ms,
+        seed=args.seed,
+        server_env=dict(env.split("=", 1) for env in args.server_env),
+        agent_env=dict(env.split("=", 1) for env in args.agent_env),
+    )
+    async with mesh:
+        clients = []
+        for index in range(args.clients):
+            websocket = await websockets.connect(
+                f"{mesh.server_url}?token={mesh.token(f'bench-user-{index}')}"
+                f"&session_id=bench-session-{index}",
+                max_size=None,
+            )
+            clients.append(Client(index, websocket))
+        receivers = [asyncio.create_task(c.receive()) for c in clients]
+
+        # Open loop: queries go out on schedule whether or not the mesh keeps up
+        started = time.perf_counter()
+        for query_id, query in enumerate(queries):
+            delay = started + query_id / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await clients[query_id % len(clients)].send(query_id, query)
+        sent_in = time.perf_counter() - started
+
+        deadline = time.monotonic() + args.timeout
+        while any(c.pending for c in clients) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        for client in clients:
+            await client.websocket.close()
+        await asyncio.gather(*receivers)
+
+    latencies = [latency for c in clients for latency in c.latencies]
+    errors = sum((c.errors for c in clients), Counter())
+    errors["timeout"] = sum(len(c.pending) for c in clients)
+    stages: dict[str, list[float]] = {}
+    for client in clients:
+        for name, durations in client.stages.items():
+            stages.setdefault(name, []).extend(durations)
+    last_answer = max((c.last_answer for c in clients if c.last_answer), default=None)
+    elapsed = (last_answer - started) if last_answer else sent_in
+
+    return {
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline", "log_dir")
+        },
+        "requests": total,
+        "answered": len(latencies),
+        "send_rate_rps": round(total / sent_in, 3) if sent_in else None,
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "stages_ms": {name: summarize(d) for name, d in sorted(stages.items())},
+        "errors": dict(errors),
+        "error_rate": round((total - len(latencies)) / total, 4) if total else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Drive the mesh with websocket clients and report latency"
+    )
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=10, help="queries per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument(
+        "--timeout", type=float, default=30, help="seconds to wait for answers"
+    )
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--tool-latency-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--redis-url", help="Redis to use, a throwaway redis-server otherwise"
+    )
+    parser.add_argument("--base-port", type=int, default=8900)
+    parser.add_argument(
+        "--server-env",
+        nargs="*",
+        default=[],
+        metavar="KEY=VALUE",
+        help="settings overrides for the chat server",
+    )
+    parser.add_argument(
+        "--agent-env",
+        nargs="*",
+        default=[],
+        metavar="KEY=VALUE",
+        help="settings overrides for every agent, e.g. DELEGATION_MODE=gather",
+    )
+    parser.add_argument("--log-dir", default="bench-logs")
+    parser.add_argument("--output", default="load_test.json")
+    parser.add_argument("--baseline", help="previous results to compare with")
+    args = parser.parse_args()
+
+    results = asyncio.run(load_test(args))
+    print(
+        f"[Bench] {results['answered']}/{results['requests']} answered, "
+        f"{results['throughput_rps']} rps, latency {results['latency_ms']}"
+    )
+    for name, stage in results["stages_ms"].items():
+        print(f"    {name:<50} p50={stage['p50']:>9} p99={stage['p99']:>9}")
+    if any(results["errors"].values()):
+        print(f"[Bench] Errors: {results['errors']}")
+    write_results(results, args.output, args.baseline)
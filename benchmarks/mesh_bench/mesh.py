@@ -0,0 +1,266 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import redis.asyncio as redis
+
+from mesh_bench.keycloak import StubKeycloak
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+SERVER_DIR = REPO_DIR / "server"
+AGENTS_DIR = REPO_DIR / "agents"
+BENCHMARKS_DIR = REPO_DIR / "benchmarks"
+
+# Agent projects started by the mesh, the first one routes to the others
+ORCHESTRATOR = "orchestrator"
+CHILD_AGENTS = ["wikipedia", "hugging_face"]
+# Prefix of every stream, channel and group the mesh uses, so a shared Redis
+# is left alone besides them
+PREFIX = "bench-"
+CHAT_CHANNEL = f"{PREFIX}chat"
+
+
+def topic(project: str) -> str:
+    return f"{PREFIX}{project}"
+
+
+class Mesh:
+    """The chat server and the agents running against local stand-ins.
+
+    Agents run as their own processes with a stub model and stub MCP servers,
+    tokens come from a stub Keycloak and everything shares one Redis, either
+    given by URL or a throwaway `redis-server` started on `base_port`.
+    """
+
+    def __init__(
+        self,
+        base_port: int,
+        redis_url: str | None,
+        log_dir: Path,
+        llm_latency_ms: float,
+        jitter_ms: float,
+        tool_latency_ms: float,
+        seed: int,
+        server_env: dict[str, str],
+        agents: bool = True,
+        agent_env: dict[str, str] | None = None,
+    ):
+        self.log_dir = log_dir
+        self.ports = iter(range(base_port, base_port + 100))
+        self.redis_port = next(self.ports)
+        self.redis_url = redis_url or f"redis://127.0.0.1:{self.redis_port}"
+        self.start_redis = redis_url is None
+        self.keycloak = StubKeycloak(next(self.ports))
+        self.server_port = next(self.ports)
+        # Without agents only the chat server runs, e.g. to measure fan-out
+        self.agent_ports = {
+            project: next(self.ports)
+            for project in ([ORCHESTRATOR, *CHILD_AGENTS] if agents else [])
+        }
+        self.stub_args = [
+            "--latency-ms",
+            str(llm_latency_ms),
+            "--jitter-ms",
+            str(jitter_ms),
+            "--tool-latency-ms",
+            str(tool_latency_ms),
+            "--seed",
+            str(seed),
+        ]
+        self.server_env = server_env
+        # Settings overrides for every agent
+        self.agent_overrides = agent_env or {}
+        self.processes: dict[str, subprocess.Popen] = {}
+        self.roles = [f"{topic(p)}-user" for p in [ORCHESTRATOR, *CHILD_AGENTS]]
+
+    @property
+    def server_url(self) -> str:
+        return f"ws://127.0.0.1:{self.server_port}/ws/chat"
+
+    def token(self, username: str) -> str:
+        return self.keycloak.token(username, self.roles)
+
+    def spawn(self, name: str, args: list[str], env: dict[str, str], cwd: Path):
+        log = open(self.log_dir / f"{name}.log", "w")
+        self.processes[name] = subprocess.Popen(
+            args,
+            cwd=cwd,
+            env={
+                **os.environ,
+                "PYTHONPATH": os.pathsep.join(
+                    [str(BENCHMARKS_DIR), os.environ.get("PYTHONPATH", "")]
+                ),
+                "LOGFIRE_SEND_TO_LOGFIRE": "false",
+                "LOGFIRE_CONSOLE": "false",
+                **env,
+            },
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+    def agent_env(self, project: str) -> dict[str, str]:
+        name = topic(project)
+        return {
+            "TOPIC_NAME": name,
+            "MODEL_NAME": "stub",
+            "API_KEY": "stub",
+            "REDIS_URL": self.redis_url,
+            "CHAT_CHANNEL_NAME": CHAT_CHANNEL,
+            "CANCEL_CHANNEL_NAME": f"{PREFIX}cancellations",
+            "GROUP_NAME": f"{name}-group",
+            "CONSUMER_NAME": f"{name}-1",
+            "JWKS_URL": self.keycloak.jwks_url,
+            "AGENT_SERVER_URL": f"http://127.0.0.1:{self.agent_ports[project]}",
+            "LOGFIRE_API_KEY": "",
+            "DRAIN_TIMEOUT_SECONDS": "2",
+            "AGENT_URLS": json.dumps(
+                [f"http://127.0.0.1:{self.agent_ports[c]}" for c in CHILD_AGENTS]
+            ),
+            **self.agent_overrides,
+        }
+
+    def server_env_vars(self) -> dict[str, str]:
+        return {
+            "KEYCLOAK_URL": "http://127.0.0.1",
+            "REALM_NAME": "bench",
+            "KEYCLOAK_CLIENT_ID": "bench",
+            "KEYCLOAK_CLIENT_SECRET": "bench",
+            "JWKS_URL": self.keycloak.jwks_url,
+            "AUTHORIZATION_URL": "http://127.0.0.1/auth",
+            "TOKEN_URL": "http://127.0.0.1/token",
+            "REDIRECT_URI": "http://127.0.0.1/callback",
+            "REDIS_URL": self.redis_url,
+            "CHAT_CHANNEL_NAME": CHAT_CHANNEL,
+            "CANCEL_CHANNEL_NAME": f"{PREFIX}cancellations",
+            "ORCHESTRATOR_TASK_QUEUE_NAME": topic(ORCHESTRATOR),
+            "LOGFIRE_API_KEY": "",
+            "DRAIN_TIMEOUT_SECONDS": "1",
+            # Admission is measured separately, let the whole load in
+            "USER_RATE_PER_SECOND": "100000",
+            "USER_BURST": "100000",
+            "GLOBAL_RATE_PER_SECOND": "100000",
+            "GLOBAL_BURST": "100000",
+            "MAX_ORCHESTRATOR_BACKLOG": "100000",
+            **self.server_env,
+        }
+
+    async def reset_redis(self):
+        """Forget the streams and keys of a previous run."""
+        client = redis.from_url(self.redis_url, decode_responses=True)
+        keys = [key async for key in client.scan_iter(f"{PREFIX}*")]
+        if keys:
+            await client.delete(*keys)
+        await client.close()
+
+    async def wait_ready(self, timeout: float):
+        """Wait for /readyz of the server and every agent to answer 200."""
+        urls = {
+            "server": f"http://127.0.0.1:{self.server_port}/readyz",
+            **{
+                p: f"http://127.0.0.1:{port}/readyz"
+                for p, port in self.agent_ports.items()
+            },
+        }
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            for name, url in urls.items():
+                while True:
+                    process = self.processes[name]
+                    if process.poll() is not None:
+                        raise RuntimeError(
+                            f"{name} exited with {process.returncode}, "
+                            f"see {self.log_dir / name}.log"
+                        )
+                    try:
+                        if (await client.get(url)).status_code == 200:
+                            break
+                    except httpx.HTTPError:
+                        pass
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"{name} not ready after {timeout}s")
+                    await asyncio.sleep(0.2)
+
+    async def start(self, boot_timeout: float = 60):
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        if self.start_redis:
+            server = shutil.which("redis-server")
+            if not server:
+                raise RuntimeError("redis-server not found, pass --redis-url instead")
+            self.spawn(
+                "redis",
+                [server, "--port", str(self.redis_port), "--save", ""],
+                {},
+                self.log_dir,
+            )
+            await asyncio.sleep(0.5)
+        await self.reset_redis()
+        self.keycloak.start()
+
+        for project, port in self.agent_ports.items():
+            route_to = (
+                [topic(c) for c in CHILD_AGENTS] if project == ORCHESTRATOR else []
+            )
+            self.spawn(
+                project,
+                [
+                    sys.executable,
+                    "-m",
+                    "mesh_bench.stub_agent",
+                    str(AGENTS_DIR / project),
+                    "--port",
+                    str(port),
+                    *self.stub_args,
+                    *(["--route-to", *route_to] if route_to else []),
+                ],
+                self.agent_env(project),
+                AGENTS_DIR / project,
+            )
+        self.spawn(
+            "server",
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "app.main:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(self.server_port),
+                "--log-level",
+                "warning",
+            ],
+            self.server_env_vars(),
+            SERVER_DIR,
+        )
+        await self.wait_ready(boot_timeout)
+        print(f"[Bench] Mesh ready, logs in {self.log_dir}")
+
+    async def stop(self):
+        """Stop the server first so no new tasks come in, then the rest."""
+        for name in ["server", *self.agent_ports, "redis"]:
+            process = self.processes.pop(name, None)
+            if process is None:
+                continue
+            process.terminate()
+            try:
+                await asyncio.to_thread(process.wait, 30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.keycloak.stop()
+
+    async def __aenter__(self):
+        try:
+            await self.start()
+        except BaseException:
+            await self.stop()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import random
+import time
+
+from agent_runtime.service.plan import PlanStep, execute_plan, plan_order
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+
+from mesh_bench.report import summarize, write_results
+
+AGENTS = ["wikipedia", "hugging_face"]
+# Compound queries as plans, each step on one of AGENTS
+PLANS = {
+    # Every step needs the one before, nothing to overlap
+    "chain": [("a", []), ("b", ["a"]), ("c", ["b"])],
+    # Two branches after a first lookup, merged at the end
+    "diamond": [("a", []), ("b", ["a"]), ("c", ["a"]), ("d", ["b", "c"])],
+    # Independent lookups summed up by a last step
+    "fan-in": [("a", []), ("b", []), ("c", []), ("d", []), ("e", ["a", "b", "c", "d"])],
+    "wide": [(step, []) for step in "abcdef"],
+}
+
+
+def plan_steps(shape: str) -> list[PlanStep]:
+    return [
+        PlanStep(
+            id=step_id,
+            agent_name=AGENTS[index % len(AGENTS)],
+            query=f"{shape} step {step_id}",
+            depends_on=depends_on,
+        )
+        for index, (step_id, depends_on) in enumerate(PLANS[shape])
+    ]
+
+
+def child_agents(latency_ms: float, jitter_ms: float, seed: int) -> dict[str, Agent]:
+    """Child agents on `TestModel`, their one tool takes a seeded latency."""
+    rng = random.Random(seed)
+    agents = {}
+    for name in AGENTS:
+        agent = Agent(TestModel(custom_output_text=f"{name} answer"), name=name)
+
+        @agent.tool_plain
+        async def search(query: str) -> str:
+            """Search the knowledge base."""
+            delay = latency_ms + rng.uniform(-1, 1) * jitter_ms
+            await asyncio.sleep(max(0.0, delay) / 1000)
+            return f"Results for {query}"
+
+        agents[name] = agent
+    return agents
+
+
+def step_runner(agents: dict[str, Agent]):
+    async def run_step(step: PlanStep, inputs: dict[str, str]) -> dict:
+        context = " ".join(f"[{dep}] {answer}" for dep, answer in inputs.items())
+        result = await agents[step.agent_name].run(f"{step.query} {context}".strip())
+        return {"status": "completed", "answer": result.output}
+
+    return run_step
+
+
+async def run_sequentially(steps: list[PlanStep], runner, timeout: float) -> dict:
+    """One delegation at a time, in an order respecting the dependencies."""
+    results = {}
+    async with asyncio.timeout(timeout):
+        for step in plan_order(steps):
+            inputs = {dep: results[dep]["answer"] for dep in step.depends_on}
+            results[step.id] = await runner(step, inputs)
+    return results
+
+
+async def measure(args) -> dict:
+    runner = step_runner(child_agents(args.latency_ms, args.jitter_ms, args.seed))
+    modes = {
+        "sequential": run_sequentially,
+        "plan": execute_plan,
+    }
+    results = {"config": vars(args), "plans": {}}
+    for shape in args.shapes:
+        steps = plan_steps(shape)
+        latencies: dict[str, list[float]] = {mode: [] for mode in modes}
+        for _ in range(args.repeat):
+            for mode, execute in modes.items():
+                started = time.perf_counter()
+                outcome = await execute(steps, runner, args.timeout)
+                if all(r["status"] == "completed" for r in outcome.values()):
+                    latencies[mode].append((time.perf_counter() - started) * 1000)
+        stats = {mode: summarize(values) for mode, values in latencies.items()}
+        p50 = {mode: stats[mode].get("p50") for mode in modes}
+        results["plans"][shape] = {
+            "steps": len(steps),
+            "depth": depth(steps),
+            **{f"{mode}_ms": stat for mode, stat in stats.items()},
+            "speedup": (
+                round(p50["sequential"] / p50["plan"], 2) if p50["plan"] else None
+            ),
+        }
+    return results
+
+
+def depth(steps: list[PlanStep]) -> int:
+    """Steps on the longest dependency chain, the least a plan can wait for."""
+    levels: dict[str, int] = {}
+    for step in plan_order(steps):
+        levels[step.id] = 1 + max((levels[dep] for dep in step.depends_on), default=0)
+    return max(levels.values(), default=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare running plans of dependent subtasks with sequential delegation"
+    )
+    parser.add_argument("--shapes", nargs="*", default=list(PLANS), choices=PLANS)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--timeout", type=float, default=60, help="seconds a whole plan may take"
+    )
+    parser.add_argument("--output", default="plan.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(measure(args))
+    for shape, stats in results["plans"].items():
+        print(
+            f"[Bench] {shape:<8} {stats['steps']} steps, depth {stats['depth']}: "
+            f"sequential p50={stats['sequential_ms'].get('p50')}ms "
+            f"plan p50={stats['plan_ms'].get('p50')}ms "
+            f"speedup {stats['speedup']}x"
+        )
+    write_results(results, args.output)
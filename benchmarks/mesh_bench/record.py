@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import gzip
+import json
+import re
+import time
+from pathlib import Path
+
+import redis.asyncio as redis
+from agent_runtime.service.codec import (
+    ENCODING_ERRORS,
+    decode_event,
+    decode_task,
+)
+from agent_runtime.service.redis_service import DEFAULT_LANE, lane_stream
+
+# Fields holding credentials, never written to the log
+REDACTED_FIELDS = {"token"}
+# Trace context of the recorded run, a replay starts its own traces
+DROPPED_FIELDS = {"traceparent", "tracestate", "baggage"}
+# Tokens pasted anywhere else, e.g. in a query
+JWT = re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]+")
+REDACTED = "<redacted>"
+
+
+def scrub(value):
+    return JWT.sub(REDACTED, value) if isinstance(value, str) else value
+
+
+def redact(fields: dict) -> dict:
+    return {
+        key: REDACTED if key in REDACTED_FIELDS else scrub(value)
+        for key, value in fields.items()
+        if key not in DROPPED_FIELDS
+    }
+
+
+def redact_message(data: str) -> dict | str:
+    """Chat message with its fields redacted, events are kept decoded."""
+    event = decode_event(data)
+    if event is not None:
+        return redact(event)
+    return scrub(data)
+
+
+def write_entry(log, entry: dict):
+    log.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def read_log(path: Path) -> tuple[dict, list[dict]]:
+    """Header and entries of a recording, in the order they were seen."""
+    with gzip.open(path, "rt") as log:
+        header = json.loads(log.readline())
+        return header, [json.loads(line) for line in log]
+
+
+def entry_ms(entry_id: str) -> int:
+    return int(entry_id.split("-")[0])
+
+
+async def tail_streams(client: redis.Redis, streams: list[str], started: float, log):
+    """Write every entry added to the streams, timed by its entry ID.
+
+    Plain XREAD leaves the consumer groups alone, the agents still get
+    every entry.
+    """
+    last_ids = {stream: f"{int(started * 1000)}-0" for stream in streams}
+    while True:
+        for stream, entries in await client.xread(last_ids, block=1000):
+            for entry_id, fields in entries:
+                last_ids[stream] = entry_id
+                write_entry(
+                    log,
+                    {
+                        "t": round(entry_ms(entry_id) / 1000 - started, 3),
+                        "op": "xadd",
+                        "to": stream,
+                        "data": redact(decode_task(fields)),
+                    },
+                )
+
+
+async def tail_channel(client: redis.Redis, channel: str, started: float, log):
+    """Write every message published on the chat channel, timed on arrival."""
+    pubsub = client.pubsub()
+    await pubsub.subscribe(channel)
+    try:
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            write_entry(
+                log,
+                {
+                    "t": round(time.time() - started, 3),
+                    "op": "publish",
+                    "to": channel,
+                    "data": redact_message(message["data"]),
+                },
+            )
+    finally:
+        await pubsub.aclose()
+
+
+async def record(args):
+    client = redis.from_url(
+        args.redis_url, decode_responses=True, encoding_errors=ENCODING_ERRORS
+    )
+    streams = [
+        lane_stream(topic, lane)
+        for topic in [args.orchestrator, *args.agents]
+        for lane in [DEFAULT_LANE, *args.lanes]
+    ]
+    started = time.time()
+    with gzip.open(args.output, "wt") as log:
+        write_entry(
+            log,
+            {
+                "recorded_at": started,
+                "orchestrator": [
+                    lane_stream(args.orchestrator, lane)
+                    for lane in [DEFAULT_LANE, *args.lanes]
+                ],
+                "chat_channel": args.chat_channel,
+            },
+        )
+        print(f"[Bench] Recording {len(streams)} streams and {args.chat_channel}")
+        tails = [
+            asyncio.create_task(tail_streams(client, streams, started, log)),
+            asyncio.create_task(tail_channel(client, args.chat_channel, started, log)),
+        ]
+        try:
+            await asyncio.wait(tails, timeout=args.duration)
+        finally:
+            for tail in tails:
+                tail.cancel()
+            await asyncio.gather(*tails, return_exceptions=True)
+            await client.aclose()
+    print(f"[Bench] Recording written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Record the task streams and the chat channel of a mesh"
+    )
+    parser.add_argument("--redis-url", required=True)
+    parser.add_argument(
+        "--orchestrator", required=True, help="ORCHESTRATOR_TASK_QUEUE_NAME"
+    )
+    parser.add_argument(
+        "--agents", nargs="*", default=[], help="TOPIC_NAME of the child agents"
+    )
+    parser.add_argument(
+        "--lanes", nargs="*", default=["bulk"], help="lanes besides the default one"
+    )
+    parser.add_argument("--chat-channel", required=True, help="CHAT_CHANNEL_NAME")
+    parser.add_argument(
+        "--duration", type=float, help="seconds to record, until Ctrl+C otherwise"
+    )
+    parser.add_argument("--output", default="recording.jsonl.gz")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(record(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import redis.asyncio as redis
+from agent_runtime.service.codec import ENCODING_ERRORS, decode_event
+from agent_runtime.service.timings import add_hop
+
+from mesh_bench.load_test import ERROR_STATUSES
+from mesh_bench.record import read_log
+from mesh_bench.report import summarize, write_results
+
+# Changed answers kept in the results as examples
+CHANGED_EXAMPLES = 5
+
+
+def replay_speed(value: str) -> float:
+    """Speed-up over the recorded timing, 0 for as fast as possible."""
+    if value == "max":
+        return 0.0
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def answer_of(data) -> tuple[str, str, str] | None:
+    """Task, agent and text of a chat message answering a task."""
+    if not isinstance(data, dict) or data.get("type") != "response":
+        return None
+    if not data.get("task_id"):
+        return None
+    timings = data.get("timings") or []
+    agent = timings[-1]["service"] if timings else ""
+    return data["task_id"], agent, data.get("agent_response", "")
+
+
+def recorded_tasks(header: dict, entries: list[dict]) -> dict[str, dict]:
+    """Tasks sent to the orchestrator during the recording, with their answers."""
+    tasks = {}
+    for entry in entries:
+        if entry["op"] == "xadd" and entry["to"] in header["orchestrator"]:
+            tasks.setdefault(
+                entry["data"]["task_id"],
+                {"t": entry["t"], "stream": entry["to"], "data": entry["data"]},
+            )
+    for entry in entries:
+        answer = answer_of(entry["data"]) if entry["op"] == "publish" else None
+        if answer and answer[0] in tasks:
+            tasks[answer[0]].setdefault("answers", []).append(
+                {"t": entry["t"], "agent": answer[1], "text": answer[2]}
+            )
+    return tasks
+
+
+def outputs(answers: list[dict]) -> list[tuple[str, str]]:
+    return sorted((answer["agent"], answer["text"]) for answer in answers)
+
+
+def replay_task(task: dict, recorded_at: float, token: str) -> dict:
+    """Task fields as the chat server would enqueue them now."""
+    fields = dict(task["data"])
+    fields["task_id"] = str(uuid.uuid4())
+    # Recorded packed tasks referenced a token, the replay carries its own
+    fields.pop("token_ref", None)
+    fields["token"] = token
+    fields["timestamp"] = str(datetime.now())
+    # The task keeps the budget it had when it was recorded
+    if fields.get("deadline"):
+        budget = float(fields["deadline"]) - (recorded_at + task["t"])
+        fields["deadline"] = str(time.time() + budget)
+    fields["timings"] = json.dumps(add_hop([], "server", "enqueue"))
+    return fields
+
+
+async def replay(args) -> dict:
+    header, entries = read_log(Path(args.recording))
+    tasks = sorted(recorded_tasks(header, entries).values(), key=lambda t: t["t"])
+    streams = dict(mapping.split("=", 1) for mapping in args.stream_map)
+    channel = args.chat_channel or header["chat_channel"]
+    client = redis.from_url(
+        args.redis_url, decode_responses=True, encoding_errors=ENCODING_ERRORS
+    )
+
+    # Replayed task ID to the recorded task, with the answers seen so far
+    replayed: dict[str, dict] = {}
+    errors: Counter = Counter()
+    pubsub = client.pubsub()
+    await pubsub.subscribe(channel)
+
+    async def listen():
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            data = decode_event(message["data"])
+            answer = answer_of(data)
+            if answer and answer[0] in replayed:
+                replayed[answer[0]]["answers"].append(
+                    {
+                        "t": time.perf_counter(),
+                        "agent": answer[1],
+                        "text": answer[2],
+                    }
+                )
+            elif isinstance(data, dict) and data.get("status") in ERROR_STATUSES:
+                errors[data["status"]] += 1
+
+    listener = asyncio.create_task(listen())
+    first = tasks[0]["t"] if tasks else 0.0
+    started = time.perf_counter()
+    for task in tasks:
+        if args.speed:
+            delay = started + (task["t"] - first) / args.speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        fields = replay_task(task, header["recorded_at"], args.token)
+        replayed[fields["task_id"]] = {
+            "task": task,
+            "sent": time.perf_counter(),
+            "answers": [],
+        }
+        # Same write as the chat server
+        await client.xadd(streams.get(task["stream"], task["stream"]), fields)
+    sent_in = time.perf_counter() - started
+
+    # A task is done once it got as many answers as during the recording
+    def done(run: dict) -> bool:
+        return len(run["answers"]) >= max(1, len(run["task"].get("answers", [])))
+
+    deadline = time.monotonic() + args.timeout
+    while not all(map(done, replayed.values())) and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+    await pubsub.aclose()
+    await client.aclose()
+
+    recorded_latencies = [
+        (task["answers"][-1]["t"] - task["t"]) * 1000
+        for task in tasks
+        if task.get("answers")
+    ]
+    latencies = []
+    compared = Counter()
+    changed = []
+    for run in replayed.values():
+        if not run["answers"]:
+            compared["missing"] += 1
+            continue
+        latencies.append((run["answers"][-1]["t"] - run["sent"]) * 1000)
+        if "answers" not in run["task"]:
+            compared["not recorded"] += 1
+        elif outputs(run["answers"]) == outputs(run["task"]["answers"]):
+            compared["same"] += 1
+        else:
+            compared["changed"] += 1
+            if len(changed) < CHANGED_EXAMPLES:
+                changed.append(
+                    {
+                        "query": run["task"]["data"].get("query"),
+                        "recorded": outputs(run["task"]["answers"]),
+                        "replayed": outputs(run["answers"]),
+                    }
+                )
+    last_answer = max(
+        (run["answers"][-1]["t"] for run in replayed.values() if run["answers"]),
+        default=None,
+    )
+    elapsed = (last_answer - started) if last_answer else sent_in
+    errors["timeout"] = compared["missing"]
+
+    return {
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline", "token")
+        },
+        "requests": len(tasks),
+        "answered": len(latencies),
+        "send_rate_rps": round(len(tasks) / sent_in, 3) if sent_in else None,
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "recorded_latency_ms": summarize(recorded_latencies),
+        "outputs": dict(compared),
+        "changed_examples": changed,
+        "errors": dict(errors),
+        "error_rate": round(compared["missing"] / len(tasks), 4) if tasks else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay a recording against a mesh and compare it to the original"
+    )
+    parser.add_argument("recording", help="file written by mesh_bench.record")
+    parser.add_argument("--redis-url", required=True)
+    parser.add_argument(
+        "--token", required=True, help="access token the replayed tasks carry"
+    )
+    parser.add_argument(
+        "--speed",
+        type=replay_speed,
+        default=1.0,
+        help="speed-up over the recorded timing, or 'max'",
+    )
+    parser.add_argument(
+        "--stream-map",
+        nargs="*",
+        default=[],
+        metavar="RECORDED=TARGET",
+        help="streams to inject into instead of the recorded ones",
+    )
+    parser.add_argument("--chat-channel", help="channel to wait for the answers on")
+    parser.add_argument(
+        "--timeout", type=float, default=60, help="seconds to wait for answers"
+    )
+    parser.add_argument("--output", default="replay.json")
+    parser.add_argument("--baseline", help="previous replay to compare with")
+    args = parser.parse_args()
+
+    results = asyncio.run(replay(args))
+    print(
+        f"[Bench] {results['answered']}/{results['requests']} answered, "
+        f"outputs {results['outputs']}"
+    )
+    for name in ("p50", "p95", "p99"):
+        print(
+            f"    {name} recorded={results['recorded_latency_ms'].get(name)}ms "
+            f"replayed={results['latency_ms'].get(name)}ms"
+        )
+    if any(results["errors"].values()):
+        print(f"[Bench] Errors: {results['errors']}")
+    write_results(results, args.output, args.baseline)
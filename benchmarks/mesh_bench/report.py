@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+
+# Metrics compared against a baseline run, and whether higher is better
+COMPARED = {
+    "throughput_rps": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "error_rate": False,
+}
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ordered sample."""
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return round(ordered[index], 3)
+
+
+def summarize(values: list[float]) -> dict:
+    """Count, mean and percentiles of a sample, in its own unit."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": percentile(ordered, 0.5),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def segments(timings: list[dict]) -> dict[str, float]:
+    """Milliseconds between consecutive hops of a timing envelope."""
+    return {
+        f"{previous['service']}.{previous['hop']}"
+        f"->{current['service']}.{current['hop']}": current["at"] - previous["at"]
+        for previous, current in zip(timings, timings[1:])
+    }
+
+
+def lookup(results: dict, path: str):
+    for key in path.split("."):
+        results = (results or {}).get(key)
+    return results
+
+
+def write_results(results: dict, output: str, baseline: str | None = None):
+    """Save the results as JSON and print how they compare to a baseline run."""
+    Path(output).write_text(json.dumps(results, indent=2))
+    print(f"[Bench] Results written to {output}")
+    if not baseline:
+        return
+    previous = json.loads(Path(baseline).read_text())
+    print(f"{'metric':<20}{'baseline':>12}{'current':>12}{'change':>10}")
+    for path, higher_is_better in COMPARED.items():
+        before, after = lookup(previous, path), lookup(results, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        worse = change < 0 if higher_is_better else change > 0
+        flag = " !" if worse and abs(change) >= 10 else ""
+        print(f"{path:<20}{before:>12.3f}{after:>12.3f}{change:>+9.1f}%{flag}")
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import random
+import zlib
+from pathlib import Path
+
+import uvicorn
+from agent_runtime.service.host import load_agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.toolsets import FunctionToolset
+
+# Tools of the orchestrator delegating to a child agent, asking all of them
+# at once in gather mode, or running a plan over them in plan mode
+DELEGATION_TOOL = "queue_message_to_agent"
+GATHER_TOOL = "ask_agents"
+PLAN_TOOL = "run_plan"
+# Tools the orchestrator answers with itself once they returned
+ANSWERING_TOOLS = {GATHER_TOOL, PLAN_TOOL}
+# Tool of the stub MCP servers
+SEARCH_TOOL = "search"
+
+
+def last_prompt(messages: list[ModelMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, ModelRequest):
+            for part in message.parts:
+                if isinstance(part, UserPromptPart):
+                    return str(part.content)
+    return ""
+
+
+def stub_model(
+    latency_ms: float, jitter_ms: float, seed: int, route_to: list[str]
+) -> FunctionModel:
+    """Model answering after a seeded latency, delegating when `route_to` is set.
+
+    The orchestrator picks a child from the prompt, so a given query always
+    goes to the same agent, or asks every child in gather mode and answers
+    with the prompt itself. In plan mode it asks every child and has a last
+    step on the first child depend on all of them. Child agents call the stub MCP search tool once
+    when they have it, and answer with the prompt so clients can match it.
+    """
+    rng = random.Random(seed)
+
+    async def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(
+            max(0.0, latency_ms + rng.uniform(-1, 1) * jitter_ms) / 1000
+        )
+        prompt = last_prompt(messages)
+        tool_returned = any(isinstance(p, ToolReturnPart) for p in messages[-1].parts)
+        tools = {tool.name for tool in info.function_tools}
+        if route_to and not tool_returned and GATHER_TOOL in tools:
+            subtasks = [{"agent_name": child, "query": prompt} for child in route_to]
+            return ModelResponse(
+                parts=[ToolCallPart(GATHER_TOOL, {"subtasks": subtasks})]
+            )
+        if route_to and not tool_returned and PLAN_TOOL in tools:
+            plan = [
+                {"id": f"step{i}", "agent_name": child, "query": prompt}
+                for i, child in enumerate(route_to)
+            ]
+            plan.append(
+                {
+                    "id": "merge",
+                    "agent_name": route_to[0],
+                    "query": prompt,
+                    "depends_on": [step["id"] for step in plan],
+                }
+            )
+            return ModelResponse(parts=[ToolCallPart(PLAN_TOOL, {"plan": plan})])
+        if route_to and not tool_returned:
+            child = route_to[zlib.crc32(prompt.encode()) % len(route_to)]
+            return ModelResponse(
+                parts=[
+                    ToolCallPart(
+                        DELEGATION_TOOL, {"agent_name": child, "query": prompt}
+                    )
+                ]
+            )
+        if SEARCH_TOOL in tools and not tool_returned:
+            return ModelResponse(parts=[ToolCallPart(SEARCH_TOOL, {"query": prompt})])
+        if route_to and not ANSWERING_TOOLS & tools:
+            return ModelResponse(parts=[TextPart("Delegated")])
+        return ModelResponse(parts=[TextPart(f"Answer to {prompt}")])
+
+    return FunctionModel(respond)
+
+
+def stub_mcp(tool_latency_ms: float):
+    """Factory of an in-process toolset standing in for an MCP server."""
+
+    async def search(query: str) -> str:
+        """Search the knowledge base."""
+        await asyncio.sleep(tool_latency_ms / 1000)
+        return f"Results for {query}"
+
+    return lambda: FunctionToolset([search], id=SEARCH_TOOL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve an agent project with a stub model and MCP servers"
+    )
+    parser.add_argument("project", help="agent project directory")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--tool-latency-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--route-to", nargs="*", default=[], help="child agents to delegate to"
+    )
+    args = parser.parse_args()
+
+    worker = load_agent(Path(args.project))
+    worker.agent.model = stub_model(
+        args.latency_ms, args.jitter_ms, args.seed, args.route_to
+    )
+    worker.mcp_factories = {
+        name: stub_mcp(args.tool_latency_ms) for name in worker.mcp_factories
+    }
+    uvicorn.run(worker.a2a_app, host="127.0.0.1", port=args.port, log_level="warning")
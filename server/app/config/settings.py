@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,6 +17,47 @@ class Settings(BaseSettings):
     CHAT_CHANNEL_NAME: str
     ORCHESTRATOR_TASK_QUEUE_NAME: str
     LOGFIRE_API_KEY: str
+    # Seconds a task may wait in the mesh before agents drop it
+    TASK_DEADLINE_SECONDS: int = 60
+    # Channel where task cancellations are announced to the agents
+    CANCEL_CHANNEL_NAME: str = "task-cancellations"
+    # Lane a user's tasks go to based on their roles, as a JSON object
+    ROLE_LANES: dict[str, str] = {}
+    # Tasks waiting for an answer on one connection after which new ones go
+    # to the bulk lane
+    BULK_AFTER_PENDING_TASKS: int = 5
+    # Token buckets limiting how fast tasks enter the mesh
+    USER_RATE_PER_SECOND: float = 1.0
+    USER_BURST: int = 5
+    GLOBAL_RATE_PER_SECOND: float = 50.0
+    GLOBAL_BURST: int = 100
+    # Orchestrator backlog above which new tasks are turned away
+    MAX_ORCHESTRATOR_BACKLOG: int = 500
+    BACKLOG_CHECK_INTERVAL_SECONDS: float = 1.0
+    BUSY_RETRY_AFTER_SECONDS: int = 5
+    # Task streams are trimmed to roughly this many entries...
+    STREAM_MAXLEN: int = 10000
+    # ...or, when set, to the entries of the last N seconds
+    STREAM_RETENTION_SECONDS: int | None = None
+    # Seconds a shutting down server keeps delivering answers before closing sockets
+    DRAIN_TIMEOUT_SECONDS: int = 10
+    # Seconds clients are told to wait before reconnecting to another instance
+    RECONNECT_AFTER_SECONDS: int = 1
+    # Share of traces recorded, the agents follow the server's decision
+    TRACE_SAMPLE_RATE: float = 1.0
+    # How a chat message is sent to the local sockets: one after the other,
+    # or all at once so a slow client doesn't hold up the others
+    FANOUT_STRATEGY: Literal["sequential", "concurrent"] = "sequential"
+    # How tasks are written: "json" as flat hashes, or "msgpack" packed with
+    # the token stored once per session and referenced. Agents read both, so
+    # switch once they all run a version that reads msgpack
+    ENVELOPE_CODEC: Literal["json", "msgpack"] = "json"
+    # Role a token needs for the profiling endpoints under /debug
+    ADMIN_ROLE: str = "mesh-admin"
+    # Seconds between two probes of the event loop's scheduling lag
+    LOOP_PROBE_INTERVAL_SECONDS: float = 0.1
+    # Lag after which the loop counts as blocked and its stack is logged
+    SLOW_CALLBACK_MS: float = 100
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,25 +1,127 @@
+from agent_runtime.service.startup import install_import_timer
+
+# The server's entry module, its imports are timed from here on
+install_import_timer()
+
+import json
+import time
 import uuid
 from datetime import datetime
 
 import logfire
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import RedirectResponse
+from agent_runtime.service.codec import encode_task, token_key, token_ref
+from agent_runtime.service.profiler import (
+    MAX_PROFILE_SECONDS,
+    PROFILE_LOCK,
+    loop_report,
+    profile,
+    task_dump,
+)
+from agent_runtime.service.prometheus import PROMETHEUS_CONTENT_TYPE, render_metrics
+from agent_runtime.service.redis_service import lane_stream, trim_policy
+from agent_runtime.service.startup import MILESTONES, mark, startup_profile
+from agent_runtime.service.timings import add_hop
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 
 from app.config.settings import get_settings
 from app.schema.auth import TokenData
-from app.service.auth_service import get_access_token, get_auth_url, get_current_user
+from app.service.admission_service import admit_task
+from app.service.auth_service import (
+    get_access_token,
+    get_auth_url,
+    get_current_user,
+    is_admin,
+)
+from app.service.metrics import WEBSOCKET_CONNECTIONS
 from app.service.redis_service import (
     ACTIVE_CONNECTIONS,
     CHAT_CHANNEL_NAME,
+    DRAINING,
+    LISTENER_READY,
+    PENDING_TASKS,
     REDIS,
+    cancel_session_tasks,
+    close_for_restart,
+    forget_task,
     lifespan,
+    pick_lane,
+    reconnect_hint,
+    track_task,
 )
+from app.service.timings import timing_report
 
-# Initalizing the fastapi server
+# Initalizing the fastapi server, logfire itself is configured in the lifespan
+# but the middleware has to be in place before the app starts
 app = FastAPI(title="Main Server", lifespan=lifespan)
-logfire.configure(token=get_settings().LOGFIRE_API_KEY, service_name="main-server")
 logfire.instrument_fastapi(app)
-logfire.instrument_system_metrics(base="full")
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: Redis answers, the listener is subscribed and we're not draining."""
+    checks = {"listener": LISTENER_READY.is_set(), "draining": DRAINING.is_set()}
+    try:
+        checks["redis"] = await REDIS.ping()
+    except Exception:
+        checks["redis"] = False
+    ready = checks["listener"] and checks["redis"] and not checks["draining"]
+    return JSONResponse(
+        {"ready": ready, "checks": checks, "startup": startup_profile()},
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint, run in a thread as collecting calls psutil."""
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/timings")
+async def timings():
+    """Percentiles of the time between the hops of recent answers."""
+    return timing_report()
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5, gt=0),
+    admin: TokenData = Depends(is_admin),
+):
+    """Sample the process for `seconds` and return its collapsed stacks."""
+    if not PROFILE_LOCK.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Already profiling")
+    try:
+        return PlainTextResponse(await profile(seconds, interval_ms / 1000))
+    finally:
+        PROFILE_LOCK.release()
+
+
+@app.get("/debug/tasks")
+async def debug_tasks(admin: TokenData = Depends(is_admin)):
+    """Asyncio tasks of the process and where each one is waiting."""
+    return task_dump()
+
+
+@app.get("/debug/loop")
+async def debug_loop(admin: TokenData = Depends(is_admin)):
+    """Event loop lag percentiles and the stacks it was recently blocked in."""
+    return loop_report()
 
 
 @app.get("/login")
@@ -44,7 +146,15 @@ async def websocket_chat(websocket: WebSocket, token: str, session_id: str):
         # Validate token
         current_user: TokenData = await get_current_user(token)
         await websocket.accept()
+        # A draining server sends new clients straight to another instance
+        if DRAINING.is_set():
+            await close_for_restart(websocket)
+            return
         ACTIVE_CONNECTIONS.add(websocket)
+        WEBSOCKET_CONNECTIONS.set(len(ACTIVE_CONNECTIONS))
+        # Tasks submitted on this connection still waiting for an answer,
+        # mapped to their deadline
+        pending_tasks = PENDING_TASKS.setdefault(websocket, {})
 
         # Welcome message
         await REDIS.publish(
@@ -55,23 +165,96 @@ async def websocket_chat(websocket: WebSocket, token: str, session_id: str):
         # Chat loop
         while True:
             data = await websocket.receive_text()
-            # Create a new task
+            # The answers of running tasks are still delivered while
+            # draining, new ones must go to another instance
+            if DRAINING.is_set():
+                await websocket.send_text(reconnect_hint())
+                continue
+            # Forget tasks past their deadline, the agents drop those anyway
+            now = time.time()
+            for task_id, task_deadline in list(pending_tasks.items()):
+                if task_deadline <= now:
+                    forget_task(task_id)
+            # Users with many tasks in flight are moved to the bulk lane,
+            # so they can't starve everyone else
+            lane = pick_lane(current_user.roles, len(pending_tasks))
+            stream = lane_stream(get_settings().ORCHESTRATOR_TASK_QUEUE_NAME, lane)
+
+            # Turn the task away right here when the user or the mesh is
+            # over its limits, only this client gets the busy frame
+            admission = await admit_task(current_user.username, stream)
+            if not admission.allowed:
+                await websocket.send_text(
+                    json.dumps(
+                        {
+                            "status": "busy",
+                            "message": admission.reason,
+                            "retry_after": admission.retry_after,
+                        }
+                    )
+                )
+                continue
+
+            # Create a new task, the deadline is an epoch timestamp so every
+            # agent in the mesh can drop the task once it is no longer useful
+            deadline = now + get_settings().TASK_DEADLINE_SECONDS
             task = {
                 "task_id": str(uuid.uuid4()),
                 "query": data,
                 "timestamp": str(datetime.now()),
+                "deadline": str(deadline),
                 "token": token,
                 "session_id": session_id,
+                "lane": lane,
             }
-            # Setting the session data to the tool in the orchestrator agent
-            await REDIS.hset("queue_message_to_agent", mapping=task)
-            # Setting a ttl of 60 seconds for each task
-            await REDIS.expire("queue_message_to_agent", time=60)
-            # Add the task to the orchestractor agent task queue
-            await REDIS.xadd(get_settings().ORCHESTRATOR_TASK_QUEUE_NAME, task)
+            # Envelope every hop of the task appends its time to, the answer
+            # brings it back to the client
+            task["timings"] = json.dumps(add_hop([], "server", "enqueue"))
+            # Packed tasks carry a reference to the token instead of the token
+            codec = get_settings().ENVELOPE_CODEC
+            if codec == "msgpack":
+                task["token_ref"] = token_ref(task.pop("token"))
+            track_task(websocket, task["task_id"], deadline)
+            with logfire.span(
+                "enqueue task {task_id}", task_id=task["task_id"], lane=lane
+            ):
+                # The agents continue this trace through the traceparent field
+                task.update(logfire.propagate.get_context())
+                # All the writes of the task go out in one round trip
+                async with REDIS.pipeline(transaction=False) as pipe:
+                    # The token outlives every task referencing it
+                    if "token_ref" in task:
+                        pipe.set(
+                            token_key(task["token_ref"]),
+                            token,
+                            ex=get_settings().TASK_DEADLINE_SECONDS,
+                        )
+                    # Add the task to the orchestractor agent task queue of its
+                    # lane, its tools read the task's fields from the entry
+                    pipe.xadd(
+                        stream, encode_task(task, codec), **trim_policy(get_settings())
+                    )
+                    await pipe.execute()
+            if "first message" not in MILESTONES:
+                print(f"[App] First message after {mark('first message'):.3f}s")
 
     except WebSocketDisconnect:
-        ACTIVE_CONNECTIONS.remove(websocket)
+        ACTIVE_CONNECTIONS.discard(websocket)
+        WEBSOCKET_CONNECTIONS.set(len(ACTIVE_CONNECTIONS))
+        # Only tasks not answered yet are left, finished ones need no cancel key
+        unanswered = [
+            task_id
+            for task_id, task_deadline in pending_tasks.items()
+            if task_deadline > time.time()
+        ]
+        for task_id in list(pending_tasks):
+            forget_task(task_id)
+        PENDING_TASKS.pop(websocket, None)
+        # The client reconnects to another instance, its tasks keep running
+        if DRAINING.is_set():
+            return
+        # Nobody is waiting for the answers anymore, free the agents
+        await cancel_session_tasks(session_id, unanswered)
         await REDIS.publish(
             CHAT_CHANNEL_NAME, f"{current_user.username} left the chat."
         )
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+# Admission decision for a new chat task
+class AdmissionResult(BaseModel):
+    allowed: bool
+    retry_after: float = 0
+    reason: str = ""
@@ -0,0 +1,95 @@
+import time
+
+from app.config.settings import get_settings
+from app.schema.admission import AdmissionResult
+from app.service.redis_service import REDIS
+
+# Refills and takes one token from the user and the global bucket atomically.
+# Tokens are only taken when both buckets have one, otherwise the script
+# returns how long the caller has to wait for the emptiest bucket to refill.
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+
+local function refill(key, rate, burst)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    return math.min(burst, tokens + (now - ts) / 1000 * rate)
+end
+
+local function store(key, tokens, rate, burst)
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+end
+
+local user_rate, user_burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local global_rate, global_burst = tonumber(ARGV[3]), tonumber(ARGV[4])
+local user_tokens = refill(KEYS[1], user_rate, user_burst)
+local global_tokens = refill(KEYS[2], global_rate, global_burst)
+
+local wait = 0
+if user_tokens < 1 then
+    wait = math.max(wait, (1 - user_tokens) / user_rate)
+end
+if global_tokens < 1 then
+    wait = math.max(wait, (1 - global_tokens) / global_rate)
+end
+if wait == 0 then
+    user_tokens = user_tokens - 1
+    global_tokens = global_tokens - 1
+end
+
+store(KEYS[1], user_tokens, user_rate, user_burst)
+store(KEYS[2], global_tokens, global_rate, global_burst)
+return tostring(wait)
+"""
+
+take_tokens = REDIS.register_script(TOKEN_BUCKET_SCRIPT)
+
+# Last known backlog per stream with the time it was read, so a burst of
+# messages doesn't turn into a burst of XLEN calls
+BACKLOG_CACHE: dict[str, tuple[float, int]] = {}
+
+
+async def stream_backlog(stream: str) -> int:
+    """Entries waiting in the stream, acked entries are deleted by the agents."""
+    checked_at, backlog = BACKLOG_CACHE.get(stream, (0, 0))
+    if time.monotonic() - checked_at >= get_settings().BACKLOG_CHECK_INTERVAL_SECONDS:
+        backlog = await REDIS.xlen(stream)
+        BACKLOG_CACHE[stream] = (time.monotonic(), backlog)
+    return backlog
+
+
+async def admit_task(username: str, stream: str) -> AdmissionResult:
+    """Decide whether a new task from `username` may enter `stream`."""
+    settings = get_settings()
+
+    # Step 1: Shed load while the orchestrator is already behind
+    if await stream_backlog(stream) >= settings.MAX_ORCHESTRATOR_BACKLOG:
+        return AdmissionResult(
+            allowed=False,
+            retry_after=settings.BUSY_RETRY_AFTER_SECONDS,
+            reason="The agents are busy, please retry later",
+        )
+
+    # Step 2: Per-user and global rate limits
+    wait = float(
+        await take_tokens(
+            keys=[f"ratelimit:user:{username}", "ratelimit:global"],
+            args=[
+                settings.USER_RATE_PER_SECOND,
+                settings.USER_BURST,
+                settings.GLOBAL_RATE_PER_SECOND,
+                settings.GLOBAL_BURST,
+            ],
+        )
+    )
+    if wait > 0:
+        return AdmissionResult(
+            allowed=False,
+            retry_after=round(wait, 3),
+            reason="Too many messages, please slow down",
+        )
+
+    return AdmissionResult(allowed=True)
@@ -78,6 +78,11 @@ def has_role(required_role: str):
     return role_checker
 
 
+# Admin only routes, the role is read per request rather than when declared
+def is_admin(token_data: TokenData = Depends(get_current_user)) -> TokenData:
+    return has_role(get_settings().ADMIN_ROLE)(token_data)
+
+
 async def get_auth_url():
     params = {
         "client_id": get_settings().KEYCLOAK_CLIENT_ID,
@@ -0,0 +1,34 @@
+import logfire
+
+# Websockets connected to this server process
+WEBSOCKET_CONNECTIONS = logfire.metric_gauge(
+    "server_websocket_connections",
+    unit="1",
+    description="Websocket connections open on this server",
+)
+
+# Time to broadcast one chat channel message to every local connection
+FANOUT_TIME = logfire.metric_histogram(
+    "server_fanout_time",
+    unit="ms",
+    description="Time to send a chat message to every connected websocket",
+)
+
+# Time between consecutive hops of the answers' timing envelopes
+HOP_TIME = logfire.metric_histogram(
+    "server_hop_time",
+    unit="ms",
+    description="Time between two hops of a task, from the answers' envelopes",
+)
+
+# How much later than scheduled the event loop ran a probe callback
+EVENT_LOOP_LAG = logfire.metric_histogram(
+    "server_event_loop_lag",
+    unit="ms",
+    description="Delay of the event loop in running a scheduled callback",
+)
+EVENT_LOOP_BLOCKED = logfire.metric_counter(
+    "server_event_loop_blocked",
+    unit="1",
+    description="Times the event loop lagged more than SLOW_CALLBACK_MS",
+)
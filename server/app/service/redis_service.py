@@ -1,66 +1,316 @@
 import asyncio
+import json
+import signal
+import threading
+import time
 from contextlib import asynccontextmanager
 
+import logfire
 import redis.asyncio as redis
+from agent_runtime.service.codec import ENCODING_ERRORS, EVENT_MARKER, decode_event
+from agent_runtime.service.profiler import monitor_event_loop
+from agent_runtime.service.prometheus import METRICS_READER
+from agent_runtime.service.redis_service import DEFAULT_LANE, cancel_key
+from agent_runtime.service.startup import (
+    mark,
+    report_startup,
+    uninstall_import_timer,
+)
 from fastapi import FastAPI, WebSocket
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter
 
 from app.config.settings import get_settings
+from app.service.metrics import (
+    EVENT_LOOP_BLOCKED,
+    EVENT_LOOP_LAG,
+    FANOUT_TIME,
+    WEBSOCKET_CONNECTIONS,
+)
+from app.service.timings import record_timings
 
 # Redis
-REDIS = redis.from_url(get_settings().REDIS_URL, decode_responses=True)
+REDIS = redis.from_url(
+    get_settings().REDIS_URL, decode_responses=True, encoding_errors=ENCODING_ERRORS
+)
 
 # Active websocket connections per server process
 ACTIVE_CONNECTIONS: set[WebSocket] = set()
 
+# Tasks of each connection still waiting for an answer, mapped to their deadline
+PENDING_TASKS: dict[WebSocket, dict[str, float]] = {}
+# Connection of each pending task, and the answers it still waits for
+TASK_CONNECTIONS: dict[str, WebSocket] = {}
+ANSWERS_DUE: dict[str, int] = {}
+
+# Set once the server is shutting down, no new tasks are accepted from then on
+DRAINING = asyncio.Event()
+
 # Channel where all the chat messages are published
 CHAT_CHANNEL_NAME = get_settings().CHAT_CHANNEL_NAME
 
+# Channel where task cancellations are announced to the agents
+CANCEL_CHANNEL_NAME = get_settings().CANCEL_CHANNEL_NAME
+
+# Lane for users flooding the mesh with queries
+BULK_LANE = "bulk"
+
 # Intializing the lister task
 LISTENER_TASK: asyncio.Task | None = None
 
+# Set once the listener is subscribed, the server is ready from then on
+LISTENER_READY = asyncio.Event()
+
+# Drain started by a shutdown signal
+DRAIN_TASK: asyncio.Task | None = None
+
+# Set once logfire is configured, tests may configure it first
+LOGFIRE_CONFIGURED = False
+
+
+def decode_payload(data: str) -> dict:
+    """Event published on the chat channel, empty for plain text."""
+    return decode_event(data) or {}
+
+
+async def send_to(connection: WebSocket, data: str) -> bool:
+    """Send a chat message to one socket, False when the socket is broken."""
+    try:
+        await connection.send_text(data)
+        return True
+    except Exception as e:
+        # Log broken connections
+        print(f"[Redis] Broken connection removed: {connection}, error: {e}")
+        return False
+
+
+def track_task(connection: WebSocket, task_id: str, deadline: float):
+    """Count a task as pending on its connection until it's answered."""
+    PENDING_TASKS.setdefault(connection, {})[task_id] = deadline
+    TASK_CONNECTIONS[task_id] = connection
+    ANSWERS_DUE[task_id] = 1
+
+
+def forget_task(task_id: str):
+    ANSWERS_DUE.pop(task_id, None)
+    connection = TASK_CONNECTIONS.pop(task_id, None)
+    if connection is not None:
+        PENDING_TASKS.get(connection, {}).pop(task_id, None)
+
+
+def settle_task(payload: dict):
+    """Count an outcome published for a task, forgetting the task once every
+    agent it was handed to answered."""
+    task_id = payload.get("task_id")
+    if task_id not in ANSWERS_DUE:
+        return
+    ANSWERS_DUE[task_id] += int(payload.get("delegated", 0)) - 1
+    if ANSWERS_DUE[task_id] <= 0:
+        forget_task(task_id)
+
 
 async def redis_listener():
     """Listen to Redis channel and broadcast messages to local connections."""
     pubsub = REDIS.pubsub()
     await pubsub.subscribe(CHAT_CHANNEL_NAME)
+    LISTENER_READY.set()
+    mark("ready")
+    report_startup("main-server")
     try:
         async for message in pubsub.listen():
             if message["type"] == "message":
                 data = message["data"]
-                print(f"[Redis] Received: {data}")
-
-                disconnected = []
-                # Broadcast to all connected WebSockets
-                for connection in ACTIVE_CONNECTIONS:
-                    try:
-                        await connection.send_text(data)
-                    except Exception as e:
-                        # Log broken connections
-                        print(
-                            f"[Redis] Broken connection removed: {connection}, error: {e}"
-                        )
-                        disconnected.append(connection)
+                payload = decode_payload(data)
+                # Clients always get JSON, packed events are converted once
+                if data.startswith(EVENT_MARKER):
+                    data = json.dumps(payload)
+
+                started = time.perf_counter()
+                # Sockets may disconnect while we send, broadcast to a copy
+                connections = list(ACTIVE_CONNECTIONS)
+                # Broadcast to all connected WebSockets, in the trace of the
+                # agent that published the message
+                with logfire.propagate.attach_context(payload):
+                    with logfire.span(
+                        "fan out chat message", connections=len(connections)
+                    ):
+                        if get_settings().FANOUT_STRATEGY == "concurrent":
+                            delivered = await asyncio.gather(
+                                *(send_to(c, data) for c in connections)
+                            )
+                        else:
+                            delivered = [await send_to(c, data) for c in connections]
 
                 # Remove broken connections
-                for connection in disconnected:
-                    ACTIVE_CONNECTIONS.remove(connection)
+                for connection, ok in zip(connections, delivered):
+                    if not ok:
+                        ACTIVE_CONNECTIONS.discard(connection)
+                WEBSOCKET_CONNECTIONS.set(len(ACTIVE_CONNECTIONS))
+                FANOUT_TIME.record((time.perf_counter() - started) * 1000)
+                record_timings(payload)
+                settle_task(payload)
 
     except asyncio.CancelledError:
+        LISTENER_READY.clear()
         await pubsub.unsubscribe(CHAT_CHANNEL_NAME)
         await pubsub.close()
         print("[Redis] Listener stopped gracefully")
         raise
 
 
+def pick_lane(roles: list[str], pending_tasks: int) -> str:
+    """Lane for a new task, from the user's roles and how busy the connection is."""
+    if pending_tasks >= get_settings().BULK_AFTER_PENDING_TASKS:
+        return BULK_LANE
+    role_lanes = get_settings().ROLE_LANES
+    return next(
+        (role_lanes[role] for role in roles if role in role_lanes), DEFAULT_LANE
+    )
+
+
+async def cancel_session_tasks(session_id: str, task_ids: list[str]):
+    """Mark the tasks of a closed session as cancelled and notify the agents."""
+    if not task_ids:
+        return
+    async with REDIS.pipeline(transaction=False) as pipe:
+        # Keys outlive the task deadline, so queued entries are always skipped
+        for task_id in task_ids:
+            pipe.set(
+                cancel_key(session_id, task_id),
+                "1",
+                ex=get_settings().TASK_DEADLINE_SECONDS,
+            )
+        # Running tasks are cancelled through the pub/sub notice
+        pipe.publish(
+            CANCEL_CHANNEL_NAME,
+            json.dumps({"session_id": session_id, "task_ids": task_ids}),
+        )
+        await pipe.execute()
+
+
+def reconnect_hint() -> str:
+    return json.dumps(
+        {
+            "status": "reconnect",
+            "message": "Server is restarting, please reconnect",
+            "retry_after": get_settings().RECONNECT_AFTER_SECONDS,
+        }
+    )
+
+
+async def close_for_restart(connection: WebSocket):
+    """Tell the client to reconnect and close with 1012 (service restart)."""
+    try:
+        await connection.send_text(reconnect_hint())
+        await connection.close(code=1012)
+    except Exception as e:
+        print(f"[App] Failed to close connection {connection}: {e}")
+
+
+async def drain_connections():
+    """Stop taking tasks and close every socket once its answers are delivered.
+
+    Connections with tasks still waiting for an answer are kept open until
+    the answers arrive, the tasks' deadline passes or DRAIN_TIMEOUT_SECONDS,
+    whichever comes first, while the listener keeps broadcasting the results.
+    """
+    DRAINING.set()
+    drain_deadline = time.time() + get_settings().DRAIN_TIMEOUT_SECONDS
+    print(f"[App] Draining {len(ACTIVE_CONNECTIONS)} connections")
+    closed: set[WebSocket] = set()
+    while True:
+        now = time.time()
+        remaining = [c for c in ACTIVE_CONNECTIONS if c not in closed]
+        if not remaining:
+            break
+        for connection in remaining:
+            # Answered tasks are already gone from the pending ones
+            waiting = any(d > now for d in PENDING_TASKS.get(connection, {}).values())
+            if now >= drain_deadline or not waiting:
+                closed.add(connection)
+                await close_for_restart(connection)
+        await asyncio.sleep(0.5)
+    print("[App] Connections drained")
+
+
+def install_drain_handler():
+    """Drain the connections on SIGINT/SIGTERM before handing over to uvicorn.
+
+    Uvicorn closes the sockets itself as soon as it starts shutting down,
+    without the reconnect hint and before pending answers arrive, so the
+    drain runs first and uvicorn's own handler is called once it's done.
+    """
+    # Signals can only be handled from the main thread
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+
+    def start_drain(signum, frame, previous):
+        global DRAIN_TASK
+        # A second signal skips the drain
+        if DRAIN_TASK is not None:
+            previous(signum, frame)
+            return
+        DRAIN_TASK = loop.create_task(drain_connections())
+        DRAIN_TASK.add_done_callback(lambda _: previous(signum, frame))
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if callable(previous):
+            signal.signal(
+                sig,
+                lambda signum, frame, previous=previous: loop.call_soon_threadsafe(
+                    start_drain, signum, frame, previous
+                ),
+            )
+
+
+def configure_logfire(span_exporter: SpanExporter | None = None):
+    """Configure logfire once per process.
+
+    Tests configure it first with an in-memory `span_exporter`, the lifespan
+    then keeps that configuration.
+    """
+    global LOGFIRE_CONFIGURED
+    if LOGFIRE_CONFIGURED:
+        return
+    LOGFIRE_CONFIGURED = True
+    logfire.configure(
+        token=get_settings().LOGFIRE_API_KEY,
+        service_name="main-server",
+        # Head sampling, the agents follow the decision through traceparent
+        sampling=logfire.SamplingOptions(head=get_settings().TRACE_SAMPLE_RATE),
+        # Also kept in process for the /metrics endpoint
+        metrics=logfire.MetricsOptions(additional_readers=[METRICS_READER]),
+        additional_span_processors=(
+            [SimpleSpanProcessor(span_exporter)] if span_exporter else None
+        ),
+    )
+    logfire.instrument_system_metrics(base="full")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global LISTENER_TASK
+    mark("lifespan started")
+    # Telemetry is configured here rather than on import, to keep boot fast
+    configure_logfire()
     # Startup: start Redis listener
     LISTENER_TASK = asyncio.create_task(redis_listener())
     print("[App] Redis listener started")
+    monitor = asyncio.create_task(
+        monitor_event_loop(
+            get_settings().LOOP_PROBE_INTERVAL_SECONDS,
+            get_settings().SLOW_CALLBACK_MS,
+            EVENT_LOOP_LAG,
+            EVENT_LOOP_BLOCKED,
+        )
+    )
+    install_drain_handler()
     try:
         yield
     finally:
+        # Startup may never have been reported
+        uninstall_import_timer()
         # Shutdown: cancel Redis listener
         if LISTENER_TASK:
             LISTENER_TASK.cancel()
@@ -71,3 +321,5 @@ async def lifespan(app: FastAPI):
         # Close Redis client
         await REDIS.close()
         print("[App] Redis client closed")
+        monitor.cancel()
+        await asyncio.gather(monitor, return_exceptions=True)
@@ -0,0 +1,51 @@
+from collections import deque
+
+from agent_runtime.service.profiler import percentile
+
+from app.service.metrics import HOP_TIME
+
+# Answers kept per segment for the percentile report
+TIMINGS_WINDOW = 1000
+
+# Recent durations in milliseconds, by segment between two hops
+SEGMENT_TIMES: dict[str, deque[float]] = {}
+
+
+def segments(timings: list[dict]) -> dict[str, float]:
+    """Milliseconds between consecutive hops of an envelope, and in total."""
+    durations = {}
+    for previous, current in zip(timings, timings[1:]):
+        name = (
+            f"{previous['service']}.{previous['hop']}"
+            f"->{current['service']}.{current['hop']}"
+        )
+        durations[name] = current["at"] - previous["at"]
+    if timings:
+        durations["total"] = timings[-1]["at"] - timings[0]["at"]
+    return durations
+
+
+def record_timings(payload: dict):
+    """Aggregate the timing envelope of an answer published on the chat channel."""
+    try:
+        durations = segments(payload.get("timings") or [])
+    except (KeyError, TypeError):
+        return
+    for name, duration in durations.items():
+        SEGMENT_TIMES.setdefault(name, deque(maxlen=TIMINGS_WINDOW)).append(duration)
+        HOP_TIME.record(duration, {"segment": name})
+
+
+def timing_report() -> dict:
+    """Percentiles of every segment over the last TIMINGS_WINDOW answers."""
+    report = {}
+    for name, times in sorted(SEGMENT_TIMES.items()):
+        ordered = sorted(times)
+        report[name] = {
+            "count": len(ordered),
+            "p50": percentile(ordered, 0.5),
+            "p90": percentile(ordered, 0.9),
+            "p99": percentile(ordered, 0.99),
+            "max": round(ordered[-1], 3),
+        }
+    return report
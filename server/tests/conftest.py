@@ -0,0 +1,42 @@
+import os
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+# Settings are read from the environment before anything imports the app,
+# over whatever a local .env holds
+os.environ.update(
+    KEYCLOAK_URL="http://localhost/keycloak",
+    REALM_NAME="test",
+    KEYCLOAK_CLIENT_ID="test",
+    JWKS_URL="http://localhost/jwks",
+    AUTHORIZATION_URL="http://localhost/auth",
+    TOKEN_URL="http://localhost/token",
+    KEYCLOAK_CLIENT_SECRET="test",
+    REDIRECT_URI="http://localhost/callback",
+    REDIS_URL="redis://localhost",
+    CHAT_CHANNEL_NAME="chat",
+    ORCHESTRATOR_TASK_QUEUE_NAME="orchestrator",
+    LOGFIRE_API_KEY="test",
+    USER_RATE_PER_SECOND="20",
+    USER_BURST="2",
+    GLOBAL_RATE_PER_SECOND="20",
+    GLOBAL_BURST="3",
+    MAX_ORCHESTRATOR_BACKLOG="5",
+)
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    """Admission service on an in-memory Redis running the token bucket."""
+    from app.service import admission_service
+
+    client = FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(admission_service, "REDIS", client)
+    monkeypatch.setattr(
+        admission_service,
+        "take_tokens",
+        client.register_script(admission_service.TOKEN_BUCKET_SCRIPT),
+    )
+    monkeypatch.setattr(admission_service, "BACKLOG_CACHE", {})
+    return admission_service
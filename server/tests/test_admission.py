@@ -0,0 +1,50 @@
+import asyncio
+
+STREAM = "orchestrator:interactive"
+
+
+async def admit_all(admission, *usernames: str) -> list:
+    return [await admission.admit_task(username, STREAM) for username in usernames]
+
+
+def test_burst_then_denied_until_refilled(admission):
+    async def scenario():
+        burst = await admit_all(admission, "alice", "alice")
+        denied = await admission.admit_task("alice", STREAM)
+        await asyncio.sleep(denied.retry_after)
+        return burst, denied, await admission.admit_task("alice", STREAM)
+
+    burst, denied, refilled = asyncio.run(scenario())
+    assert all(result.allowed for result in burst)
+    assert not denied.allowed
+    # One token comes back every 1/20s
+    assert 0 < denied.retry_after <= 0.05
+    assert refilled.allowed
+
+
+def test_users_have_their_own_bucket(admission):
+    results = asyncio.run(admit_all(admission, "alice", "alice", "alice", "bob"))
+    assert [result.allowed for result in results] == [True, True, False, True]
+
+
+def test_global_bucket_denies_without_taking_user_tokens(admission):
+    async def scenario():
+        results = await admit_all(admission, "alice", "bob", "carol", "dave")
+        tokens = await admission.REDIS.hget("ratelimit:user:dave", "tokens")
+        return results, float(tokens)
+
+    results, dave_tokens = asyncio.run(scenario())
+    assert [result.allowed for result in results] == [True, True, True, False]
+    # Dave was turned away by the global bucket, his own burst is intact
+    assert dave_tokens >= 2
+
+
+def test_backlog_sheds_load(admission):
+    async def scenario():
+        for i in range(5):
+            await admission.REDIS.xadd(STREAM, {"task_id": f"task-{i}"})
+        return await admission.admit_task("alice", STREAM)
+
+    result = asyncio.run(scenario())
+    assert not result.allowed
+    assert result.retry_after == admission.get_settings().BUSY_RETRY_AFTER_SECONDS